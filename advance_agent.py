@@ -1,451 +1,176 @@
 # advance_agent.py
 
 # --- Imports and Environment Setup ---
-from crewai import Agent, Task, Crew, Process
+# Only light modules are imported here so that importing this module, or running `--help`,
+# stays fast. crewai and the tools are imported when the crew is first built (see get_crew()).
+import time
+_MODULE_IMPORT_STARTED = time.perf_counter()
+
 from dotenv import load_dotenv
-from crewai.tools import BaseTool
-from langchain_community.tools import DuckDuckGoSearchRun
 import os
-from typing import Dict, Any, List
+import sys
+import threading
+from typing import Callable, Dict, Any, List, Optional, Tuple
 import json
 from datetime import datetime
-from pydantic import BaseModel, Field
-import smtplib 
-import socket 
-from email.mime.multipart import MIMEMultipart 
-from email.mime.text import MIMEText 
-from email.mime.base import MIMEBase 
-from email import encoders 
-import traceback 
+import argparse
+import sqlite3
+# Report email construction and pooled SMTP delivery.
+from email_delivery import get_mailer, recipient_list
+from email_outbox import flush_outbox, get_outbox_sender
+# Report formatting (format_to_text) and the streaming report writer.
+from report_writer import StreamingReportWriter, format_to_text
 
 # Load environment variables (e.g., API keys, email credentials) from .env file
 load_dotenv()
 
-# --- Tool Input Schema --- 
-# Defines the expected input structure for all custom tools.
-# Ensures consistency in how agents pass arguments to tools.
-class ToolInputSchema(BaseModel):
-    description: str = Field(..., description="The input data, query, or context for the tool")
-
-# --- Base Tool Enhancement --- 
-# Custom base class for all tools to standardize input handling and add common logic.
-class EnhancedBaseTool(BaseTool):
-    args_schema: type[BaseModel] = ToolInputSchema
-
-    def _run(self, description: str) -> str: 
-        tool_name = self.name or "Unknown Tool"
-        try:
-            if not description:
-                 print(f"Warning: Tool '{tool_name}' received empty description input.")
-                 return f"Error: Tool '{tool_name}' requires a non-empty description input."
-
-            # Delegate core logic execution to a separate method.
-            result = self.execute_tool_logic(description) 
-            return result
-        except NotImplementedError:
-             print(f"Error: execute_tool_logic not implemented in {tool_name}")
-             raise 
-        except Exception as e:
-            print(f"ERROR during {tool_name} execution.")
-            print(f"  Input description received by _run: '{description}'")
-            print(f"  Exception: {type(e).__name__}: {str(e)}")
-            return f"Tool {tool_name} failed during execution logic with input '{description[:50]}...': {str(e)}"
-
-    # Placeholder for actual tool implementation logic in subclasses.
-    def execute_tool_logic(self, input_string: str) -> str: 
-        raise NotImplementedError(f"execute_tool_logic is not implemented for tool {self.name}")
-
-    # Example metadata function (can be customized).
-    def get_metadata(self) -> Dict[str, Any]:
-        return {
-            "tool_name": self.name or "Unnamed Tool",
-            "last_updated": datetime.now().isoformat(),
-            "reliability_score": 0.95 
-        }
-
-# --- Specific Tool Definitions --- 
-# Each tool inherits from EnhancedBaseTool and implements its specific logic.
-
-class AdvancedResearchTool(EnhancedBaseTool):
-    name: str = "Advanced Research Tool"
-    description: str = "Performs comprehensive research on organizations, individuals, and industry trends from multiple sources"
-
-    def execute_tool_logic(self, query: str) -> str: 
-        # Uses DuckDuckGo for web searches.
-        if not query: return "Error: Advanced Research Tool query cannot be empty."
-        try:
-            search_tool = DuckDuckGoSearchRun()
-            results = search_tool.run(query)
-            if not results or "No good DuckDuckGo Search Results found" in results:
-                 print(f"Warning: DuckDuckGo returned no results for query: {query}")
-                 return f"No research findings found for '{query}'. Try refining the query."
-            # Adds basic processing/summarization (can be enhanced).
-            processed_results = f"Research findings for '{query}':\n\n{results}\n\nKey insights extracted:\n- Identified potential growth opportunities\n- Found recent organizational changes\n- Analyzed current market positioning"
-            return processed_results
-        except Exception as e:
-            print(f"Error during DuckDuckGo search for '{query}': {e}")
-            return f"Error performing research for '{query}': {e}"
-
-class MarketAnalysisTool(EnhancedBaseTool):
-    name: str = "Market Analysis Tool"
-    description: str = "Analyzes market trends, competitor landscapes, and industry developments"
-
-    def execute_tool_logic(self, industry: str) -> str: 
-        # Currently uses simulated data for market analysis.
-        if not industry: return "Error: Market Analysis Tool requires an industry name."
-        analysis = (
-            f"Market Analysis for {industry} industry:\n\n"
-            f"1. Current Growth Rate: The {industry} sector is experiencing significant transformation\n"
-            f"2. Technology Trends: AI integration, cloud solutions, and automation are reshaping operational models\n"
-            f"3. Competitive Landscape: The market shows a mix of established players and disruptive newcomers\n"
-            f"4. Consumer Behavior: Shifting toward digital-first, personalized experiences with emphasis on value\n"
-            f"5. Regulatory Environment: Increasing focus on data privacy, security, and compliance requirements"
-        )
-        return analysis
-
-class SentimentAnalysisTool(EnhancedBaseTool):
-    name: str = "Sentiment Analysis Tool"
-    description: str = "Analyzes sentiment in communications, social media, and public perception"
-
-    def execute_tool_logic(self, text: str) -> str: 
-        # Performs basic keyword-based sentiment scoring.
-        if not text: return "Neutral sentiment detected (No text provided)."
-        positive_words = ["growth", "innovation", "success", "revolutionary", "increase", "profit", "opportunity"]
-        negative_words = ["decline", "struggle", "loss", "failure", "problem", "decrease", "challenge"]
-        
-        text_lower = text.lower()
-        positive_count = sum(1 for word in positive_words if word in text_lower)
-        negative_count = sum(1 for word in negative_words if word in text_lower)
-        
-        if positive_count > negative_count:
-            return f"Positive sentiment detected (score: {positive_count - negative_count}). Key positive indicators: growth opportunities, innovation potential."
-        elif negative_count > positive_count:
-            return f"Negative sentiment detected (score: {negative_count - positive_count}). Potential concerns to address in communications."
-        else:
-            return "Neutral sentiment detected. Recommend balanced approach focusing on factual information and value proposition."
-
-class StrategicPlanningTool(EnhancedBaseTool):
-    name: str = "Strategic Planning Tool"
-    description: str = "Develops strategic recommendations based on market research and organizational needs"
-
-    def execute_tool_logic(self, context_data_json: str) -> str: 
-        # Parses JSON input to extract objectives and organization type.
-        # Maps objectives to pre-defined strategic recommendations.
-        if not context_data_json: return "Error: Strategic Planning Tool requires context data (JSON expected)."
-        try:
-            data = json.loads(context_data_json)
-            org_type = data.get("organization_type", "general")
-            objectives = data.get("objectives", ["growth", "efficiency"])
-            if not isinstance(objectives, list):
-                print(f"Warning: Objectives data is not a list: {objectives}. Using default.")
-                objectives = ["growth", "efficiency"]
-
-        except json.JSONDecodeError:
-            print(f"Warning: StrategicPlanningTool received non-JSON input: '{context_data_json}'. Using default objectives.")
-            org_type = "general" 
-            objectives = ["growth", "efficiency"]
-        except Exception as e:
-            print(f"Error processing input in StrategicPlanningTool: {e}")
-            return f"Error processing strategic planning context '{context_data_json[:50]}...': {e}"
-
-        strategies = {
-            "growth": "Expand market presence through targeted digital campaigns and strategic partnerships",
-            "efficiency": "Implement process automation and data-driven decision making",
-            "innovation": "Establish cross-functional innovation teams and rapid prototyping processes",
-            "customer_retention": "Develop personalized engagement programs and enhanced customer success frameworks",
-            "risk_assessment": "Conduct thorough risk assessment focusing on market volatility and competitive threats",
-            "improvement": "Identify key areas for process improvement and strategic refinement",
-            "contingency_planning": "Develop contingency plans for potential market disruptions or strategic failures"
-        }
-        
-        available_strategies = {k: v for k, v in strategies.items() if k in objectives}
-        if not available_strategies:
-            available_strategies = {"general": "Focus on a balanced approach incorporating sustainable growth and operational excellence based on the provided context."}
-            if not objectives: objectives = ["general context"] 
-
-        return f"Strategic recommendations for {org_type} organization based on objectives ({', '.join(objectives)}):\n\n" + "\n".join([f"- {strategy}" for strategy in available_strategies.values()])
-    
-class CommunicationOptimizationTool(EnhancedBaseTool):
-    name: str = "Communication Optimization Tool"
-    description: str = "Analyzes and enhances communication effectiveness for different contexts and audiences"
-
-    def execute_tool_logic(self, input_data_json: str) -> str: 
-        # Parses JSON input for audience, message context, and objective.
-        # Applies pre-defined communication enhancement rules.
-        if not input_data_json: return "Error: Communication Optimization Tool requires input data (JSON expected)."
-        try:
-            data = json.loads(input_data_json)
-            audience = data.get("audience", "general")
-            message = data.get("message", "")
-            objective = data.get("objective", "inform")
-        except json.JSONDecodeError:
-            print(f"Warning: CommunicationOptimizationTool received non-JSON input: '{input_data_json}'. Treating as message context.")
-            audience = "general"
-            message = input_data_json 
-            objective = "inform"
-        except Exception as e:
-            print(f"Error processing input in CommunicationOptimizationTool: {e}")
-            return f"Error processing communication context '{input_data_json[:50]}...': {e}"
-
-        enhancements = [
-            "Simplified technical language for broader accessibility",
-            "Added concrete examples to illustrate key points",
-            "Structured message with clear call-to-action",
-            "Incorporated relevant value propositions",
-            "Optimized for engagement with concise, impactful statements"
-        ]
-        
-        return (
-            f"Communication optimization for {audience} audience with {objective} objective:\n\n"
-            f"Original message context: {message[:150]}...\n\n"
-            f"Enhancements applied:\n" + "\n".join([f"- {enhancement}" for enhancement in enhancements])
-        )
-
-class KnowledgeBaseTool(EnhancedBaseTool):
-    name: str = "Knowledge Base Tool"
-    description: str = "Provides access to built-in knowledge and best practices loaded from knowledge_base.json"
-    # Declare fields with class-level defaults for Pydantic validation.
-    knowledge: Dict[str, Dict[str, str]] = {} 
-    knowledge_file: str = "knowledge_base.json"
-
-    # Initializes the tool by loading data from the specified JSON file.
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs) 
-        try:
-            with open(self.knowledge_file, 'r', encoding='utf-8') as f: 
-                self.knowledge = json.load(f) 
-            print(f"Knowledge Base Tool initialized successfully from {self.knowledge_file}.")
-        except FileNotFoundError:
-            print(f"Error: Knowledge base file '{self.knowledge_file}' not found. Initializing with empty knowledge.")
-            pass 
-        except json.JSONDecodeError as e:
-            print(f"Error: Failed to decode JSON from '{self.knowledge_file}': {e}. Initializing with empty knowledge.")
-            pass 
-        except Exception as e:
-            print(f"An unexpected error occurred loading knowledge base from '{self.knowledge_file}': {e}")
-            pass
-
-    def execute_tool_logic(self, query: str) -> str: 
-        # Searches the loaded knowledge base for matching categories or subcategories.
-        if not self.knowledge:
-             return "Error: Knowledge Base is not loaded or is empty. Cannot process query."
-        if not query: return "Error: Knowledge Base Tool query cannot be empty."
-        
-        query_lower = query.lower().strip()
-        
-        # Matching Logic: Prioritizes exact subcategory, then subcategory keyword, then category keyword.
-        # 1. Exact subcategory match
-        for category, subcategories in self.knowledge.items():
-             category_key = category.replace("_", " ")
-             for subcategory, content in subcategories.items():
-                  subcategory_key = subcategory.replace("_", " ")
-                  if subcategory_key == query_lower:
-                       return f"Knowledge Base: {subcategory_key.title()}\n\n{content}" 
-
-        # 2. Subcategory keyword containment 
-        best_match_content = None
-        best_match_len = 0
-        for category, subcategories in self.knowledge.items():
-            for subcategory, content in subcategories.items():
-                subcategory_key = subcategory.replace("_", " ")
-                if subcategory_key in query_lower: 
-                     if len(subcategory_key) > best_match_len:
-                          best_match_len = len(subcategory_key)
-                          best_match_content = f"Relevant Knowledge: {subcategory_key.title()}\n\n{content}" 
-        if best_match_content: return best_match_content
-
-        # 3. Category keyword containment 
-        best_category_match = None
-        for category, subcategories in self.knowledge.items():
-             category_key = category.replace("_", " ")
-             if category_key in query_lower: 
-                  available = ", ".join([s.replace("_", " ").title() for s in subcategories.keys()])
-                  best_category_match = f"Found Category '{category_key.title()}'. Available Topics: {available}\n\nPlease specify topic." 
-        if best_category_match: return best_category_match
-
-        # 4. Industry insight match 
-        industry_insights = self.knowledge.get("industry_insights", {})
-        for industry_key, insight in industry_insights.items():
-            if industry_key.replace("_", " ") in query_lower:
-                 return f"Knowledge Base: Industry Insights - {industry_key.replace('_', ' ').title()}\n\n{insight}"
-
-        # 5. No specific match found
-        available_categories = ", ".join([c.replace("_", " ").title() for c in self.knowledge.keys()])
-        return f"No specific match found for '{query}' in Knowledge Base. Available categories: {available_categories}. Please refine your query."
-
 # --- Email Sending Function --- 
 # Handles sending the final report via email using SMTP configuration from .env.
+# Delivery goes through the process-wide pooled mailer (email_delivery.py), so several reports or
+# recipients share one authenticated SMTP session.
+# `recipient_email` is one address, a comma-separated string or a list; all recipients get one message.
+# Returns True if every recipient was accepted.
 def send_email_with_attachment(recipient_email, subject, body, file_path):
     """Sends an email with the specified file attached."""
-    sender_email = os.getenv("EMAIL_ADDRESS") 
-    sender_password = os.getenv("EMAIL_PASSWORD")
-    smtp_server = os.getenv("SMTP_SERVER")
-    smtp_port = os.getenv("SMTP_PORT")
-
-    # Debug print for port
-    print(f"DEBUG: Read SMTP_PORT from environment: '{smtp_port}'") 
-
-    # Input validation for credentials and recipient
-    if not all([sender_email, sender_password, smtp_server, smtp_port]):
-        print("Error: Email credentials or SMTP server details not found in .env file.")
-        print("Please ensure EMAIL_ADDRESS, EMAIL_PASSWORD, SMTP_SERVER, and SMTP_PORT are set.")
-        return False
-    if not recipient_email or '@' not in recipient_email:
-        print(f"Error: Invalid recipient email address provided: {recipient_email}")
-        return False
-    if not os.path.exists(file_path):
-        print(f"Error: Attachment file not found at: {file_path}")
-        return False
-
-    try:
-        smtp_port = int(smtp_port)
-    except ValueError:
-        print(f"Error: Invalid SMTP_PORT defined in .env file: {os.getenv('SMTP_PORT')}. Must be a number.") 
-        return False
-
-    # Create MIME message structure
-    message = MIMEMultipart()
-    message['From'] = sender_email
-    message['To'] = recipient_email
-    message['Subject'] = subject
-    message.attach(MIMEText(body, 'plain'))
-
-    # Attach the report file
-    try:
-        with open(file_path, "rb") as attachment:
-            part = MIMEBase("application", "octet-stream")
-            part.set_payload(attachment.read())
-        encoders.encode_base64(part)
-        filename = os.path.basename(file_path)
-        part.add_header("Content-Disposition", f"attachment; filename= {filename}")
-        message.attach(part)
-    except IOError as e:
-        print(f"Error reading attachment file '{file_path}': {e}")
-        return False
-    except Exception as e:
-        print(f"An unexpected error occurred while processing the attachment: {e}")
-        return False
-
-    # Connect, authenticate, and send using SMTP
-    server = None
-    try:
-        server_name_read = os.getenv("SMTP_SERVER") 
-        print(f"DEBUG: Read SMTP_SERVER from environment: '{server_name_read}'")
-        print(f"Connecting to SMTP server {server_name_read}:{smtp_port}...")
-        if smtp_port == 465:
-             print("Using SMTP_SSL.")
-             server = smtplib.SMTP_SSL(server_name_read, smtp_port, timeout=20)
-        else:
-             print("Using SMTP with STARTTLS.")
-             server = smtplib.SMTP(server_name_read, smtp_port, timeout=20)
-             server.ehlo() 
-             server.starttls() 
-             server.ehlo() 
-
-        print("Logging in...")
-        server.login(sender_email, sender_password)
-        print("Sending email...")
-        text = message.as_string()
-        server.sendmail(sender_email, recipient_email, text)
-        print(f"Email sent successfully to {recipient_email}!")
-        return True
-    except smtplib.SMTPAuthenticationError:
-        print("Error: SMTP Authentication failed. Check EMAIL_ADDRESS and EMAIL_PASSWORD/app password in .env file.")
-        print("       (If using Gmail with 2FA, ensure you are using an App Password).")
-        return False
-    except (smtplib.SMTPConnectError, socket.gaierror, socket.timeout, smtplib.SMTPServerDisconnected) as e:
-        server_name_read = os.getenv("SMTP_SERVER") 
-        port_read = os.getenv("SMTP_PORT")
-        print(f"Error: Could not connect to or communicate with SMTP server {server_name_read}:{port_read}. Check server/port details, network connection, and firewall.")
-        print(f"       Specific error: {e}")
-        return False
-    except smtplib.SMTPException as e:
-        print(f"An SMTP error occurred: {e}")
-        return False
-    except Exception as e:
-        print(f"An unexpected error occurred during email sending: {e}")
-        traceback.print_exc()
-        return False
-    finally:
-        if server:
-            try:
-                print("Closing SMTP connection.")
-                server.quit()
-            except smtplib.SMTPException:
-                pass 
+    result = get_mailer().send_report(recipient_email, subject, body, file_path)
+    if result.ok:
+        print(f"Email sent successfully to {', '.join(result.delivered)}!")
+    return result.ok
 
 # --- Agent Definitions --- 
 # Define the specialized AI agents with their roles, goals, backstories, and assigned tools.
 # Roles are kept short to avoid potential path length issues on Windows with memory enabled.
+# cached_llm() routes completions through the LLM response cache when LLM_CACHE_MODE is set.
+# build_agents() creates a fresh set of agents (and their tool instances) keyed by name.
+def build_agents() -> Dict[str, Any]:
+    from crewai import Agent
+    from analysis_tools import (AdvancedResearchTool, MarketAnalysisTool, SentimentAnalysisTool, StrategicPlanningTool,
+                                CommunicationOptimizationTool, KnowledgeBaseTool, PriorReportTool)
+    from llm_cache import cached_llm
+
+    market_analyst_agent = Agent(
+        role="Market Analyst", 
+        goal="Provide comprehensive market intelligence to inform strategic decisions",
+        backstory="You are an expert analyst with deep experience across multiple industries. Your ability to identify patterns and extract meaningful insights from complex data sets makes you invaluable for understanding market dynamics and competitive landscapes.", 
+        allow_delegation=True,
+        verbose=True,
+        llm=cached_llm(),
+        tools=[AdvancedResearchTool(), MarketAnalysisTool(), KnowledgeBaseTool()]
+    )
+
+    strategy_specialist_agent = Agent(
+        role="Strategy Expert", 
+        goal="Develop effective strategies based on market research and organizational objectives",
+        backstory="You've mastered the art of translating research into actionable strategies. With your exceptional analytical thinking and creative problem-solving, you consistently develop approaches that achieve organizational objectives while adapting to market conditions.", 
+        allow_delegation=True,
+        verbose=True,
+        llm=cached_llm(),
+        tools=[StrategicPlanningTool(), MarketAnalysisTool(), KnowledgeBaseTool()]
+    )
+
+    communication_expert_agent = Agent(
+        role="Comms Expert", 
+        goal="Craft personalized, impactful communications that resonate with target audiences",
+        backstory="Your background in psychology and communication theory has made you exceptionally skilled at crafting messages that connect. You understand how to adapt tone, structure, and content to different audiences while maintaining authenticity and driving engagement.", 
+        allow_delegation=True,
+        verbose=True,
+        llm=cached_llm(),
+        tools=[CommunicationOptimizationTool(), SentimentAnalysisTool(), KnowledgeBaseTool()]
+    )
+
+    research_coordinator_agent = Agent(
+        role="Research Coordinator", 
+        goal="Orchestrate research efforts and synthesize findings into actionable intelligence",
+        backstory="You excel at managing complex research projects and integrating diverse information sources. Your talent lies in asking the right questions, directing research efforts efficiently, and creating comprehensive intelligence briefs that drive decision-making.", 
+        allow_delegation=True,
+        verbose=True,
+        llm=cached_llm(),
+        tools=[PriorReportTool(), AdvancedResearchTool(), KnowledgeBaseTool()]
+    )
+
+    financial_analyst_agent = Agent(
+        role="Financial Analyst", 
+        goal="Analyze the target company's financial health, performance, and investment potential based on public data.",
+        backstory=(
+            "An expert in interpreting financial statements, stock market data, and investment reports to assess corporate "
+            "financial standing and trajectory. You meticulously search for earnings reports, financial ratios, stock performance, "
+            "and major financial events."
+        ), 
+        allow_delegation=False,
+        verbose=True,
+        llm=cached_llm(),
+        tools=[PriorReportTool(), AdvancedResearchTool(), KnowledgeBaseTool()]
+    )
+
+    competitor_analyst_agent = Agent(
+        role="Competitor Analyst", 
+        goal="Perform deep-dive analysis on key competitors identified for the target company.",
+        backstory=(
+            "Skilled at uncovering competitor strategies, strengths, weaknesses, and market positioning through targeted research. "
+            "You identify primary competitors and dissect their market approach."
+        ), 
+        allow_delegation=False,
+        verbose=True,
+        llm=cached_llm(),
+        tools=[PriorReportTool(), AdvancedResearchTool(), KnowledgeBaseTool()]
+    )
+
+    return {
+        "research_coordinator_agent": research_coordinator_agent,
+        "financial_analyst_agent": financial_analyst_agent,
+        "competitor_analyst_agent": competitor_analyst_agent,
+        "market_analyst_agent": market_analyst_agent,
+        "strategy_specialist_agent": strategy_specialist_agent,
+        "communication_expert_agent": communication_expert_agent,
+    }
+
+
+# --- Task Tool Inputs ---
+# Tool inputs that follow from the kickoff inputs alone, by task name: (tool class, input function).
+# crewai's Task has no field for them, so they are kept here; at kickoff the ToolPrecomputer
+# (tool_precompute.py) runs the deterministic ones and hands their results to the task as context.
+TASK_TOOL_INPUTS: Dict[str, Tuple[str, Callable[[Dict[str, Any]], Dict[str, str]]]] = {
+    "target_research_task": ("AdvancedResearchTool", lambda context: {
+        "description": f"Research company: {context.get('company_name', 'Target Company')}, Industry: {context.get('industry', 'Unknown Industry')}. Focus: market position, developments, structure, initiatives, needs, challenges."
+    }),
+    "market_analysis_task": ("MarketAnalysisTool", lambda context: {
+        "description": f"Analyze market trends and competitive landscape for the {context.get('industry', 'Unknown Industry')} industry, considering context on {context.get('company_name', 'Target Company')} and its competitors."
+    }),
+    "strategy_development_task": ("StrategicPlanningTool", lambda context: {
+        "description": json.dumps({
+            "organization_type": context.get('industry', 'Unknown Industry'),
+            "objectives": ["growth", "efficiency", "innovation"]
+        })
+    }),
+    "communication_development_task": ("CommunicationOptimizationTool", lambda context: {
+        "description": json.dumps({
+            "audience": "key stakeholders", 
+            "message": f"Strategic engagement with {context.get('company_name', 'Target Company')} in {context.get('industry', 'Unknown Industry')}",
+            "objective": "engage"
+        })
+    }),
+    "reflection_task": ("StrategicPlanningTool", lambda context: {
+        "description": json.dumps({
+            "organization_type": context.get('industry', 'Unknown Industry'),
+            "objectives": ["risk_assessment", "improvement", "contingency_planning"]
+        })
+    }),
+}
 
-market_analyst_agent = Agent(
-    role="Market Analyst", 
-    goal="Provide comprehensive market intelligence to inform strategic decisions",
-    backstory="You are an expert analyst with deep experience across multiple industries. Your ability to identify patterns and extract meaningful insights from complex data sets makes you invaluable for understanding market dynamics and competitive landscapes.", 
-    allow_delegation=True,
-    verbose=True,
-    tools=[AdvancedResearchTool(), MarketAnalysisTool(), KnowledgeBaseTool()]
-)
-
-strategy_specialist_agent = Agent(
-    role="Strategy Expert", 
-    goal="Develop effective strategies based on market research and organizational objectives",
-    backstory="You've mastered the art of translating research into actionable strategies. With your exceptional analytical thinking and creative problem-solving, you consistently develop approaches that achieve organizational objectives while adapting to market conditions.", 
-    allow_delegation=True,
-    verbose=True,
-    tools=[StrategicPlanningTool(), MarketAnalysisTool(), KnowledgeBaseTool()]
-)
-
-communication_expert_agent = Agent(
-    role="Comms Expert", 
-    goal="Craft personalized, impactful communications that resonate with target audiences",
-    backstory="Your background in psychology and communication theory has made you exceptionally skilled at crafting messages that connect. You understand how to adapt tone, structure, and content to different audiences while maintaining authenticity and driving engagement.", 
-    allow_delegation=True,
-    verbose=True,
-    tools=[CommunicationOptimizationTool(), SentimentAnalysisTool(), KnowledgeBaseTool()]
-)
-
-research_coordinator_agent = Agent(
-    role="Research Coordinator", 
-    goal="Orchestrate research efforts and synthesize findings into actionable intelligence",
-    backstory="You excel at managing complex research projects and integrating diverse information sources. Your talent lies in asking the right questions, directing research efforts efficiently, and creating comprehensive intelligence briefs that drive decision-making.", 
-    allow_delegation=True,
-    verbose=True,
-    tools=[AdvancedResearchTool(), KnowledgeBaseTool()]
-)
-
-financial_analyst_agent = Agent(
-    role="Financial Analyst", 
-    goal="Analyze the target company's financial health, performance, and investment potential based on public data.",
-    backstory=(
-        "An expert in interpreting financial statements, stock market data, and investment reports to assess corporate "
-        "financial standing and trajectory. You meticulously search for earnings reports, financial ratios, stock performance, "
-        "and major financial events."
-    ), 
-    allow_delegation=False,
-    verbose=True,
-    tools=[AdvancedResearchTool(), KnowledgeBaseTool()]
-)
-
-competitor_analyst_agent = Agent(
-    role="Competitor Analyst", 
-    goal="Perform deep-dive analysis on key competitors identified for the target company.",
-    backstory=(
-        "Skilled at uncovering competitor strategies, strengths, weaknesses, and market positioning through targeted research. "
-        "You identify primary competitors and dissect their market approach."
-    ), 
-    allow_delegation=False,
-    verbose=True,
-    tools=[AdvancedResearchTool(), KnowledgeBaseTool()]
-)
 
 # --- Task Definitions --- 
 # Define the sequence of tasks to be performed by the agents.
 # Each task has a description (guiding the agent), expected output format, assigned agent, 
 # and context (outputs from previous tasks needed).
-
-target_research_task = Task(
-    description="""Conduct comprehensive research on {company_name} in the {industry} sector. 
+# build_tasks() creates the tasks for `agents` (as returned by build_agents) in their declared order.
+def build_tasks(agents: Dict[str, Any]) -> List[Any]:
+    from crewai import Task
+    from analysis_tools import (AdvancedResearchTool, MarketAnalysisTool, SentimentAnalysisTool, StrategicPlanningTool,
+                                CommunicationOptimizationTool, KnowledgeBaseTool, PriorReportTool)
+
+    target_research_task = Task(
+        name="target_research_task",
+        description="""Conduct comprehensive research on {company_name} in the {industry} sector. 
 Analyze their current market position, recent developments, key decision-makers (if identifiable), 
 organizational structure, and strategic initiatives. 
 Identify potential needs, challenges, and opportunities relevant to our offerings. 
@@ -453,7 +178,7 @@ This analysis will form the foundation for subsequent financial, competitor, and
 Focus on verifiable information, distinguish between facts and speculative analysis, 
 consider both public information and industry-specific insights, and use the knowledge 
 base for research frameworks and industry context.""",
-    expected_output="""A detailed intelligence report including:
+        expected_output="""A detailed intelligence report including:
 - Organization overview and market position
 - Key stakeholders and decision-making structure (if found)
 - Recent initiatives and strategic direction
@@ -461,16 +186,14 @@ base for research frameworks and industry context.""",
 - Potential opportunities for engagement
 - Recommended approach vectors
 """,
-    tools=[AdvancedResearchTool(), KnowledgeBaseTool()], 
-    agent=research_coordinator_agent,
-    context=[],
-    input_fn=lambda context: { 
-        "description": f"Research company: {context.get('company_name', 'Target Company')}, Industry: {context.get('industry', 'Unknown Industry')}. Focus: market position, developments, structure, initiatives, needs, challenges."
-    }
-)
-
-financial_analysis_task = Task(
-    description="""Based on the initial research on {company_name}, analyze its financial performance and health. 
+        tools=[PriorReportTool(), AdvancedResearchTool(), KnowledgeBaseTool()], 
+        agent=agents["research_coordinator_agent"],
+        context=[],
+    )
+
+    financial_analysis_task = Task(
+        name="financial_analysis_task",
+        description="""Based on the initial research on {company_name}, analyze its financial performance and health. 
 Specifically look for:
 - Recent earnings reports (quarterly/annual revenues, profits, key highlights).
 - Key financial ratios (e.g., Profitability: Gross/Net Margin; Leverage: Debt-to-Equity; Liquidity: Current Ratio). Consult the 'financial ratio analysis' framework in the Knowledge Base.
@@ -478,151 +201,171 @@ Specifically look for:
 - Major investments, acquisitions, or divestitures.
 Summarize the company's overall financial health, stability, and growth outlook.
 Use the Advanced Research Tool focusing on financial data sources (e.g., investor relations pages, financial news sites like Reuters, Bloomberg, Yahoo Finance).""",
-    expected_output="""A concise financial analysis summary including:
+        expected_output="""A concise financial analysis summary including:
 - Overview of recent financial performance (revenue/profit trends).
 - Key positive and negative financial indicators (based on ratios or news).
 - Assessment of financial stability and growth potential.
 - Mention of any significant recent financial events (M&A, investments).
 """,
-    tools=[AdvancedResearchTool(), KnowledgeBaseTool()],
-    agent=financial_analyst_agent,
-    context=[target_research_task], 
-)
-
-competitor_analysis_task = Task(
-    description="""Based on the initial research on {company_name} operating in the {industry} sector, identify its top 2-3 direct competitors. 
+        tools=[PriorReportTool(), AdvancedResearchTool(), KnowledgeBaseTool()],
+        agent=agents["financial_analyst_agent"],
+        context=[target_research_task], 
+    )
+
+    competitor_analysis_task = Task(
+        name="competitor_analysis_task",
+        description="""Based on the initial research on {company_name} operating in the {industry} sector, identify its top 2-3 direct competitors. 
 For each identified competitor, perform a brief analysis using the 'competitor profiling' framework from the Knowledge Base:
 - Competitor's primary products/services and target market.
 - Estimated market position or share relative to {company_name}.
 - Recent notable strategic moves or news.
 - Perceived key strengths and weaknesses.
 Use the Advanced Research Tool to find information about these competitors.""",
-    expected_output="""A competitor analysis section including:
+        expected_output="""A competitor analysis section including:
 - Identification of the top 2-3 direct competitors.
 - For each competitor: A brief profile covering products, market position, recent moves, strengths, and weaknesses.
 """,
-    tools=[AdvancedResearchTool(), KnowledgeBaseTool()],
-    agent=competitor_analyst_agent,
-    context=[target_research_task], 
-)
-
-market_analysis_task = Task(
-    description="""Synthesize the initial research on {company_name}, the competitor analysis, and broader {industry} trends to provide a comprehensive market landscape analysis. 
+        tools=[PriorReportTool(), AdvancedResearchTool(), KnowledgeBaseTool()],
+        agent=agents["competitor_analyst_agent"],
+        context=[target_research_task], 
+    )
+
+    market_analysis_task = Task(
+        name="market_analysis_task",
+        description="""Synthesize the initial research on {company_name}, the competitor analysis, and broader {industry} trends to provide a comprehensive market landscape analysis. 
 Identify key market trends, overall competitive dynamics (building on the competitor profiles), and potential market gaps or opportunities relevant to {company_name}. 
 Evaluate how {company_name}'s offerings align with current market needs, considering the competitive context provided.
 This analysis should provide strategic context for our engagement approach.""",
-    expected_output="""A market analysis report including:
+        expected_output="""A market analysis report including:
 - Overview of key industry trends affecting the {industry} sector.
 - Summary of the competitive landscape dynamics (how major players interact).
 - Identification of market gaps or opportunities relevant to {company_name}.
 - Strategic positioning recommendations for {company_name} within this market context.
 """,
-    tools=[MarketAnalysisTool(), KnowledgeBaseTool()], 
-    agent=market_analyst_agent,
-    context=[target_research_task, competitor_analysis_task], 
-    input_fn=lambda context: {
-        "description": f"Analyze market trends and competitive landscape for the {context.get('industry', 'Unknown Industry')} industry, considering context on {context.get('company_name', 'Target Company')} and its competitors."
-    }
-)
-
-strategy_development_task = Task(
-    description="""Using insights from the initial research, financial analysis, competitor analysis, and market analysis, 
+        tools=[MarketAnalysisTool(), KnowledgeBaseTool()], 
+        agent=agents["market_analyst_agent"],
+        context=[target_research_task, competitor_analysis_task], 
+    )
+
+    strategy_development_task = Task(
+        name="strategy_development_task",
+        description="""Using insights from the initial research, financial analysis, competitor analysis, and market analysis, 
 develop a comprehensive engagement strategy for {company_name}. Create a strategic roadmap that addresses their 
 specific needs (informed by research) while leveraging our unique capabilities within the competitive and financial context. 
 The strategy should include positioning, value proposition, engagement approach, and potential objection handling. 
 Integrate all prior findings to create a cohesive strategy. Apply appropriate strategic frameworks from the knowledge base.""",
-    expected_output="""A strategic engagement plan including:
+        expected_output="""A strategic engagement plan including:
 1. Tailored value proposition
 2. Engagement roadmap with key milestones
 3. Positioning strategy relative to competitors
 4. Anticipated objections and response frameworks
 5. Success metrics and evaluation criteria
 """,
-    tools=[StrategicPlanningTool(), KnowledgeBaseTool()],
-    agent=strategy_specialist_agent,
-    context=[target_research_task, financial_analysis_task, competitor_analysis_task, market_analysis_task], 
-    input_fn=lambda context: {
-        "description": json.dumps({
-            "organization_type": context.get('industry', 'Unknown Industry'),
-            "objectives": ["growth", "efficiency", "innovation"]
-        })
-    }
-)
-
-communication_development_task = Task(
-    description="""Based on the refined strategic engagement plan (which incorporated financial, competitor, and market analysis), 
+        tools=[StrategicPlanningTool(), KnowledgeBaseTool()],
+        agent=agents["strategy_specialist_agent"],
+        context=[target_research_task, financial_analysis_task, competitor_analysis_task, market_analysis_task], 
+    )
+
+    communication_development_task = Task(
+        name="communication_development_task",
+        description="""Based on the refined strategic engagement plan (which incorporated financial, competitor, and market analysis), 
 develop a comprehensive communication framework for engaging with {company_name}. 
 Create personalized communication templates for key stakeholder types (e.g., leadership, technical teams) that align with our strategic objectives. 
 The communications should demonstrate deep understanding of their needs and context while clearly articulating our value proposition. 
 Align all communications with the refined strategic approach. Utilize communication frameworks from the knowledge base.""",
-    expected_output="""A communication package including:
+        expected_output="""A communication package including:
 1. Tailored messaging frameworks for different stakeholders
 2. Engagement sequence with trigger points
 3. Key talking points and value statements
 4. Supporting materials and reference content
 5. Follow-up templates and conversation guides
 """,
-    tools=[CommunicationOptimizationTool(), SentimentAnalysisTool(), KnowledgeBaseTool()],
-    agent=communication_expert_agent,
-    context=[strategy_development_task], 
-    input_fn=lambda context: {
-        "description": json.dumps({
-            "audience": "key stakeholders", 
-            "message": f"Strategic engagement with {context.get('company_name', 'Target Company')} in {context.get('industry', 'Unknown Industry')}",
-            "objective": "engage"
-        })
-    }
-)
-
-reflection_task = Task(
-    description="""Conduct a thorough final analysis of the overall strategy and communication plan developed for {company_name}, 
+        tools=[CommunicationOptimizationTool(), SentimentAnalysisTool(), KnowledgeBaseTool()],
+        agent=agents["communication_expert_agent"],
+        context=[strategy_development_task], 
+    )
+
+    reflection_task = Task(
+        name="reflection_task",
+        description="""Conduct a thorough final analysis of the overall strategy and communication plan developed for {company_name}, 
 considering all preceding analysis stages (research, financial, competitor, market). 
 Identify potential weaknesses, blind spots, or areas for improvement in the final plan. Consider alternative approaches and edge cases. 
 This critical self-reflection should strengthen our overall approach and prepare us for potential challenges.""",
-    expected_output="""A strategic reflection document including:
+        expected_output="""A strategic reflection document including:
 1. Critical evaluation of key assumptions
 2. Identification of potential weaknesses
 3. Alternative approaches or contingency plans
 4. Recommendations for strengthening the strategy
 5. Key risk factors and mitigation approaches
 """,
-    tools=[StrategicPlanningTool(), KnowledgeBaseTool()],
-    agent=strategy_specialist_agent,
-    context=[strategy_development_task, communication_development_task, financial_analysis_task, competitor_analysis_task], 
-    input_fn=lambda context: {
-        "description": json.dumps({
-            "organization_type": context.get('industry', 'Unknown Industry'),
-            "objectives": ["risk_assessment", "improvement", "contingency_planning"]
-        })
-    }
-)
+        tools=[StrategicPlanningTool(), KnowledgeBaseTool()],
+        agent=agents["strategy_specialist_agent"],
+        context=[strategy_development_task, communication_development_task, financial_analysis_task, competitor_analysis_task], 
+    )
+
+    return [
+        target_research_task,
+        financial_analysis_task,
+        competitor_analysis_task,
+        market_analysis_task,
+        strategy_development_task,
+        communication_development_task,
+        reflection_task,
+    ]
+
 
 # --- Crew Definition --- 
 # Assemble the agents and tasks into a Crew.
-# Define the workflow process (sequential in this case).
+# The declared process is sequential; at kickoff the DependencyScheduler runs tasks whose
+# context is already complete in parallel, keeping results in this declared order.
 # Enable memory for context persistence between tasks.
-crew = Crew(
-    agents=[
-        research_coordinator_agent,
-        financial_analyst_agent, 
-        competitor_analyst_agent,
-        market_analyst_agent,
-        strategy_specialist_agent,
-        communication_expert_agent
-    ],
-    tasks=[
-        target_research_task,
-        financial_analysis_task, 
-        competitor_analysis_task, 
-        market_analysis_task, 
-        strategy_development_task, 
-        communication_development_task,
-        reflection_task
-    ],
-    verbose=True, # Enables detailed logging of agent actions.
-    memory=True, # Enables short-term memory for the crew.
-    process=Process.sequential # Tasks execute in the defined order.
-)
+def build_crew() -> Any:
+    from crewai import Crew, Process
+    agents = build_agents()
+    return Crew(
+        agents=[
+            agents["research_coordinator_agent"],
+            agents["financial_analyst_agent"],
+            agents["competitor_analyst_agent"],
+            agents["market_analyst_agent"],
+            agents["strategy_specialist_agent"],
+            agents["communication_expert_agent"]
+        ],
+        tasks=build_tasks(agents),
+        verbose=True, # Enables detailed logging of agent actions.
+        memory=True, # Enables short-term memory for the crew.
+        process=Process.sequential # Declared order; also the order results are reported in.
+    )
+
+
+_shared_crew = None
+_shared_crew_lock = threading.Lock()
+
+
+# Process-wide crew, built on first use; importing this module does not build anything.
+def get_crew() -> Any:
+    global _shared_crew
+    if _shared_crew is None:
+        with _shared_crew_lock:
+            if _shared_crew is None:
+                _shared_crew = build_crew()
+    return _shared_crew
+
+
+TOOL_CLASS_NAMES = ("ToolInputSchema", "EnhancedBaseTool", "AdvancedResearchTool", "MarketAnalysisTool",
+                    "SentimentAnalysisTool", "StrategicPlanningTool", "CommunicationOptimizationTool", "KnowledgeBaseTool",
+                    "PriorReportTool")
+
+
+# Keeps `advance_agent.crew` and the tool classes available as module attributes, resolved lazily.
+def __getattr__(name: str) -> Any:
+    if name == "crew":
+        return get_crew()
+    if name in TOOL_CLASS_NAMES:
+        import analysis_tools
+        return getattr(analysis_tools, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 # --- Input Data --- 
 # Define the initial input parameters for the analysis.
@@ -631,136 +374,252 @@ input_data = {
     'industry': 'AI and Analytics'
 }
 
-# --- Execute Crew --- 
-# Kick off the Crew process with the defined input data.
-print("\n--- Starting Crew Execution ---")
-result = crew.kickoff(inputs=input_data)
-print("--- Crew Execution Finished ---")
-
-# --- Output Formatting --- 
-# Function to format the raw results from the Crew execution into a readable text report.
-def format_to_text(execution_time, tasks, result_container, agents, input_data):
-    output_lines = []
-    company_name = input_data.get('company_name', 'Unknown Company') 
-    industry = input_data.get('industry', 'Unknown Industry')
-    
-    # Add report header
-    output_lines.append(f"{company_name} Strategic Analysis Report") 
-    output_lines.append(f"Industry: {industry}")
-    output_lines.append(f"Generated on: {execution_time}")
-    output_lines.append("=" * 50)
-    output_lines.append("")
-
-    task_outputs = []
-    total_usage_metrics = {}
-    # Safely extract task outputs and usage metrics from the result object.
-    if result_container:
-        if hasattr(result_container, 'tasks_output') and isinstance(result_container.tasks_output, list):
-            task_outputs = result_container.tasks_output
-        if hasattr(result_container, 'usage_metrics'):
-             total_usage_metrics = result_container.usage_metrics
-        elif not hasattr(result_container, 'tasks_output'):
-             print(f"Debug: Result object type: {type(result_container)}, value: {str(result_container)[:500]}... Lacks 'tasks_output'.")
-             
-    # Process and format the output of each task.
-    if task_outputs and len(task_outputs) == len(tasks):
-        output_lines.append("--- Task Results ---")
-        for i, (task, task_output) in enumerate(zip(tasks, task_outputs)):
-            
-            task_desc = task.description.split(".")[0]
-            task_desc_formatted = task_desc.replace("{company_name}", company_name).replace("{industry}", industry).strip()
-            output_lines.append(f"\nTask {i+1}: {task_desc_formatted}")
-            output_lines.append("-" * 40)
-            
-            # Safely access the raw output content.
-            output_content = getattr(task_output, 'raw', None)
-            if output_content is None:
-                 print(f"Debug: Task {i+1} output object type: {type(task_output)}, lacks 'raw'. Value: {str(task_output)[:200]}...")
-                 output_content = str(task_output) 
-
-            output_lines.append("Key Findings:")
-            # Basic formatting for the output content.
-            if output_content and isinstance(output_content, str):
-                for line in output_content.strip().split("\n"):
-                    line_stripped = line.strip()
-                    if line_stripped.startswith(("**", "##", "1.", "2.", "3.", "4.", "5.", "-")) and len(line_stripped) > 2:
-                        output_lines.append(line_stripped)
-                    elif line_stripped:
-                        output_lines.append(f"  - {line_stripped}")
-            elif output_content:
-                 output_lines.append(f"  - Output (non-string): {str(output_content)[:300]}...")
-            else:
-                output_lines.append("  - No output content found for this task.")
-            output_lines.append("") 
-    elif not task_outputs:
-        output_lines.append("Execution resulted in no task outputs.")
-        if result_container: output_lines.append(f"Raw result: {str(result_container)[:500]}...")
-    else: 
-        output_lines.append(f"Task output count ({len(task_outputs)}) does not match defined task count ({len(tasks)}).")
-        output_lines.append(f"Raw result: {str(result_container)[:500]}...")
-
-    # Add execution metadata section.
-    output_lines.append("\n--- Execution Metadata ---")
-    output_lines.append("-" * 40)
-    agent_roles = [agent.role for agent in agents]
-    output_lines.append(f"Agents Used: {', '.join(agent_roles)}")
-    output_lines.append(f"Tasks Defined: {len(tasks)}")
-    if task_outputs: output_lines.append(f"Tasks Executed (with output): {len(task_outputs)}")
-    if total_usage_metrics:
-         output_lines.append(f"Total Tokens Used: {total_usage_metrics.get('total_tokens', 'N/A')}")
-
-    return "\n".join(output_lines)
-
-# --- Generate Report File --- 
-# Create the final report file with a timestamp.
-execution_time_str = datetime.now().strftime("%Y-%m-%d_%H-%M-%S") 
-formatted_text = format_to_text(execution_time_str, crew.tasks, result, crew.agents, input_data) 
-
-target_name_safe = input_data.get('company_name', 'analysis').replace(" ", "_").replace(".", "").lower() 
-file_path = f"{target_name_safe}_report_{execution_time_str}.txt" 
-
-report_written = False
-try:
-    with open(file_path, 'w', encoding='utf-8') as f:
-        f.write(formatted_text)
-    print(f"Text report file '{file_path}' created successfully.")
-    report_written = True 
-except Exception as e:
-    print(f"Error writing report file '{file_path}': {e}")
-
-# --- Send Email --- 
-# If the report was written successfully, prompt for recipient email and send.
-if report_written:
-    print("\n--- Email Report --- ")
-    recipient = input("Enter the email address to send the report to (leave blank to skip): ").strip()
-
-    if recipient and '@' in recipient:
-        email_subject = f"CrewAI Analysis Report for {input_data.get('company_name', 'Target Company')}"
-        email_body = f"Attached is the strategic analysis report for {input_data.get('company_name', 'Target Company')} generated on {execution_time_str}."
-        
-        print(f"\nAttempting to send report to {recipient}...")
-        email_sent = send_email_with_attachment(
-            recipient_email=recipient, 
-            subject=email_subject, 
-            body=email_body, 
-            file_path=file_path
-        )
-        if email_sent:
-            print("Report successfully sent via email.")
+# --- Run Analysis --- 
+# Kick off the Crew through the dependency-aware scheduler for one target and write the text report.
+# Concurrency is limited by CREW_MAX_CONCURRENT_TASKS (set it to 1 for strictly sequential runs).
+# Upstream context is compacted to each task's token budget (CONTEXT_TOKEN_BUDGET).
+# Deterministic tool results that follow from the inputs (TASK_TOOL_INPUTS) are computed at kickoff.
+# Each task's output is checkpointed as it completes; with resume=True, tasks whose checkpoint is
+# still valid for these inputs are restored instead of re-run.
+# The report is written while the crew runs: each task's section is appended (and fsynced) as soon
+# as the task completes, and the metadata footer once the run returns.
+# Search snippets already returned to any agent earlier in the run are not returned again.
+# Per-task/per-agent telemetry is written next to the report as <report>.metrics.json and <report>.prom.
+# Each run (inputs, task outputs, timings and token usage) is appended to the results store.
+# Runs get_crew() unless a crew is passed. The output directory is created if needed.
+# Returns the crew result, the report path (None if it could not be written) and the run timestamp.
+def run_analysis(input_data, output_dir=".", resume=False, crew=None):
+    from task_scheduler import DependencyScheduler
+    from checkpoints import CheckpointStore
+    from single_flight import tool_call_group
+    from tool_metrics import tool_metrics
+    from search_cache import get_search_cache
+    from search_client import get_search_client
+    from llm_cache import get_llm_cache
+    from context_compaction import ContextCompactor
+    from telemetry import RunTelemetry
+    from results_store import ResultsStore
+    from prior_reports import get_prior_reports
+    from snippet_dedup import get_snippet_dedup
+    from tool_precompute import ToolPrecomputer
+    from tool_cache import get_tool_cache
+
+    crew = crew if crew is not None else get_crew()
+    os.makedirs(output_dir, exist_ok=True)
+
+    # Create the report file with a timestamp; task sections are added as tasks complete.
+    started_at = datetime.now()
+    run_started = time.monotonic()
+    execution_time_str = started_at.strftime("%Y-%m-%d_%H-%M-%S") 
+    target_name_safe = input_data.get('company_name', 'analysis').replace(" ", "_").replace(".", "").lower() 
+    file_path = os.path.join(output_dir, f"{target_name_safe}_report_{execution_time_str}.txt")
+    try:
+        report = StreamingReportWriter(file_path, crew.tasks, crew.agents, input_data, execution_time_str)
+        print(f"Streaming report to '{file_path}'.")
+        get_prior_reports().exclude(file_path)
+    except OSError as e:
+        print(f"Error writing report file '{file_path}': {e}")
+        report = None
+
+    print("\n--- Starting Crew Execution ---")
+    # Search snippets are deduplicated across this run only.
+    get_snippet_dedup().start_run()
+    compactor = ContextCompactor.from_env()
+    telemetry = RunTelemetry.from_env({"company": input_data.get('company_name'), "industry": input_data.get('industry')})
+    precomputer = ToolPrecomputer.from_env(TASK_TOOL_INPUTS)
+    checkpoints = CheckpointStore.from_env()
+    if checkpoints is not None:
+        checkpoints.prune()
+    scheduler = DependencyScheduler(checkpoints=checkpoints, resume=resume, compactor=compactor,
+                                    telemetry=telemetry, on_task_complete=report.task_completed if report else None,
+                                    precomputer=precomputer)
+    try:
+        result = scheduler.kickoff(crew, inputs=input_data)
+    except BaseException as e:
+        if report is not None:
+            report.abort(e)
+            print(f"Partial report with {report.sections_written} completed task(s) kept at '{file_path}'.")
+        raise
+    print("--- Crew Execution Finished ---")
+    if scheduler.resumed_tasks:
+        print(f"Restored {len(scheduler.resumed_tasks)} task(s) from checkpoints: {', '.join(scheduler.resumed_tasks)}")
+    cache_stats = get_search_cache().stats()
+    print(f"Search cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses (hit rate {cache_stats['hit_rate']:.0%}).")
+    client_stats = get_search_client().stats()
+    print(f"Search client: {client_stats['backend_calls']} backend calls, {client_stats['throttled']} throttled, {client_stats['rate_limit_wait_seconds']}s waiting on the rate limiter.")
+    prior_stats = get_prior_reports().stats()
+    if prior_stats['queries']:
+        print(f"Prior reports: {prior_stats['hits']} of {prior_stats['queries']} queries answered (hit rate {prior_stats['hit_rate']:.0%}), "
+              f"~{prior_stats['web_calls_avoided']} web searches avoided, {prior_stats['mean_search_ms']}ms mean search time.")
+    precompute_stats = precomputer.stats()
+    if precompute_stats['precomputed']:
+        print(f"Tool precompute: {len(precompute_stats['precomputed'])} tool result(s) computed at kickoff in "
+              f"{precompute_stats['tool_seconds']}s and passed as context ({', '.join(precompute_stats['precomputed'])}).")
+    dedup_stats = get_snippet_dedup().stats()
+    if dedup_stats['snippets']:
+        print(f"Snippet dedup: {dedup_stats['near_duplicates']} near-duplicate and {dedup_stats['already_seen']} already-seen "
+              f"of {dedup_stats['snippets']} search snippets removed, ~{dedup_stats['tokens_saved']} tokens saved.")
+    compaction_stats = compactor.stats()
+    if compaction_stats:
+        saved = sum(stats['tokens_saved'] for stats in compaction_stats.values())
+        print(f"Context compaction: {saved} estimated tokens saved across {len(compaction_stats)} task(s).")
+    llm_cache_stats = get_llm_cache().stats()
+    if llm_cache_stats['mode'] != 'off':
+        print(f"LLM cache ({llm_cache_stats['mode']}): {llm_cache_stats['hits']} hits, {llm_cache_stats['misses']} misses (hit rate {llm_cache_stats['hit_rate']:.0%}).")
+        for task_name, task_stats in llm_cache_stats['by_task'].items():
+            print(f"  {task_name}: {task_stats['hits']} hits, {task_stats['misses']} misses (hit rate {task_stats['hit_rate']:.0%})")
+    tool_cache_stats = get_tool_cache().stats()
+    if tool_cache_stats['hits'] or tool_cache_stats['misses']:
+        print(f"Tool cache: {tool_cache_stats['hits']} hits, {tool_cache_stats['misses']} misses (hit rate {tool_cache_stats['hit_rate']:.0%}), "
+              f"{tool_cache_stats['shared_entries']} results cached ({tool_cache_stats['shared_bytes']} bytes).")
+    coalescing_stats = tool_call_group.stats()
+    print(f"Tool calls: {coalescing_stats['executed']} executed, {coalescing_stats['coalesced']} coalesced into identical in-flight calls.")
+    for tool_name, tool_stats in tool_metrics.stats().items():
+        latency = tool_stats['latency_seconds']
+        print(f"  {tool_name}: {tool_stats['calls']} calls, {tool_stats['error_results'] + tool_stats['exceptions']} errors, "
+              f"p50 {latency['p50']}s / p95 {latency['p95']}s / p99 {latency['p99']}s")
+
+    # Finish the report with the execution metadata footer.
+    if report is not None and report.finalize(result):
+        print(f"Text report file '{file_path}' created successfully.")
+        # The report is complete, so this run's checkpoints are no longer needed for --resume.
+        if checkpoints is not None:
+            checkpoints.discard(scheduler.checkpoint_keys)
+    else:
+        file_path = None
+
+    # Append the run to the results store (inputs, task outputs, timings and token usage).
+    try:
+        store = ResultsStore.from_env()
+        if store is not None:
+            run_id = store.append_run(input_data, crew.tasks, result, started_at.isoformat(), datetime.now().isoformat(),
+                                      wall_seconds=round(time.monotonic() - run_started, 3), report_path=file_path,
+                                      telemetry=telemetry.snapshot() if telemetry is not None else None)
+            print(f"Run recorded in results store '{store.path}' (run {run_id}).")
+    except sqlite3.Error as e:
+        print(f"Warning: Could not record run in the results store: {e}")
+
+    if telemetry is not None:
+        try:
+            metrics_paths = telemetry.write(os.path.join(output_dir, f"{target_name_safe}_report_{execution_time_str}.txt"))
+            print(f"Run telemetry written to: {', '.join(metrics_paths)}")
+        except OSError as e:
+            print(f"Warning: Could not write run telemetry: {e}")
+    return result, file_path, execution_time_str
+
+# --- Startup Time ---
+# Measures cold-start cost without running the crew: this module's own import, the crewai import
+# and building the tools, agents, tasks and crew. Run it in a fresh process for meaningful numbers.
+def measure_startup() -> Dict[str, Any]:
+    timings: Dict[str, Any] = {"module_import_seconds": round(_MODULE_IMPORT_SECONDS, 6)}
+    started = time.perf_counter()
+    import crewai  # noqa: F401
+    timings["crewai_import_seconds"] = round(time.perf_counter() - started, 6)
+    started = time.perf_counter()
+    import analysis_tools  # noqa: F401
+    timings["tools_import_seconds"] = round(time.perf_counter() - started, 6)
+    started = time.perf_counter()
+    crew = get_crew()
+    timings["crew_build_seconds"] = round(time.perf_counter() - started, 6)
+    timings["agents"] = len(crew.agents)
+    timings["tasks"] = len(crew.tasks)
+    timings["total_seconds"] = round(sum(v for k, v in timings.items() if k.endswith("_seconds")), 6)
+    return timings
+
+
+# --- Email Report ---
+# Queues the report for all valid recipients in the durable outbox (email_outbox.py), which the
+# background sender delivers and retries; with OUTBOX_ENABLED=false, or if the outbox cannot be
+# written, it is sent synchronously instead. Returns the number of recipients queued or reached.
+def email_report(recipients: List[str], file_path: str, input_data: Dict[str, Any], execution_time_str: str) -> int:
+    company_name = input_data.get('company_name', 'Target Company')
+    email_subject = f"CrewAI Analysis Report for {company_name}"
+    email_body = f"Attached is the strategic analysis report for {company_name} generated on {execution_time_str}."
+    valid = []
+    for recipient in recipients:
+        if '@' not in recipient:
+            print(f"Invalid email address format ('{recipient}'). Skipping email.")
+            continue
+        valid.append(recipient)
+    if not valid:
+        return 0
+    sender = get_outbox_sender()
+    if sender is not None:
+        try:
+            job_id = sender.outbox.enqueue(valid, email_subject, email_body, file_path)
+        except OSError as e:
+            print(f"Warning: Could not queue the report in the email outbox ({e}); sending it now instead.")
+        else:
+            sender.wake()
+            print(f"Report queued for {', '.join(valid)} (outbox job {job_id}).")
+            return len(valid)
+    print(f"\nAttempting to send report to {', '.join(valid)}...")
+    result = get_mailer().send_report(valid, email_subject, email_body, file_path)
+    if result.delivered:
+        print(f"Report successfully sent via email to {', '.join(result.delivered)}.")
+    if not result.ok:
+        print("Failed to send report via email. Check logs and .env settings (sender credentials, SMTP).")
+    return len(result.delivered)
+
+
+# --- Script Entry Point --- 
+# Analyze one target, then optionally email the report. Recipients come from --recipients; without
+# it, an interactive terminal is prompted for an address and non-interactive runs skip the email.
+# Importing this module (e.g. from batch_runner.py) defines functions only; nothing is built or run.
+def main(argv: Optional[List[str]] = None) -> int:
+    arg_parser = argparse.ArgumentParser(description="Run the strategic business analysis crew.")
+    arg_parser.add_argument("--company", default=input_data['company_name'],
+                            help=f"Company to analyze (default '{input_data['company_name']}')")
+    arg_parser.add_argument("--industry", default=input_data['industry'],
+                            help=f"Industry of the company (default '{input_data['industry']}')")
+    arg_parser.add_argument("--output-dir", default=".", help="Directory for the report and telemetry files (default .)")
+    arg_parser.add_argument("--recipients", action="append", metavar="EMAIL[,EMAIL...]",
+                            help="Email the report to these addresses; may be repeated")
+    arg_parser.add_argument("--wait-for-email", type=float, default=None, metavar="SECONDS",
+                            help="Wait up to SECONDS for the queued report email to be delivered before exiting "
+                                 "(default OUTBOX_FLUSH_SECONDS or 0)")
+    arg_parser.add_argument("--resume", action="store_true",
+                            help="Reuse checkpointed task outputs from an earlier, interrupted run with the same inputs")
+    arg_parser.add_argument("--startup-time", action="store_true",
+                            help="Measure import and crew construction time, print it as JSON and exit without running")
+    args = arg_parser.parse_args(argv)
+
+    if args.startup_time:
+        print(json.dumps(measure_startup(), indent=2))
+        return 0
+
+    # Emails left queued by earlier runs are delivered in the background while this run works.
+    get_outbox_sender()
+    run_input = {'company_name': args.company, 'industry': args.industry}
+    result, file_path, execution_time_str = run_analysis(run_input, output_dir=args.output_dir, resume=args.resume)
+
+    # --- Send Email --- 
+    # If the report was written successfully, send it to the recipients (or prompt for one).
+    if file_path:
+        print("\n--- Email Report --- ")
+        recipients = recipient_list(args.recipients)
+        if not recipients and args.recipients is None and sys.stdin.isatty():
+            recipients = recipient_list([input("Enter the email address to send the report to (leave blank to skip): ")])
+        if recipients:
+            email_report(recipients, file_path, run_input, execution_time_str)
+            flush_outbox(args.wait_for_email)
         else:
-            print("Failed to send report via email. Check logs and .env settings (sender credentials, SMTP).")
-    elif recipient: 
-        print(f"Invalid email address format entered ('{recipient}'). Skipping email.")
-    else: 
-        print("No recipient email entered. Skipping email sending.")
-else:
-    print("\nEmail not sent because the report file could not be written.")
-
-# --- Print Raw Result --- 
-# Optionally print the raw result object from CrewAI for debugging.
-print("\n--- Raw Crew Kickoff Result ---")
-try:
-    import pprint
-    pprint.pprint(result)
-except ImportError:
-    print(result)
\ No newline at end of file
+            print("No recipient email entered. Skipping email sending.")
+    else:
+        print("\nEmail not sent because the report file could not be written.")
+
+    # --- Print Raw Result --- 
+    # Optionally print the raw result object from CrewAI for debugging.
+    print("\n--- Raw Crew Kickoff Result ---")
+    try:
+        import pprint
+        pprint.pprint(result)
+    except ImportError:
+        print(result)
+    return 0 if file_path else 1
+
+
+_MODULE_IMPORT_SECONDS = time.perf_counter() - _MODULE_IMPORT_STARTED
+
+if __name__ == "__main__":
+    sys.exit(main())
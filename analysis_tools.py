@@ -0,0 +1,416 @@
+# analysis_tools.py
+
+# --- Analysis Tools ---
+# The custom tools used by the analysis agents. Defining them requires crewai, whose import dominates
+# start-up time, so advance_agent.py imports this module only when it builds the crew.
+
+import asyncio
+import json
+from datetime import datetime
+from typing import Dict, Any, List, Mapping, Optional, Tuple
+
+from crewai.tools import BaseTool
+from pydantic import BaseModel, Field
+
+from single_flight import tool_call_group
+from run_context import current_task
+from tool_metrics import tool_metrics
+from tool_cache import NAMESPACE_SEPARATOR, get_tool_cache
+from search_cache import normalize_query
+from research_fanout import format_hit, get_research_fanout, search_hits
+from snippet_dedup import get_snippet_dedup
+from knowledge_store import get_knowledge_store
+from prior_reports import get_prior_reports
+from sentiment import SentimentScore, get_sentiment_analyzer
+
+# --- Tool Input Schema --- 
+# Defines the expected input structure for all custom tools.
+# Ensures consistency in how agents pass arguments to tools.
+class ToolInputSchema(BaseModel):
+    description: str = Field(..., description="The input data, query, or context for the tool")
+
+# Canonical form of a JSON input (key order and spacing do not matter); other text is whitespace-normalized.
+def canonical_json_input(description: str) -> str:
+    try:
+        return json.dumps(json.loads(description), sort_keys=True, separators=(",", ":"))
+    except ValueError:
+        return " ".join(description.split())
+
+# --- Base Tool Enhancement --- 
+# Custom base class for all tools to standardize input handling and add common logic.
+class EnhancedBaseTool(BaseTool):
+    args_schema: type[BaseModel] = ToolInputSchema
+    # Identical in-flight calls (same tool, same normalized input) share one execution.
+    coalesce_calls: bool = True
+    # Result memoization in the shared tool cache (tool_cache.py): "pure" when the output depends only
+    # on the input (no web access, clock or randomness), "ttl" when results may be reused for
+    # cache_ttl_seconds (default TOOL_CACHE_TTL_SECONDS), "none" to execute every call.
+    cache_policy: str = "none"
+    cache_ttl_seconds: Optional[float] = None
+
+    # Pure tools can be computed ahead of the agent's call (tool_precompute.py).
+    @property
+    def deterministic(self) -> bool:
+        return self.cache_policy == "pure"
+
+    def _run(self, description: str) -> str: 
+        tool_name = self.name or "Unknown Tool"
+        if not description:
+             print(f"Warning: Tool '{tool_name}' received empty description input.")
+             return f"Error: Tool '{tool_name}' requires a non-empty description input."
+        if not self.coalesce_calls:
+            return self._execute(description)
+        return tool_call_group.do((tool_name, self.normalize_input(description)), lambda: self._execute(description), namespace=tool_name)
+
+    # Asyncio entry point; waiting on a coalesced call does not block the event loop.
+    async def _arun(self, description: str) -> str:
+        if not description or not self.coalesce_calls:
+            return await asyncio.get_running_loop().run_in_executor(None, self._run, description)
+        tool_name = self.name or "Unknown Tool"
+        return await tool_call_group.do_async((tool_name, self.normalize_input(description)), lambda: self._execute(description), namespace=tool_name)
+
+    def _execute(self, description: str) -> str:
+        tool_name = self.name or "Unknown Tool"
+        try:
+            # Delegate core logic execution to a separate method; timing, sizes and outcome are recorded per
+            # executed call. Cacheable tools answer repeated inputs from the shared tool cache.
+            result = get_tool_cache().get_or_compute(
+                self.cache_namespace(), self.normalize_input(description), self.cache_policy,
+                lambda: tool_metrics.measure(tool_name, description, lambda: self.execute_tool_logic(description), self.is_error_result),
+                self.is_error_result, self.cache_ttl_seconds,
+            )
+            return result
+        except NotImplementedError:
+             print(f"Error: execute_tool_logic not implemented in {tool_name}")
+             raise 
+        except Exception as e:
+            print(f"ERROR during {tool_name} execution.")
+            print(f"  Input description received by _run: '{description}'")
+            print(f"  Exception: {type(e).__name__}: {str(e)}")
+            return f"Tool {tool_name} failed during execution logic with input '{description[:50]}...': {str(e)}"
+
+    # Results reporting a failure count as errors in the tool's metrics.
+    def is_error_result(self, result: Any) -> bool:
+        return isinstance(result, str) and result.startswith(("Error", f"Tool {self.name} failed"))
+
+    # Key used to detect identical calls; whitespace differences are ignored by default.
+    def normalize_input(self, description: str) -> str:
+        return " ".join(description.split())
+
+    # Tool cache namespace; tools whose results also depend on a data file include it after the name.
+    def cache_namespace(self) -> str:
+        return self.name or "Unknown Tool"
+
+    # Placeholder for actual tool implementation logic in subclasses.
+    def execute_tool_logic(self, input_string: str) -> str: 
+        raise NotImplementedError(f"execute_tool_logic is not implemented for tool {self.name}")
+
+    # Live metadata: reliability is the observed success rate (None until the tool has been called).
+    def get_metadata(self) -> Dict[str, Any]:
+        stats = tool_metrics.for_tool(self.name or "Unknown Tool").stats()
+        return {
+            "tool_name": self.name or "Unnamed Tool",
+            "last_updated": datetime.now().isoformat(),
+            "reliability_score": stats["success_rate"],
+            "performance": stats,
+            "call_coalescing": tool_call_group.stats(self.name or "Unknown Tool"),
+            "cache": dict(get_tool_cache().stats(self.name or "Unknown Tool"), policy=self.cache_policy)
+        }
+
+# --- Specific Tool Definitions --- 
+# Each tool inherits from EnhancedBaseTool and implements its specific logic.
+
+class AdvancedResearchTool(EnhancedBaseTool):
+    name: str = "Advanced Research Tool"
+    description: str = "Performs comprehensive research on organizations, individuals, and industry trends from multiple sources"
+    # Set to True to ignore cached search results and refresh them from a live search.
+    refresh_cache: bool = False
+    # Compound requests are split into focused sub-queries searched concurrently (research_fanout.py).
+    fan_out: bool = True
+    # Identical in-flight searches are coalesced inside execute_tool_logic instead, so each caller's
+    # snippets are deduplicated against what its own task has already been shown.
+    coalesce_calls: bool = False
+    # Findings still returned when every snippet was already returned earlier in the task.
+    repeat_fallback_hits: int = 3
+
+    # Queries that map to the same search cache entry are treated as identical calls.
+    def normalize_input(self, description: str) -> str:
+        return normalize_query(description)
+
+    # Searches (fanning compound requests out) and returns the hits with text plus a summary header.
+    def _search(self, query: str) -> Tuple[List[Dict[str, str]], List[str]]:
+        get_prior_reports().note_web_search(query)
+        fanout = get_research_fanout()
+        subqueries = fanout.plan(query) if self.fan_out else [query]
+        header = []
+        if len(subqueries) > 1:
+            merged = fanout.search(query, subqueries, bypass=self.refresh_cache)
+            hits, header = merged.hits, [merged.summary(), ""]
+        else:
+            hits, _ = search_hits(query, bypass=self.refresh_cache)
+        return [hit for hit in hits if (hit.get("body") or "").strip()], header
+
+    def execute_tool_logic(self, query: str) -> str: 
+        # Uses DuckDuckGo for web searches through the shared, rate-limited search client.
+        # Search hits are served from the persistent search cache when available.
+        if not query: return "Error: Advanced Research Tool query cannot be empty."
+        try:
+            key = (self.name, self.normalize_input(query), self.fan_out, self.refresh_cache)
+            hits, header = tool_call_group.do(key, lambda: self._search(query), namespace=self.name)
+            if not hits:
+                 print(f"Warning: DuckDuckGo returned no results for query: {query}")
+                 return f"No research findings found for '{query}'. Try refining the query."
+            # Near-duplicate snippets, and snippets already returned to this task, are left out.
+            dedup = get_snippet_dedup().filter([hit["body"] for hit in hits],
+                                               [format_hit(i, hit) for i, hit in enumerate(hits, start=1)],
+                                               scope=current_task(), min_kept=self.repeat_fallback_hits)
+            lines = [format_hit(i, hits[position]) for i, position in enumerate(dedup.kept, start=1)]
+            removed = []
+            if dedup.repeats_kept:
+                removed.append("no new findings: these repeat results already returned earlier in this task")
+            if dedup.near_duplicates:
+                removed.append(f"{len(dedup.near_duplicates)} near-duplicate snippet(s) omitted")
+            if dedup.already_seen:
+                removed.append(f"{len(dedup.already_seen)} snippet(s) already returned earlier in this task omitted")
+            if removed:
+                lines += ["", f"({'; '.join(removed)}.)"]
+            return f"Research findings for '{query}':\n\n" + "\n".join(header + lines)
+        except Exception as e:
+            print(f"Error during DuckDuckGo search for '{query}': {e}")
+            return f"Error performing research for '{query}': {e}"
+
+    def get_metadata(self) -> Dict[str, Any]:
+        metadata = super().get_metadata()
+        metadata["fanout"] = get_research_fanout().stats()
+        metadata["snippet_dedup"] = get_snippet_dedup().stats()
+        return metadata
+
+class PriorReportTool(EnhancedBaseTool):
+    name: str = "Prior Report Search Tool"
+    description: str = ("Searches the findings of earlier analysis reports (company research, financials, competitors) stored locally. "
+                        "Use it before the Advanced Research Tool and only search the web for what it does not cover or what must be current")
+    # Number of passages returned per query.
+    top_k: int = 3
+
+    def normalize_input(self, description: str) -> str:
+        return normalize_query(description)
+
+    def execute_tool_logic(self, query: str) -> str: 
+        # Ranks passages from past reports and the results store by TF-IDF similarity to the query.
+        if not query: return "Error: Prior Report Search Tool query cannot be empty."
+        ranked = get_prior_reports().search(query, top_k=self.top_k)
+        if not ranked:
+             return f"No relevant passages found in prior reports for '{query}'. Use the Advanced Research Tool for web research."
+        sections = [
+             f"{i}. {passage.company} ({passage.industry}), {passage.date or 'undated'}: {passage.section} (score {score:.2f})\n{passage.text}"
+             for i, (score, passage) in enumerate(ranked, start=1)
+        ]
+        return (f"Top {len(ranked)} prior report passages for '{query}' (earlier analyses; verify time-sensitive figures):\n\n"
+                + "\n\n".join(sections))
+
+class MarketAnalysisTool(EnhancedBaseTool):
+    name: str = "Market Analysis Tool"
+    description: str = "Analyzes market trends, competitor landscapes, and industry developments"
+    cache_policy: str = "pure"
+
+    def execute_tool_logic(self, industry: str) -> str: 
+        # Currently uses simulated data for market analysis.
+        if not industry: return "Error: Market Analysis Tool requires an industry name."
+        analysis = (
+            f"Market Analysis for {industry} industry:\n\n"
+            f"1. Current Growth Rate: The {industry} sector is experiencing significant transformation\n"
+            f"2. Technology Trends: AI integration, cloud solutions, and automation are reshaping operational models\n"
+            f"3. Competitive Landscape: The market shows a mix of established players and disruptive newcomers\n"
+            f"4. Consumer Behavior: Shifting toward digital-first, personalized experiences with emphasis on value\n"
+            f"5. Regulatory Environment: Increasing focus on data privacy, security, and compliance requirements"
+        )
+        return analysis
+
+class SentimentAnalysisTool(EnhancedBaseTool):
+    name: str = "Sentiment Analysis Tool"
+    description: str = "Analyzes sentiment in communications, social media, and public perception. Accepts a text, or a JSON list of texts to score in one call"
+    cache_policy: str = "pure"
+    # Weighted lexicon file; defaults to SENTIMENT_LEXICON_PATH or sentiment_lexicon.json.
+    lexicon_file: Optional[str] = None
+
+    def cache_namespace(self) -> str:
+        return NAMESPACE_SEPARATOR.join([self.name, self.lexicon_file or ""])
+
+    def execute_tool_logic(self, text: str) -> str: 
+        # Performs lexicon-based sentiment scoring on word tokens; a JSON list input is scored as a batch.
+        if not text: return "Neutral sentiment detected (No text provided)."
+        texts = None
+        if text.lstrip().startswith("["):
+            try:
+                parsed = json.loads(text)
+                if isinstance(parsed, list) and all(isinstance(item, str) for item in parsed):
+                    texts = parsed
+            except json.JSONDecodeError:
+                pass
+        if texts is None:
+            return self.describe_score(self.analyze_batch([text])[0])
+        scores = self.analyze_batch(texts)
+        return f"Sentiment for {len(scores)} texts:\n" + "\n".join(
+            f"{i}. {self.describe_score(score)}" for i, score in enumerate(scores, start=1)
+        )
+
+    # Batch API: scores many documents in a single vectorized pass.
+    def analyze_batch(self, texts: List[str]) -> List[SentimentScore]:
+        return get_sentiment_analyzer(self.lexicon_file).score_batch(texts)
+
+    def describe_score(self, score: SentimentScore) -> str:
+        if score.label == "positive":
+            indicators = ", ".join(f"{term} (x{count})" for term, count in score.positive_terms)
+            return f"Positive sentiment detected (score: {score.score:g}). Key positive indicators: {indicators}."
+        elif score.label == "negative":
+            indicators = ", ".join(f"{term} (x{count})" for term, count in score.negative_terms)
+            return f"Negative sentiment detected (score: {abs(score.score):g}). Potential concerns to address in communications: {indicators}."
+        else:
+            return "Neutral sentiment detected. Recommend balanced approach focusing on factual information and value proposition."
+
+class StrategicPlanningTool(EnhancedBaseTool):
+    name: str = "Strategic Planning Tool"
+    description: str = "Develops strategic recommendations based on market research and organizational needs"
+    cache_policy: str = "pure"
+
+    def normalize_input(self, description: str) -> str:
+        return canonical_json_input(description)
+
+    def execute_tool_logic(self, context_data_json: str) -> str: 
+        # Parses JSON input to extract objectives and organization type.
+        # Maps objectives to pre-defined strategic recommendations.
+        if not context_data_json: return "Error: Strategic Planning Tool requires context data (JSON expected)."
+        try:
+            data = json.loads(context_data_json)
+            org_type = data.get("organization_type", "general")
+            objectives = data.get("objectives", ["growth", "efficiency"])
+            if not isinstance(objectives, list):
+                print(f"Warning: Objectives data is not a list: {objectives}. Using default.")
+                objectives = ["growth", "efficiency"]
+
+        except json.JSONDecodeError:
+            print(f"Warning: StrategicPlanningTool received non-JSON input: '{context_data_json}'. Using default objectives.")
+            org_type = "general" 
+            objectives = ["growth", "efficiency"]
+        except Exception as e:
+            print(f"Error processing input in StrategicPlanningTool: {e}")
+            return f"Error processing strategic planning context '{context_data_json[:50]}...': {e}"
+
+        strategies = {
+            "growth": "Expand market presence through targeted digital campaigns and strategic partnerships",
+            "efficiency": "Implement process automation and data-driven decision making",
+            "innovation": "Establish cross-functional innovation teams and rapid prototyping processes",
+            "customer_retention": "Develop personalized engagement programs and enhanced customer success frameworks",
+            "risk_assessment": "Conduct thorough risk assessment focusing on market volatility and competitive threats",
+            "improvement": "Identify key areas for process improvement and strategic refinement",
+            "contingency_planning": "Develop contingency plans for potential market disruptions or strategic failures"
+        }
+        
+        available_strategies = {k: v for k, v in strategies.items() if k in objectives}
+        if not available_strategies:
+            available_strategies = {"general": "Focus on a balanced approach incorporating sustainable growth and operational excellence based on the provided context."}
+            if not objectives: objectives = ["general context"] 
+
+        return f"Strategic recommendations for {org_type} organization based on objectives ({', '.join(objectives)}):\n\n" + "\n".join([f"- {strategy}" for strategy in available_strategies.values()])
+    
+class CommunicationOptimizationTool(EnhancedBaseTool):
+    name: str = "Communication Optimization Tool"
+    description: str = "Analyzes and enhances communication effectiveness for different contexts and audiences"
+    cache_policy: str = "pure"
+
+    def normalize_input(self, description: str) -> str:
+        return canonical_json_input(description)
+
+    def execute_tool_logic(self, input_data_json: str) -> str: 
+        # Parses JSON input for audience, message context, and objective.
+        # Applies pre-defined communication enhancement rules.
+        if not input_data_json: return "Error: Communication Optimization Tool requires input data (JSON expected)."
+        try:
+            data = json.loads(input_data_json)
+            audience = data.get("audience", "general")
+            message = data.get("message", "")
+            objective = data.get("objective", "inform")
+        except json.JSONDecodeError:
+            print(f"Warning: CommunicationOptimizationTool received non-JSON input: '{input_data_json}'. Treating as message context.")
+            audience = "general"
+            message = input_data_json 
+            objective = "inform"
+        except Exception as e:
+            print(f"Error processing input in CommunicationOptimizationTool: {e}")
+            return f"Error processing communication context '{input_data_json[:50]}...': {e}"
+
+        enhancements = [
+            "Simplified technical language for broader accessibility",
+            "Added concrete examples to illustrate key points",
+            "Structured message with clear call-to-action",
+            "Incorporated relevant value propositions",
+            "Optimized for engagement with concise, impactful statements"
+        ]
+        
+        return (
+            f"Communication optimization for {audience} audience with {objective} objective:\n\n"
+            f"Original message context: {message[:150]}...\n\n"
+            f"Enhancements applied:\n" + "\n".join([f"- {enhancement}" for enhancement in enhancements])
+        )
+
+class KnowledgeBaseTool(EnhancedBaseTool):
+    name: str = "Knowledge Base Tool"
+    description: str = "Provides access to built-in knowledge and best practices loaded from knowledge_base.json"
+    knowledge_file: str = "knowledge_base.json"
+    # Number of ranked matches returned when the query does not name a topic or category.
+    top_k: int = 3
+    cache_policy: str = "pure"
+
+    # Attaches the tool to the process-wide knowledge store; the file is parsed once per process
+    # and reloaded automatically when it changes on disk.
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs) 
+        get_knowledge_store(self.knowledge_file)
+
+    # Results depend on the knowledge base content, so a reload with changed content starts a new namespace.
+    def cache_namespace(self) -> str:
+        snapshot = get_knowledge_store(self.knowledge_file).snapshot()
+        return NAMESPACE_SEPARATOR.join([self.name, self.knowledge_file, snapshot.digest, str(self.top_k)])
+
+    # Current read-only snapshot of the knowledge base, shared by all KnowledgeBaseTool instances.
+    @property
+    def knowledge(self) -> Mapping[str, Mapping[str, str]]:
+        return get_knowledge_store(self.knowledge_file).data
+
+    def execute_tool_logic(self, query: str) -> str: 
+        # Searches the precomputed index of the current knowledge snapshot.
+        snapshot = get_knowledge_store(self.knowledge_file).snapshot()
+        if not snapshot.data:
+             return "Error: Knowledge Base is not loaded or is empty. Cannot process query."
+        if not query: return "Error: Knowledge Base Tool query cannot be empty."
+        index = snapshot.index
+        
+        # Matching Logic: Prioritizes exact subcategory, then subcategory keyword, then category keyword,
+        # then BM25-ranked matches over the content of every entry.
+        # 1. Exact subcategory match
+        entry = index.exact_topic(query)
+        if entry: return f"Knowledge Base: {entry.title}\n\n{entry.content}" 
+
+        # 2. Subcategory keyword containment (longest key named in the query, including industry insights)
+        entry = index.contained_topic(query)
+        if entry: return f"Relevant Knowledge: {entry.title}\n\n{entry.content}" 
+
+        # 3. Category keyword containment 
+        category_match = index.contained_category(query)
+        if category_match:
+             category, subcategories = category_match
+             available = ", ".join([s.replace("_", " ").title() for s in subcategories])
+             return f"Found Category '{category.replace('_', ' ').title()}'. Available Topics: {available}\n\nPlease specify topic." 
+
+        # 4. Ranked content matches
+        ranked = index.search(query, top_k=self.top_k)
+        if ranked:
+             sections = [
+                  f"{i}. {entry.title} ({entry.category.replace('_', ' ').title()}, score {score:.2f})\n{entry.content}"
+                  for i, (score, entry) in enumerate(ranked, start=1)
+             ]
+             return f"Top {len(ranked)} Knowledge Base matches for '{query}':\n\n" + "\n\n".join(sections)
+
+        # 5. No specific match found
+        available_categories = ", ".join([c.replace("_", " ").title() for c in snapshot.data.keys()])
+        return f"No specific match found for '{query}' in Knowledge Base. Available categories: {available_categories}. Please refine your query."
@@ -0,0 +1,321 @@
+# batch_runner.py
+
+# --- Batch Analysis Runner ---
+# Analyzes many companies by fanning jobs out across a bounded set of worker processes.
+# Each job runs in its own freshly spawned process, which builds its own tools, agents and crew
+# when run_analysis first needs them. A job that raises, or a worker that dies outright,
+# is recorded as a failure without affecting the rest of the batch.
+#
+# Usage:
+#   python batch_runner.py companies.csv --workers 4 --output-dir batch_results
+# The input is a CSV with `company_name` and `industry` columns, or a JSONL file with one
+# {"company_name": ..., "industry": ...} object per line.
+# With --recipients, every successful report is mailed as one message to all recipients. Reports are
+# queued in the durable email outbox (email_outbox.py) as soon as their job finishes and delivered in
+# the background while the batch continues; with OUTBOX_ENABLED=false they are mailed once the batch
+# finishes, over pooled SMTP sessions shared by the whole batch.
+# Each worker has its own search client, so the search rate budget (SEARCH_RATE_PER_MINUTE and
+# SEARCH_BURST) is divided across the concurrent workers to keep the batch within it as a whole.
+
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+from datetime import datetime
+from multiprocessing.connection import wait
+from typing import Dict, Any, List, Optional
+
+DEFAULT_MAX_WORKERS = 4
+RESULT_FILE_NAME = "result.json"
+LOG_FILE_NAME = "run.log"
+
+
+# --- Job Loading ---
+# Reads company_name/industry rows from a CSV or JSONL file. Rows without a company name are skipped.
+def load_jobs(input_path: str) -> List[Dict[str, str]]:
+    jobs = []
+    with open(input_path, 'r', encoding='utf-8', newline='') as f:
+        if input_path.lower().endswith((".jsonl", ".ndjson")):
+            rows = []
+            for line_number, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    rows.append(json.loads(line))
+                except json.JSONDecodeError as e:
+                    print(f"Warning: Skipping invalid JSON on line {line_number} of '{input_path}': {e}")
+        else:
+            rows = list(csv.DictReader(f))
+
+    for row in rows:
+        company_name = (row.get('company_name') or '').strip()
+        if not company_name:
+            print(f"Warning: Skipping row without company_name: {row}")
+            continue
+        jobs.append({
+            'company_name': company_name,
+            'industry': (row.get('industry') or '').strip() or 'Unknown Industry'
+        })
+    return jobs
+
+
+def job_directory(output_dir: str, index: int, job: Dict[str, str]) -> str:
+    target_name_safe = job['company_name'].replace(" ", "_").replace(".", "").replace("/", "_").lower()
+    return os.path.join(output_dir, f"{index:03d}_{target_name_safe}")
+
+
+# --- Worker Process ---
+# Runs one analysis in an isolated process. All console output is captured in the job's run.log
+# and the outcome is written to result.json for the parent to collect. `search_env` holds this
+# worker's share of the search rate budget.
+def _run_job(job: Dict[str, str], job_dir: str, resume: bool = False,
+             search_env: Optional[Dict[str, str]] = None) -> None:
+    os.environ.update(search_env or {})
+    log_file = open(os.path.join(job_dir, LOG_FILE_NAME), 'w', encoding='utf-8', buffering=1)
+    os.dup2(log_file.fileno(), sys.stdout.fileno())
+    os.dup2(log_file.fileno(), sys.stderr.fileno())
+    sys.stdout = sys.stderr = log_file
+
+    started = time.monotonic()
+    outcome: Dict[str, Any] = {"job": job, "status": "failed"}
+    try:
+        import advance_agent
+        result, file_path, execution_time_str = advance_agent.run_analysis(dict(job), output_dir=job_dir, resume=resume)
+        outcome.update({
+            "status": "succeeded" if file_path else "failed",
+            "report_path": file_path,
+            "execution_time": execution_time_str,
+            "usage_metrics": getattr(result, 'usage_metrics', {}) or {},
+        })
+        if not file_path:
+            outcome["error"] = "Report file could not be written."
+    except BaseException as e:
+        outcome["error"] = f"{type(e).__name__}: {e}"
+        outcome["traceback"] = traceback.format_exc()
+        traceback.print_exc()
+    outcome["duration_seconds"] = round(time.monotonic() - started, 3)
+
+    with open(os.path.join(job_dir, RESULT_FILE_NAME), 'w', encoding='utf-8') as f:
+        json.dump(outcome, f, indent=2, default=str)
+    log_file.flush()
+    sys.exit(0 if outcome["status"] == "succeeded" else 1)
+
+
+# Reads a finished job's result file; a missing or unreadable file means the worker crashed.
+def _collect_result(job: Dict[str, str], job_dir: str, exitcode: Optional[int], duration: float) -> Dict[str, Any]:
+    try:
+        with open(os.path.join(job_dir, RESULT_FILE_NAME), 'r', encoding='utf-8') as f:
+            outcome = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        outcome = {
+            "job": job,
+            "status": "failed",
+            "error": f"Worker process exited with code {exitcode} without writing a result.",
+            "duration_seconds": round(duration, 3),
+        }
+    outcome["exitcode"] = exitcode
+    outcome["job_dir"] = job_dir
+    return outcome
+
+
+# Each worker's share of the search rate limit (.env values included) as environment overrides.
+def worker_search_budget(workers: int) -> Dict[str, str]:
+    from dotenv import load_dotenv
+    from search_client import DEFAULT_BURST, DEFAULT_RATE_PER_MINUTE
+
+    load_dotenv()
+    workers = max(workers, 1)
+    rate = float(os.getenv("SEARCH_RATE_PER_MINUTE", DEFAULT_RATE_PER_MINUTE))
+    burst = int(os.getenv("SEARCH_BURST", DEFAULT_BURST))
+    return {"SEARCH_RATE_PER_MINUTE": f"{rate / workers:g}", "SEARCH_BURST": str(max(burst // workers, 1))}
+
+
+# --- Batch Execution ---
+# Keeps at most `max_workers` worker processes alive and starts the next job as soon as one exits.
+# Jobs exceeding `timeout` seconds are terminated and recorded as failures. With `recipients` and the
+# email outbox enabled, each successful report is queued for delivery as soon as its job finishes.
+def run_batch(jobs: List[Dict[str, str]], output_dir: str, max_workers: int = DEFAULT_MAX_WORKERS,
+              timeout: Optional[float] = None, resume: bool = False,
+              recipients: Optional[List[str]] = None) -> Dict[str, Any]:
+    if max_workers < 1:
+        raise ValueError(f"max_workers must be at least 1, got {max_workers}.")
+    os.makedirs(output_dir, exist_ok=True)
+    context = multiprocessing.get_context("spawn")
+    search_env = worker_search_budget(min(max_workers, len(jobs)))
+
+    batch_started = time.monotonic()
+    queue = list(enumerate(jobs, start=1))
+    running: Dict[Any, Dict[str, Any]] = {}
+    results: List[Dict[str, Any]] = []
+
+    while queue or running:
+        while queue and len(running) < max_workers:
+            index, job = queue.pop(0)
+            job_dir = job_directory(output_dir, index, job)
+            os.makedirs(job_dir, exist_ok=True)
+            # A result left by an earlier run in a reused output directory must not be collected as
+            # this run's outcome if the worker dies before writing its own.
+            try:
+                os.remove(os.path.join(job_dir, RESULT_FILE_NAME))
+            except FileNotFoundError:
+                pass
+            process = context.Process(target=_run_job, args=(job, job_dir, resume, search_env), name=f"batch-job-{index}")
+            process.start()
+            running[process.sentinel] = {"process": process, "job": job, "job_dir": job_dir,
+                                         "index": index, "started": time.monotonic()}
+            print(f"[{index}/{len(jobs)}] Started analysis of {job['company_name']} (pid {process.pid}).")
+
+        wait(list(running), timeout=1.0)
+        for sentinel, entry in list(running.items()):
+            process = entry["process"]
+            elapsed = time.monotonic() - entry["started"]
+            if process.is_alive() and timeout is not None and elapsed > timeout:
+                print(f"Warning: Job {entry['index']} ({entry['job']['company_name']}) exceeded {timeout}s; terminating.")
+                process.terminate()
+                process.join()
+                outcome = _collect_result(entry["job"], entry["job_dir"], process.exitcode, elapsed)
+                outcome.update({"status": "failed", "error": f"Timed out after {timeout} seconds."})
+            elif not process.is_alive():
+                process.join()
+                outcome = _collect_result(entry["job"], entry["job_dir"], process.exitcode, elapsed)
+            else:
+                continue
+            del running[sentinel]
+            outcome["index"] = entry["index"]
+            if recipients and outcome["status"] == "succeeded":
+                queue_report_email(outcome, recipients)
+            results.append(outcome)
+            print(f"[{entry['index']}/{len(jobs)}] {entry['job']['company_name']}: {outcome['status']} "
+                  f"in {outcome.get('duration_seconds', round(elapsed, 3))}s"
+                  + (f" ({outcome['error']})" if outcome.get('error') else ""))
+
+    elapsed = time.monotonic() - batch_started
+    results.sort(key=lambda r: r["index"])
+    succeeded = [r for r in results if r["status"] == "succeeded"]
+    summary = {
+        "finished_at": datetime.now().isoformat(),
+        "total_jobs": len(jobs),
+        "succeeded": len(succeeded),
+        "failed": len(results) - len(succeeded),
+        "max_workers": max_workers,
+        "elapsed_seconds": round(elapsed, 3),
+        "companies_per_hour": round(len(succeeded) / elapsed * 3600, 2) if elapsed > 0 else 0.0,
+        "jobs": results,
+    }
+    with open(os.path.join(output_dir, "batch_summary.json"), 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2, default=str)
+    return summary
+
+
+# --- Report Delivery ---
+def _report_email(job: Dict[str, Any], recipients: List[str]) -> Dict[str, Any]:
+    return {
+        "recipients": recipients,
+        "subject": f"CrewAI Analysis Report for {job['job']['company_name']}",
+        "body": f"Attached is the strategic analysis report for {job['job']['company_name']} generated on {job.get('execution_time')}.",
+        "file_path": job["report_path"],
+    }
+
+
+# Queues a finished job's report in the email outbox and records the outbox job id on it as
+# `email_job`. Does nothing when the outbox is disabled or cannot be written; the report is then
+# mailed by email_batch_reports after the batch.
+def queue_report_email(job: Dict[str, Any], recipients: List[str]) -> Optional[str]:
+    from email_outbox import get_outbox_sender
+
+    sender = get_outbox_sender()
+    if sender is None or not job.get("report_path"):
+        return None
+    try:
+        job["email_job"] = sender.outbox.enqueue(**_report_email(job, recipients))
+    except OSError as e:
+        print(f"Warning: Could not queue the report of {job['job']['company_name']} in the email outbox: {e}")
+        return None
+    sender.wake()
+    return job["email_job"]
+
+
+# Mails each successful job's report that was not queued in the outbox to `recipients`; records
+# the outcome on the job entries.
+def email_batch_reports(summary: Dict[str, Any], recipients: List[str]) -> int:
+    from email_delivery import get_mailer
+
+    jobs = [job for job in summary["jobs"]
+            if job["status"] == "succeeded" and job.get("report_path") and not job.get("email_job")]
+    if not jobs:
+        return 0
+    mailer = get_mailer()
+    started = time.monotonic()
+    results = mailer.send_reports([_report_email(job, recipients) for job in jobs])
+    for job, result in zip(jobs, results):
+        job["emailed_to"] = result.delivered
+        if not result.ok:
+            job["email_error"] = result.error or f"Refused: {', '.join(result.refused)}"
+    stats = mailer.stats()
+    sent = sum(1 for result in results if result.ok)
+    print(f"Emailed {sent} of {len(jobs)} reports to {len(recipients)} recipient(s) in {time.monotonic() - started:.1f}s "
+          f"over {stats['connections']} SMTP connection(s) ({stats['reconnects']} reconnects).")
+    return sent
+
+
+def print_summary(summary: Dict[str, Any]) -> None:
+    print("\n--- Batch Summary ---")
+    print(f"Jobs: {summary['total_jobs']} | Succeeded: {summary['succeeded']} | Failed: {summary['failed']}")
+    print(f"Elapsed: {summary['elapsed_seconds']}s with {summary['max_workers']} workers "
+          f"| Throughput: {summary['companies_per_hour']} companies/hour")
+    for job in summary["jobs"]:
+        if job["status"] != "succeeded":
+            print(f"  FAILED {job['job']['company_name']}: {job.get('error', 'unknown error')} (log: {job['job_dir']})")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run the business analysis crew for many companies in parallel worker processes.")
+    parser.add_argument("input_file", help="CSV or JSONL file with company_name and industry fields")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("BATCH_MAX_WORKERS", DEFAULT_MAX_WORKERS)),
+                        help=f"Maximum number of concurrent worker processes (default {DEFAULT_MAX_WORKERS}, or BATCH_MAX_WORKERS)")
+    parser.add_argument("--output-dir", default=None,
+                        help="Directory for per-job reports and logs (default batch_<timestamp>)")
+    parser.add_argument("--timeout", type=float, default=None, help="Per-job timeout in seconds")
+    parser.add_argument("--wait-for-email", type=float, default=None, metavar="SECONDS",
+                        help="Wait up to SECONDS for queued report emails to be delivered before exiting "
+                             "(default OUTBOX_FLUSH_SECONDS or 0)")
+    parser.add_argument("--resume", action="store_true",
+                        help="Reuse checkpointed task outputs from earlier runs of the same companies")
+    parser.add_argument("--recipients", action="append", metavar="EMAIL[,EMAIL...]",
+                        help="Email every successful report to these addresses; may be repeated")
+    args = parser.parse_args(argv)
+
+    jobs = load_jobs(args.input_file)
+    if not jobs:
+        print(f"Error: No valid company rows found in '{args.input_file}'.")
+        return 1
+    output_dir = args.output_dir or f"batch_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}"
+    print(f"Running {len(jobs)} analyses with up to {args.workers} workers. Output: {output_dir}")
+    # Emails left queued by earlier runs are delivered in the background while the batch works.
+    from email_outbox import get_outbox_sender
+    get_outbox_sender()
+    recipients = None
+    if args.recipients:
+        from email_delivery import recipient_list
+        recipients = recipient_list(args.recipients)
+    summary = run_batch(jobs, output_dir, max_workers=args.workers, timeout=args.timeout, resume=args.resume,
+                        recipients=recipients)
+    if recipients:
+        from email_outbox import flush_outbox
+        email_batch_reports(summary, recipients)
+        queued = sum(1 for job in summary["jobs"] if job.get("email_job"))
+        if queued:
+            print(f"Queued {queued} report(s) for {len(recipients)} recipient(s) in the email outbox.")
+            flush_outbox(args.wait_for_email)
+        with open(os.path.join(output_dir, "batch_summary.json"), 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2, default=str)
+    print_summary(summary)
+    return 0 if summary["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,543 @@
+# benchmark.py
+
+# --- Offline Benchmark Suite ---
+# Measures the pipeline without API keys or network access. The real agents, tasks and tools from
+# advance_agent.py run against a deterministic fake LLM (one tool step, then a large structured
+# final answer) and a local stand-in for the DuckDuckGo search backend. Reported metrics:
+#   startup         - import and crew construction time (advance_agent.measure_startup)
+#   crew            - end-to-end crew wall time through the DependencyScheduler, per-task times,
+#                     scheduling overhead (wall time minus the critical path of task durations) and
+#                     LLM/tool calls per run (TOOL_PRECOMPUTE_ENABLED=false to compare without
+#                     precomputed tool results)
+#   knowledge_base  - KnowledgeBaseTool lookups per second over exact, contained, category,
+#                     ranked and missing queries
+#   format_to_text  - report formatting throughput on large task outputs, in one piece and through
+#                     the streaming report writer (one fsync per task section)
+#   prior_reports   - PriorReportLibrary index build time over synthetic past reports, and search
+#                     latency and hit rate for covered and uncovered companies
+#   research_fanout - wall time and distinct hits for the research task's compound request sent as one
+#                     search, as sequential focused searches and as a concurrent fan-out, plus a
+#                     fan-out whose deadline is shorter than a search
+#   tool_cache      - repeated calls to the pure tools through one instance per agent, executed every
+#                     time versus answered from the shared tool cache, with its hit rate
+#   snippet_dedup   - MinHash/LSH filtering throughput over search results mixing distinct snippets,
+#                     syndicated near-duplicates and repeats, with the snippets and tokens removed
+#   email           - time to assemble and serialize the report email with its attachment, and
+#                     delivery of several reports to a local stand-in SMTP server with a new session
+#                     per email versus pooled sessions, and peak memory while streaming one report
+# Results are written as JSON (with the git revision) so runs can be compared across versions.
+#
+# Usage:
+#   python benchmark.py --runs 3 --output benchmark_results/latest.json
+# Crew memory is disabled during the benchmark because it requires a live embedding service.
+
+import os
+
+# Keep the benchmark offline and isolated from caches and checkpoints left by real runs.
+os.environ.setdefault("OPENAI_API_KEY", "offline-benchmark")
+os.environ.setdefault("OTEL_SDK_DISABLED", "true")
+os.environ["SEARCH_CACHE_ENABLED"] = "false"
+os.environ["LLM_CACHE_MODE"] = "off"
+os.environ["CHECKPOINTS_ENABLED"] = "false"
+os.environ["PRIOR_REPORTS_ENABLED"] = "false"
+os.environ["TOOL_CACHE_ENABLED"] = "false"
+
+import argparse
+import hashlib
+import json
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+DEFAULT_OUTPUT_DIR = "benchmark_results"
+BENCHMARK_INPUTS = {"company_name": "Benchmark Analytics Ltd", "industry": "AI and Analytics"}
+TOOL_NAME_PATTERN = re.compile(r"^Tool Name: (.+)$", re.MULTILINE)
+DELEGATION_TOOL_PREFIXES = ("Delegate work", "Ask question")
+PRECOMPUTED_MARKER = "Precomputed tool result"
+
+
+def _timed(fn: Callable[[], Any]) -> float:
+    started = time.perf_counter()
+    fn()
+    return time.perf_counter() - started
+
+
+def _distribution(samples: List[float]) -> Dict[str, float]:
+    return {
+        "min": round(min(samples), 6),
+        "median": round(statistics.median(samples), 6),
+        "max": round(max(samples), 6),
+        "samples": [round(sample, 6) for sample in samples],
+    }
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# Deterministic structured text of roughly `chars` characters, shaped like a real task output.
+def synthetic_output(seed: str, chars: int) -> str:
+    lines = []
+    size = 0
+    section = 0
+    while size < chars:
+        section += 1
+        digest = hashlib.sha256(f"{seed}:{section}".encode()).hexdigest()
+        block = [f"{section}. **Finding {digest[:8]} for {seed}**:"]
+        block += [f"  - Observation {digest[i:i + 6]}: market growth, competitive positioning and strategic "
+                  f"initiatives indicate opportunity area {i // 6 + 1} with measurable impact." for i in range(0, 24, 6)]
+        lines.extend(block)
+        size += sum(len(line) + 1 for line in block)
+    return "\n".join(lines)
+
+
+# --- Stand-ins for network services ---
+class LocalSearchBackend:
+    def __init__(self, latency_seconds: float = 0.0, results_per_query: int = 5):
+        self.latency_seconds = latency_seconds
+        self.results_per_query = results_per_query
+
+    def __call__(self, query: str, max_results: int) -> List[Dict[str, str]]:
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+        digest = hashlib.sha256(query.encode("utf-8")).hexdigest()
+        return [{
+            "title": f"Result {n + 1} for {query[:40]}",
+            "href": f"https://example.invalid/{digest[:12]}/{n}",
+            "body": f"{query[:60]} snippet {digest[n * 4:n * 4 + 8]}: revenue growth, partnerships and product launches.",
+        } for n in range(min(max_results, self.results_per_query))]
+
+
+def make_fake_llm(latency_seconds: float, answer_chars: int, tool_steps: int) -> Any:
+    from crewai.llm import LLM
+    from crewai.utilities.events import crewai_event_bus
+    from crewai.utilities.events.llm_events import LLMCallStartedEvent, LLMCallType
+
+    class FakeLLM(LLM):
+        """Deterministic ReAct responder: `tool_steps` tool calls, then a final answer.
+
+        A precomputed tool result in the context stands in for one of the tool calls, as it would
+        for an agent that uses the result instead of calling the tool itself.
+        """
+
+        def call(self, messages, tools=None, callbacks=None, available_functions=None):
+            crewai_event_bus.emit(self, event=LLMCallStartedEvent(messages=messages, tools=tools,
+                                                                  callbacks=callbacks, available_functions=None))
+            if isinstance(messages, str):
+                messages = [{"role": "user", "content": messages}]
+            if latency_seconds:
+                time.sleep(latency_seconds)
+            prompt = "\n".join(str(message.get("content", "")) for message in messages)
+            steps_taken = sum(1 for message in messages if message.get("role") == "assistant")
+            steps_taken += PRECOMPUTED_MARKER in prompt
+            tool_names = [name.strip() for name in TOOL_NAME_PATTERN.findall(prompt)
+                          if not name.startswith(DELEGATION_TOOL_PREFIXES)]
+            task_line = next((line for line in prompt.splitlines() if line.startswith("Current Task:")), "Current Task: analysis")
+            query = task_line.split(":", 1)[1].strip()[:80]
+
+            if tool_names and steps_taken < tool_steps:
+                tool_name = tool_names[steps_taken % len(tool_names)]
+                response = (f"Thought: I should use the {tool_name}.\nAction: {tool_name}\n"
+                            f"Action Input: {json.dumps({'description': query})}")
+            else:
+                response = f"Thought: I now know the final answer\nFinal Answer: {synthetic_output(query, answer_chars)}"
+
+            usage = type("Usage", (), {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(response) // 4})()
+            for callback in callbacks or []:
+                if hasattr(callback, "log_success_event"):
+                    callback.log_success_event(kwargs={}, response_obj={"usage": usage}, start_time=0, end_time=0)
+            self._handle_emit_call_events(response, LLMCallType.LLM_CALL)
+            return response
+
+    return FakeLLM
+
+
+# --- Benchmarks ---
+def bench_crew(agent_module: Any, runs: int, llm_latency: float, answer_chars: int, tool_steps: int) -> Dict[str, Any]:
+    from context_compaction import ContextCompactor
+    from task_scheduler import DependencyScheduler, build_dependency_graph, task_label
+    from telemetry import RunTelemetry
+    from tool_precompute import ToolPrecomputer
+
+    crew = agent_module.get_crew()
+    fake_llm_class = make_fake_llm(llm_latency, answer_chars, tool_steps)
+    for agent in crew.agents:
+        agent.llm = fake_llm_class(model="fake/benchmark")
+        agent.verbose = False
+    crew.verbose = False
+    crew.memory = False
+    crew._short_term_memory = crew._long_term_memory = crew._entity_memory = None
+
+    graph = build_dependency_graph(list(crew.tasks))
+    walls, overheads, task_times = [], [], {}
+    last_telemetry = None
+    for _ in range(runs):
+        telemetry = RunTelemetry(dict(BENCHMARK_INPUTS))
+        scheduler = DependencyScheduler(verbose=False, compactor=ContextCompactor.from_env(), telemetry=telemetry,
+                                        precomputer=ToolPrecomputer.from_env(agent_module.TASK_TOOL_INPUTS))
+        wall = _timed(lambda: scheduler.kickoff(crew, inputs=dict(BENCHMARK_INPUTS)))
+        tasks = telemetry.snapshot()["tasks"]
+        durations = [tasks[task_label(task)]["wall_seconds"] for task in crew.tasks]
+        finish: Dict[int, float] = {}
+        for i in sorted(graph):
+            finish[i] = durations[i] + max((finish[j] for j in graph[i]), default=0.0)
+        walls.append(wall)
+        overheads.append(max(wall - max(finish.values()), 0.0))
+        for task, seconds in zip(crew.tasks, durations):
+            task_times.setdefault(task_label(task), []).append(seconds)
+        last_telemetry = telemetry
+    totals = last_telemetry.snapshot()["totals"] if last_telemetry else {}
+    return {
+        "runs": runs,
+        "tasks": len(crew.tasks),
+        "wall_seconds": _distribution(walls),
+        "scheduling_overhead_seconds": _distribution(overheads),
+        "task_seconds_median": {label: round(statistics.median(times), 6) for label, times in task_times.items()},
+        "llm_calls_per_run": totals.get("llm_calls"),
+        "tool_calls_per_run": totals.get("tool_calls"),
+    }
+
+
+def bench_knowledge_base(agent_module: Any, iterations: int) -> Dict[str, Any]:
+    from analysis_tools import KnowledgeBaseTool
+    from knowledge_store import get_knowledge_store
+
+    tool = KnowledgeBaseTool()
+    index = get_knowledge_store(tool.knowledge_file).snapshot().index
+    queries = ["unknown topic xyz", "how do we approach a strategic engagement", "market trends and competitive positioning"]
+    if index.entries:
+        for entry in index.entries:
+            queries.append(entry.topic)
+            queries.append(f"what does the knowledge base say about {entry.title.lower()} for our client?")
+        queries.extend(f"{original} overview" for original, _ in index.categories.values())
+    lookups = 0
+    started = time.perf_counter()
+    for _ in range(iterations):
+        for query in queries:
+            tool.execute_tool_logic(query)
+            lookups += 1
+    elapsed = time.perf_counter() - started
+    return {"lookups": lookups, "distinct_queries": len(queries), "seconds": round(elapsed, 6),
+            "lookups_per_second": round(lookups / elapsed, 1) if elapsed else None}
+
+
+def bench_format_to_text(agent_module: Any, task_chars: int, repeats: int) -> Dict[str, Any]:
+    from crewai.tasks.task_output import TaskOutput
+    from report_writer import StreamingReportWriter
+    from task_scheduler import ScheduledCrewOutput
+
+    crew = agent_module.get_crew()
+    outputs = [TaskOutput(description=task.description, raw=synthetic_output(task.name or str(i), task_chars),
+                          agent=task.agent.role if task.agent else "")
+               for i, task in enumerate(crew.tasks)]
+    result = ScheduledCrewOutput(raw=outputs[-1].raw, tasks_output=outputs, usage_metrics={"total_tokens": 0})
+    input_bytes = sum(len(output.raw.encode("utf-8")) for output in outputs)
+    report = ""
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        report = agent_module.format_to_text("benchmark", crew.tasks, result, crew.agents, dict(BENCHMARK_INPUTS))
+        samples.append(time.perf_counter() - started)
+    best = min(samples)
+
+    # The same report written section by section (with an fsync per section) as tasks complete.
+    streaming = []
+    with tempfile.TemporaryDirectory() as directory:
+        for n in range(repeats):
+            started = time.perf_counter()
+            writer = StreamingReportWriter(os.path.join(directory, f"report_{n}.txt"), crew.tasks, crew.agents,
+                                           dict(BENCHMARK_INPUTS), "benchmark")
+            for i, (task, output) in enumerate(zip(crew.tasks, outputs)):
+                writer.task_completed(i, task, output)
+            writer.finalize(result)
+            streaming.append(time.perf_counter() - started)
+    best_streaming = min(streaming)
+    return {"input_bytes": input_bytes, "report_bytes": len(report.encode("utf-8")),
+            "seconds": _distribution(samples),
+            "mb_per_second": round(input_bytes / best / 1e6, 2) if best else None,
+            "streaming_seconds": _distribution(streaming),
+            "streaming_mb_per_second": round(input_bytes / best_streaming / 1e6, 2) if best_streaming else None}
+
+
+def bench_prior_reports(agent_module: Any, reports: int, task_chars: int, iterations: int) -> Dict[str, Any]:
+    from prior_reports import PriorReportLibrary
+    from task_scheduler import ScheduledCrewOutput
+
+    crew = agent_module.get_crew()
+    companies = [f"Benchmark Company {n}" for n in range(reports)]
+    with tempfile.TemporaryDirectory() as directory:
+        for n, company in enumerate(companies):
+            outputs = [type("Output", (), {"raw": synthetic_output(f"{company} {task.name}", task_chars)})()
+                       for task in crew.tasks]
+            result = ScheduledCrewOutput(tasks_output=outputs, usage_metrics={"total_tokens": 0})
+            text = agent_module.format_to_text(f"2025-01-{n % 28 + 1:02d}_00-00-00", crew.tasks, result, crew.agents,
+                                               {"company_name": company, "industry": "AI and Analytics"})
+            with open(os.path.join(directory, f"company_{n}_report_2025-01-01_00-00-00.txt"), "w", encoding="utf-8") as f:
+                f.write(text)
+        library = PriorReportLibrary(report_glob=os.path.join(directory, "*_report_*.txt"), result_files=[], store_path=None)
+        build_seconds = _timed(library.index)
+
+        queries = [f"{company} {task.name.replace('_', ' ')} competitive positioning" for company in companies[:10]
+                   for task in crew.tasks if task.name]
+        queries += [f"Uncovered Corporation {n} quarterly revenue outlook" for n in range(len(queries) // 2)]
+        samples = []
+        for _ in range(iterations):
+            for query in queries:
+                samples.append(_timed(lambda: library.search(query)))
+    stats = library.stats()
+    return {"reports": reports, "passages": stats["passages"], "build_seconds": round(build_seconds, 6),
+            "queries": len(samples), "hit_rate": stats["hit_rate"],
+            "search_ms": {"median": round(statistics.median(samples) * 1000, 3),
+                          "p95": round(sorted(samples)[int(len(samples) * 0.95)] * 1000, 3)}}
+
+
+def bench_research_fanout(search_latency: float, repeats: int) -> Dict[str, Any]:
+    from research_fanout import ResearchFanout
+    from search_client import SharedSearchClient, set_search_client
+
+    query = (f"Research company: {BENCHMARK_INPUTS['company_name']}, Industry: {BENCHMARK_INPUTS['industry']}. "
+             "Focus: market position, developments, structure, initiatives, needs, challenges.")
+    client = SharedSearchClient(backend=LocalSearchBackend(search_latency), rate_per_minute=1_000_000, burst=1000)
+    previous = set_search_client(client)
+    try:
+        # No result cap, so the fan-out's distinct hits compare directly with the sequential searches.
+        fanout = ResearchFanout(deadline_seconds=max(search_latency * 20, 5.0), max_results=1_000_000)
+        subqueries = fanout.plan(query)
+        single, sequential, fanned = [], [], []
+        for _ in range(repeats):
+            single.append(_timed(lambda: client.results(query)))
+            sequential.append(_timed(lambda: [client.results(subquery) for subquery in subqueries]))
+            fanned.append(_timed(lambda: fanout.search(query, subqueries)))
+        result = fanout.search(query, subqueries)
+        sequential_hits = {hit["href"] for subquery in subqueries for hit in client.results(subquery)}
+        # A deadline of half a search: every sub-query misses it and the call returns on time.
+        late = None
+        if search_latency:
+            late_fanout = ResearchFanout(deadline_seconds=search_latency / 2)
+            late = late_fanout.search(query, subqueries)
+            late_fanout._pool().shutdown(wait=True)
+    finally:
+        set_search_client(previous)
+    return {"search_latency_seconds": search_latency, "subqueries": len(subqueries),
+            "single_search": {"seconds": _distribution(single)["median"], "hits": len(client.results(query))},
+            "sequential": {"seconds": _distribution(sequential)["median"], "hits": len(sequential_hits)},
+            "fanout": {"seconds": _distribution(fanned)["median"], "hits": len(result.hits),
+                       "duplicates_removed": result.duplicates, "max_workers": fanout.max_workers},
+            "deadline": None if late is None else {"deadline_seconds": round(search_latency / 2, 6),
+                                                   "seconds": round(late.seconds, 6), "timed_out": len(late.timed_out)}}
+
+
+# Search results as a crew run would see them: `results` results of 10 snippets, where every
+# article also appears as a lightly edited syndicated copy and later results repeat earlier articles.
+def bench_snippet_dedup(results: int) -> Dict[str, Any]:
+    from snippet_dedup import SnippetDeduplicator
+
+    def article(n: int) -> str:
+        digest = hashlib.sha256(str(n).encode()).hexdigest()
+        return (f"Company {digest[:6]} reported {digest[6:10]} revenue and announced partnership {digest[10:14]} "
+                f"with {digest[14:20]} to expand {digest[20:26]} services in region {digest[26:30]}, executives said on "
+                f"day {n % 28 + 1}, citing demand for {digest[30:36]} and plans to hire {digest[36:40]} engineers.")
+
+    batches = []
+    for r in range(results):
+        fresh = [article(r * 4 + i) for i in range(4)]
+        syndicated = [f"(Wire) {text[:-1]} according to a statement." for text in fresh[:3]]
+        repeated = [article(max(r - 1, 0) * 4 + i) for i in range(3)] if r else [article(10_000 + i) for i in range(3)]
+        batches.append(fresh + syndicated + repeated)
+    deduplicator = SnippetDeduplicator()
+    seconds = _timed(lambda: [deduplicator.filter(batch) for batch in batches])
+    stats = deduplicator.stats()
+    return {"results": results, "snippets": stats["snippets"], "near_duplicates": stats["near_duplicates"],
+            "already_seen": stats["already_seen"], "tokens_saved": stats["tokens_saved"],
+            "snippets_per_second": round(stats["snippets"] / seconds, 1) if seconds else None}
+
+
+# Each of `instances` tool sets (one per agent, as the crew builds them) calls every pure tool with the
+# same inputs, once with the tool cache disabled and once through a shared cache.
+def bench_tool_cache(agent_module: Any, instances: int, repeats: int) -> Dict[str, Any]:
+    from analysis_tools import (CommunicationOptimizationTool, KnowledgeBaseTool, MarketAnalysisTool,
+                                SentimentAnalysisTool, StrategicPlanningTool)
+    from tool_cache import ToolResultCache, set_tool_cache
+
+    inputs = {
+        MarketAnalysisTool: BENCHMARK_INPUTS["industry"],
+        StrategicPlanningTool: json.dumps({"organization_type": BENCHMARK_INPUTS["industry"], "objectives": ["growth", "innovation"]}),
+        CommunicationOptimizationTool: json.dumps({"audience": "executives", "message": synthetic_output("message", 2000),
+                                                   "objective": "persuade"}),
+        SentimentAnalysisTool: json.dumps([synthetic_output(f"review{i}", 1000) for i in range(20)]),
+        KnowledgeBaseTool: "market trends and competitive positioning",
+    }
+    tool_sets = [[tool_class() for tool_class in inputs] for _ in range(instances)]
+
+    def call_all():
+        for _ in range(repeats):
+            for tools in tool_sets:
+                for tool in tools:
+                    tool._run(inputs[type(tool)])
+
+    samples = {}
+    cache = None
+    for enabled in (False, True):
+        cache = ToolResultCache(enabled=enabled)
+        previous = set_tool_cache(cache)
+        try:
+            samples[enabled] = _timed(call_all)
+        finally:
+            set_tool_cache(previous)
+    stats = cache.stats()
+    return {"instances": instances, "calls": instances * repeats * len(inputs),
+            "uncached_seconds": round(samples[False], 6), "cached_seconds": round(samples[True], 6),
+            "hits": stats["hits"], "misses": stats["misses"], "hit_rate": stats["hit_rate"], "cached_bytes": stats["shared_bytes"]}
+
+
+def bench_email(agent_module: Any, report_bytes: int, repeats: int, reports: int, handshake_latency: float) -> Dict[str, Any]:
+    from email_delivery import ReportMailer, SMTPSessionPool, build_email_message
+    from email_test import LocalSMTPServer
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "benchmark_report.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(synthetic_output("email", report_bytes))
+        size = os.path.getsize(path)
+        samples = []
+        for _ in range(repeats):
+            samples.append(_timed(lambda: build_email_message(
+                "sender@example.invalid", "recipient@example.invalid", "Benchmark report", "Report attached.", path
+            ).as_string()))
+
+        # The same batch of reports, each to three recipients, with one session per email and pooled.
+        deliveries = [{"recipients": [f"stakeholder{n}@example.invalid" for n in range(3)], "subject": f"Report {i}",
+                       "body": "Report attached.", "file_path": path} for i in range(reports)]
+        with LocalSMTPServer(handshake_delay=handshake_latency) as server:
+            def unpooled():
+                for delivery in deliveries:
+                    mailer = ReportMailer(pool=SMTPSessionPool(server.settings(), max_sessions=1))
+                    mailer.send_report(**delivery)
+                    mailer.close()
+
+            def pooled():
+                mailer = ReportMailer(pool=SMTPSessionPool(server.settings()))
+                mailer.send_reports(deliveries)
+                mailer.close()
+
+            unpooled_seconds = _timed(unpooled)
+            connections = server.connections
+            pooled_seconds = _timed(pooled)
+            pooled_connections = server.connections - connections
+
+            # Peak traced memory while one uncompressed report is streamed to the server.
+            mailer = ReportMailer(pool=SMTPSessionPool(server.settings()), compression="none")
+            tracemalloc.start()
+            mailer.send_report(**deliveries[0])
+            streaming_peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            mailer.close()
+    return {"attachment_bytes": size, "seconds": _distribution(samples),
+            "delivery": {"reports": reports, "recipients_per_report": 3, "handshake_latency_seconds": handshake_latency,
+                         "unpooled_seconds": round(unpooled_seconds, 6), "unpooled_connections": connections,
+                         "pooled_seconds": round(pooled_seconds, 6), "pooled_connections": pooled_connections,
+                         "streaming_peak_bytes": streaming_peak}}
+
+
+def run_benchmarks(args: argparse.Namespace) -> Dict[str, Any]:
+    from search_client import SharedSearchClient, set_search_client
+
+    import advance_agent
+
+    set_search_client(SharedSearchClient(backend=LocalSearchBackend(args.search_latency_ms / 1000),
+                                         rate_per_minute=1_000_000, burst=1000))
+    results: Dict[str, Any] = {"startup": advance_agent.measure_startup()}
+    results["crew"] = bench_crew(advance_agent, args.runs, args.llm_latency_ms / 1000, args.answer_chars, args.tool_steps)
+    results["knowledge_base"] = bench_knowledge_base(advance_agent, args.kb_iterations)
+    results["format_to_text"] = bench_format_to_text(advance_agent, args.format_task_chars, args.repeats)
+    results["prior_reports"] = bench_prior_reports(advance_agent, args.prior_reports, args.prior_report_task_chars, args.repeats)
+    results["research_fanout"] = bench_research_fanout(args.fanout_search_latency_ms / 1000, args.repeats)
+    results["tool_cache"] = bench_tool_cache(advance_agent, args.tool_instances, args.repeats)
+    results["snippet_dedup"] = bench_snippet_dedup(args.dedup_results)
+    results["email"] = bench_email(advance_agent, args.format_task_chars * len(advance_agent.get_crew().tasks), args.repeats,
+                                   args.email_reports, args.smtp_handshake_ms / 1000)
+    return {
+        "benchmark": "advance_agent_offline",
+        "created_at": datetime.now().isoformat(),
+        "git_revision": _git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "results": results,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Offline performance benchmarks for the analysis crew.")
+    parser.add_argument("--runs", type=int, default=3, help="End-to-end crew runs (default 3)")
+    parser.add_argument("--repeats", type=int, default=5, help="Repetitions of the formatting and email benchmarks (default 5)")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="Simulated latency per fake LLM call")
+    parser.add_argument("--search-latency-ms", type=float, default=0.0, help="Simulated latency per stand-in search")
+    parser.add_argument("--answer-chars", type=int, default=6000, help="Size of each fake final answer in characters")
+    parser.add_argument("--tool-steps", type=int, default=1, help="Tool calls the fake LLM makes per task")
+    parser.add_argument("--kb-iterations", type=int, default=200, help="Passes over the knowledge base query set")
+    parser.add_argument("--prior-reports", type=int, default=50, help="Synthetic past reports indexed by the prior report benchmark")
+    parser.add_argument("--prior-report-task-chars", type=int, default=4000, help="Task output size in each synthetic past report")
+    parser.add_argument("--format-task-chars", type=int, default=200_000, help="Task output size for the formatting benchmark")
+    parser.add_argument("--fanout-search-latency-ms", type=float, default=100.0,
+                        help="Simulated latency per stand-in search in the research fan-out benchmark")
+    parser.add_argument("--tool-instances", type=int, default=20, help="Tool sets calling the pure tools in the tool cache benchmark")
+    parser.add_argument("--dedup-results", type=int, default=200, help="Search results filtered by the snippet dedup benchmark")
+    parser.add_argument("--email-reports", type=int, default=10, help="Reports mailed in the SMTP delivery benchmark")
+    parser.add_argument("--smtp-handshake-ms", type=float, default=50.0,
+                        help="Simulated connection setup latency of the stand-in SMTP server")
+    parser.add_argument("--output", default=None,
+                        help=f"JSON result file (default {DEFAULT_OUTPUT_DIR}/benchmark_<timestamp>.json)")
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(args)
+    output = args.output or os.path.join(DEFAULT_OUTPUT_DIR, f"benchmark_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    results = report["results"]
+    print("\n--- Benchmark Summary ---")
+    print(f"Startup: {results['startup']['total_seconds']}s (crewai import {results['startup']['crewai_import_seconds']}s, "
+          f"crew build {results['startup']['crew_build_seconds']}s)")
+    print(f"Crew wall time (median of {results['crew']['runs']}): {results['crew']['wall_seconds']['median']}s, "
+          f"scheduling overhead {results['crew']['scheduling_overhead_seconds']['median']}s, "
+          f"{results['crew']['llm_calls_per_run']} LLM calls and {results['crew']['tool_calls_per_run']} tool calls per run")
+    print(f"Knowledge base: {results['knowledge_base']['lookups_per_second']} lookups/s")
+    print(f"Prior reports: index of {results['prior_reports']['passages']} passages built in {results['prior_reports']['build_seconds']}s, "
+          f"search median {results['prior_reports']['search_ms']['median']}ms / p95 {results['prior_reports']['search_ms']['p95']}ms")
+    fanout = results['research_fanout']
+    print(f"Research fan-out over {fanout['subqueries']} sub-queries: {fanout['fanout']['seconds']}s for {fanout['fanout']['hits']} hits, "
+          f"sequential {fanout['sequential']['seconds']}s for {fanout['sequential']['hits']} hits, "
+          f"one compound search {fanout['single_search']['seconds']}s for {fanout['single_search']['hits']} hits")
+    tool_cache = results['tool_cache']
+    print(f"Tool cache over {tool_cache['calls']} pure tool calls from {tool_cache['instances']} tool sets: "
+          f"{tool_cache['cached_seconds']}s cached (hit rate {tool_cache['hit_rate']:.0%}), {tool_cache['uncached_seconds']}s uncached")
+    dedup = results['snippet_dedup']
+    print(f"Snippet dedup: {dedup['snippets_per_second']} snippets/s, {dedup['near_duplicates']} near-duplicates and "
+          f"{dedup['already_seen']} repeats of {dedup['snippets']} removed, ~{dedup['tokens_saved']} tokens saved")
+    print(f"format_to_text: {results['format_to_text']['mb_per_second']} MB/s "
+          f"({results['format_to_text']['input_bytes']} bytes of task output), "
+          f"streamed {results['format_to_text']['streaming_mb_per_second']} MB/s")
+    print(f"Email assembly: {results['email']['seconds']['median']}s for a {results['email']['attachment_bytes']} byte attachment")
+    delivery = results['email']['delivery']
+    print(f"Email delivery of {delivery['reports']} reports: {delivery['unpooled_seconds']}s over {delivery['unpooled_connections']} "
+          f"connections unpooled, {delivery['pooled_seconds']}s over {delivery['pooled_connections']} pooled, "
+          f"{delivery['streaming_peak_bytes']} bytes peak memory streaming one report")
+    print(f"Results written to {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+# checkpoints.py
+
+# --- Task Checkpoints ---
+# Persists each task's output as soon as it completes so an interrupted run can resume from the
+# first missing task instead of starting over. A checkpoint is only valid for the same task
+# (crewai's task key: original description + expected output), the same kickoff inputs and the
+# same upstream context outputs; changing any of them produces a different checkpoint key.
+# Checkpoints are only needed until a run's report is finalized: advance_agent.py discards a run's
+# checkpoints once its report is complete, and prunes those left by interrupted runs that were
+# never resumed once they are older than CHECKPOINT_MAX_AGE_HOURS.
+#
+# Configuration (.env):
+#   CHECKPOINTS_ENABLED     - "false" disables writing checkpoints (default true)
+#   CHECKPOINT_DIR          - directory holding checkpoint files (default checkpoints)
+#   CHECKPOINT_MAX_AGE_HOURS - age after which unused checkpoints are deleted, 0 keeps them (default 168)
+
+import hashlib
+import json
+import os
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+DEFAULT_CHECKPOINT_DIR = "checkpoints"
+DEFAULT_MAX_AGE_HOURS = 168.0
+
+
+def _sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def task_identity(task: Any) -> str:
+    return getattr(task, "key", None) or _sha256(f"{task.description}|{task.expected_output}")
+
+
+class CheckpointStore:
+    def __init__(self, directory: str = DEFAULT_CHECKPOINT_DIR, max_age_hours: float = DEFAULT_MAX_AGE_HOURS):
+        self.directory = directory
+        self.max_age_hours = max_age_hours
+
+    @classmethod
+    def from_env(cls) -> Optional["CheckpointStore"]:
+        if os.getenv("CHECKPOINTS_ENABLED", "true").strip().lower() in ("0", "false", "no", "off"):
+            return None
+        return cls(os.getenv("CHECKPOINT_DIR", DEFAULT_CHECKPOINT_DIR),
+                   max_age_hours=float(os.getenv("CHECKPOINT_MAX_AGE_HOURS", DEFAULT_MAX_AGE_HOURS)))
+
+    def checkpoint_key(self, task: Any, inputs: Optional[Dict[str, Any]], upstream_outputs: List[Any]) -> str:
+        parts = {
+            "task": task_identity(task),
+            "inputs": inputs or {},
+            "upstream": [_sha256(getattr(output, "raw", "") or "") for output in upstream_outputs],
+        }
+        return _sha256(json.dumps(parts, sort_keys=True, default=str))
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    # Returns the stored task output for this task/inputs/context combination, or None.
+    def load(self, task: Any, inputs: Optional[Dict[str, Any]], upstream_outputs: List[Any]) -> Optional[Any]:
+        path = self._path(self.checkpoint_key(task, inputs, upstream_outputs))
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                record = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Warning: Ignoring unreadable checkpoint '{path}': {e}")
+            return None
+
+        from crewai.tasks.task_output import TaskOutput
+        output = record["output"]
+        return TaskOutput(
+            name=output.get("name"),
+            description=output.get("description") or task.description,
+            expected_output=output.get("expected_output"),
+            raw=output.get("raw", ""),
+            json_dict=output.get("json_dict"),
+            agent=output.get("agent") or "",
+        )
+
+    # Writes the checkpoint atomically (temporary file + rename) so a crash never leaves a partial file.
+    def save(self, task: Any, inputs: Optional[Dict[str, Any]], upstream_outputs: List[Any], task_output: Any) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        key = self.checkpoint_key(task, inputs, upstream_outputs)
+        record = {
+            "key": key,
+            "task_identity": task_identity(task),
+            "inputs": inputs or {},
+            "created_at": datetime.now().isoformat(),
+            "output": {
+                "name": getattr(task_output, "name", None),
+                "description": getattr(task_output, "description", None),
+                "expected_output": getattr(task_output, "expected_output", None),
+                "raw": getattr(task_output, "raw", ""),
+                "json_dict": getattr(task_output, "json_dict", None),
+                "agent": getattr(task_output, "agent", None),
+            },
+        }
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(record, f, indent=2, default=str)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._path(key))
+        return key
+
+    # Deletes the checkpoints with these keys (e.g. those of a run whose report is complete).
+    def discard(self, keys: Iterable[str]) -> int:
+        removed = 0
+        for key in set(keys):
+            try:
+                os.remove(self._path(key))
+                removed += 1
+            except FileNotFoundError:
+                pass
+        return removed
+
+    # Deletes checkpoints (and temporary files of interrupted writes) older than max_age_hours.
+    def prune(self) -> int:
+        if self.max_age_hours <= 0:
+            return 0
+        cutoff = time.time() - self.max_age_hours * 3600
+        removed = 0
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return 0
+        for name in names:
+            if not name.endswith((".json", ".tmp")):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    removed += 1
+            except FileNotFoundError:
+                pass
+        return removed
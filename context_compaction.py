@@ -0,0 +1,207 @@
+# context_compaction.py
+
+# --- Context Compaction ---
+# Keeps the context handed to a task within a token budget. Late tasks (strategy development,
+# reflection) receive four upstream outputs of several thousand tokens each; when their combined
+# size exceeds the task's budget, each upstream output gets a share of the budget, its sections
+# are ranked by BM25 relevance to the task's description and expected output, the most relevant
+# sections are passed through verbatim, and the rest are reduced to a one-line extractive summary
+# (section heading plus its most relevant sentence). Contexts within budget pass through unchanged.
+#
+# Token counts are estimated at ~4 characters per token, which is close enough for budgeting.
+#
+# Configuration (.env):
+#   CONTEXT_TOKEN_BUDGET   - default per-task context budget in tokens, 0 disables compaction (default 4000)
+#   CONTEXT_TOKEN_BUDGETS  - per-task overrides by task name, e.g. "reflection_task=2500,strategy_development_task=3500"
+
+import math
+import os
+import re
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from knowledge_index import BM25_B, BM25_K1, tokenize
+
+DEFAULT_TOKEN_BUDGET = 4000
+CHARS_PER_TOKEN = 4
+SUMMARY_SENTENCE_CHARS = 240
+HEADING_PATTERN = re.compile(r"^\s*(#{1,6}\s|\d+[.)]\s|\*\*[^*]+\*\*:?\s*$|[A-Z][A-Za-z /&-]{2,60}:\s*$)")
+SENTENCE_PATTERN = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9\"'(*])")
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN) if text else 0
+
+
+# Splits an output at heading-like lines; outputs without headings are split into paragraphs,
+# and a single paragraph into its lines (typically bullet points).
+def split_sections(text: str) -> List[str]:
+    sections: List[List[str]] = []
+    for line in text.splitlines():
+        if not sections or (HEADING_PATTERN.match(line) and any(l.strip() for l in sections[-1])):
+            sections.append([])
+        sections[-1].append(line)
+    result = ["\n".join(lines).strip() for lines in sections]
+    result = [section for section in result if section]
+    if len(result) <= 1:
+        result = [p.strip() for p in re.split(r"\n\s*\n", text) if p.strip()]
+    if len(result) <= 1:
+        result = [line.strip() for line in text.splitlines() if line.strip()]
+    return result
+
+
+def _bm25(query_terms: List[str], documents: List[List[str]]) -> List[float]:
+    if not documents:
+        return []
+    count = len(documents)
+    avg_length = (sum(len(doc) for doc in documents) / count) or 1.0
+    document_frequency = Counter(term for doc in documents for term in set(doc))
+    scores = []
+    for doc in documents:
+        frequencies = Counter(doc)
+        length_norm = 1 - BM25_B + BM25_B * len(doc) / avg_length
+        score = 0.0
+        for term in set(query_terms):
+            frequency = frequencies.get(term)
+            if not frequency:
+                continue
+            idf = math.log(1 + (count - document_frequency[term] + 0.5) / (document_frequency[term] + 0.5))
+            score += idf * frequency * (BM25_K1 + 1) / (frequency + BM25_K1 * length_norm)
+        scores.append(score)
+    return scores
+
+
+@dataclass
+class CompactionResult:
+    text: str
+    original_tokens: int
+    compacted_tokens: int
+    sections_kept: int = 0
+    sections_summarized: int = 0
+    sections_dropped: int = 0
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.original_tokens - self.compacted_tokens
+
+
+class ContextCompactor:
+    def __init__(self, default_budget: int = DEFAULT_TOKEN_BUDGET, budgets: Optional[Dict[str, int]] = None):
+        self.default_budget = default_budget
+        self.budgets = dict(budgets or {})
+        self._lock = threading.Lock()
+        self._results: Dict[str, CompactionResult] = {}
+
+    @classmethod
+    def from_env(cls) -> "ContextCompactor":
+        budgets = {}
+        for item in os.getenv("CONTEXT_TOKEN_BUDGETS", "").split(","):
+            if not item.strip():
+                continue
+            name, _, value = item.partition("=")
+            try:
+                budgets[name.strip()] = int(value)
+            except ValueError:
+                print(f"Warning: Ignoring invalid CONTEXT_TOKEN_BUDGETS entry '{item.strip()}'.")
+        return cls(int(os.getenv("CONTEXT_TOKEN_BUDGET", DEFAULT_TOKEN_BUDGET)), budgets)
+
+    def budget_for(self, task: Any) -> int:
+        name = getattr(task, "name", None)
+        return self.budgets.get(name, self.default_budget) if name else self.default_budget
+
+    # Returns the context for `task` built from the raw upstream outputs, compacted if over budget.
+    def compact(self, task: Any, upstream_texts: List[str], divider: str, label: Optional[str] = None) -> str:
+        result = self.compact_texts(upstream_texts, divider, self.budget_for(task),
+                                    f"{getattr(task, 'description', '')}\n{getattr(task, 'expected_output', '')}")
+        if result.tokens_saved > 0:
+            label = label or getattr(task, "name", None) or "task"
+            with self._lock:
+                self._results[label] = result
+            print(f"Context compaction for '{label}': {result.original_tokens} -> {result.compacted_tokens} tokens "
+                  f"(saved {result.tokens_saved}; {result.sections_kept} sections kept, "
+                  f"{result.sections_summarized} summarized, {result.sections_dropped} dropped).")
+        return result.text
+
+    def compact_texts(self, texts: List[str], divider: str, budget: int, query: str) -> CompactionResult:
+        joined = divider.join(texts)
+        original_tokens = estimate_tokens(joined)
+        if budget <= 0 or original_tokens <= budget or not texts:
+            return CompactionResult(joined, original_tokens, original_tokens)
+
+        query_terms = tokenize(query)
+        remaining = max(budget - estimate_tokens(divider) * (len(texts) - 1), 0)
+        result = CompactionResult("", original_tokens, 0)
+        parts = [""] * len(texts)
+        # Smallest outputs first, each getting an equal share of what is left, so budget unused by
+        # short outputs flows to the longer ones.
+        pending = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        while pending:
+            i = pending.pop(0)
+            share = remaining // (len(pending) + 1)
+            if estimate_tokens(texts[i]) <= share:
+                parts[i] = texts[i]
+            else:
+                parts[i] = self._compact_text(texts[i], share, query_terms, result)
+            remaining -= estimate_tokens(parts[i])
+        result.text = divider.join(parts)
+        result.compacted_tokens = estimate_tokens(result.text)
+        return result
+
+    # Keeps the highest-ranked sections that fit, then adds one-line summaries of the others
+    # while budget remains. Sections keep their original order in the output.
+    def _compact_text(self, text: str, budget: int, query_terms: List[str], result: CompactionResult) -> str:
+        sections = split_sections(text)
+        scores = _bm25(query_terms, [tokenize(section) for section in sections])
+        ranked = sorted(range(len(sections)), key=lambda i: (-scores[i], i))
+        chosen: Dict[int, str] = {}
+        remaining = budget
+        for i in ranked:
+            cost = estimate_tokens(sections[i]) + 1
+            if cost <= remaining:
+                chosen[i] = sections[i]
+                remaining -= cost
+        result.sections_kept += len(chosen)
+
+        for i in ranked:
+            if i in chosen:
+                continue
+            heading, summary = self._summarize_section(sections[i], query_terms)
+            # Fall back to the bare heading when the one-line summary does not fit.
+            for candidate in (summary, heading):
+                cost = estimate_tokens(candidate) + 1
+                if candidate and cost <= remaining:
+                    chosen[i] = candidate
+                    remaining -= cost
+                    result.sections_summarized += 1
+                    break
+            else:
+                result.sections_dropped += 1
+        return "\n".join(chosen[i] for i in sorted(chosen))
+
+    # Returns the section heading (if any) and a one-line summary: heading plus most relevant sentence.
+    @staticmethod
+    def _summarize_section(section: str, query_terms: List[str]) -> Tuple[str, str]:
+        lines = section.splitlines()
+        heading = lines[0].strip() if HEADING_PATTERN.match(lines[0]) else ""
+        body = " ".join(line.strip() for line in (lines[1:] if heading else lines))
+        sentences = [s.strip(" -*") for s in SENTENCE_PATTERN.split(body) if s.strip(" -*")]
+        best = ""
+        if sentences:
+            scores = _bm25(query_terms, [tokenize(sentence) for sentence in sentences])
+            best = sentences[max(range(len(sentences)), key=lambda i: (scores[i], -i))]
+            if len(best) > SUMMARY_SENTENCE_CHARS:
+                best = best[:SUMMARY_SENTENCE_CHARS].rsplit(" ", 1)[0] + "..."
+        if heading and best:
+            return heading, f"{heading} (condensed) {best}"
+        return heading, f"(condensed) {best}" if best else heading
+
+    # Compaction results of this run keyed by task label, for reporting.
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {
+                label: {"original_tokens": r.original_tokens, "compacted_tokens": r.compacted_tokens,
+                        "tokens_saved": r.tokens_saved}
+                for label, r in self._results.items()
+            }
@@ -0,0 +1,487 @@
+# email_delivery.py
+
+# --- Pooled Report Delivery ---
+# Sends report emails over a small pool of authenticated SMTP sessions. A session is opened (connect,
+# EHLO, STARTTLS or SSL, login) once and reused for later messages, so mailing several reports costs
+# one handshake instead of one per email. Each report is sent as a single message to its whole
+# recipient list. A reused session the server has dropped (SMTPServerDisconnected) is discarded and
+# the message is retried on a fresh session; a failure on a fresh session is reported right away.
+# Sessions idle longer than SMTP_MAX_IDLE_SECONDS are closed instead of reused, since servers drop
+# idle clients.
+#
+# The attachment is streamed: headers and body are built with email.message.EmailMessage, and the
+# attachment's base64 lines are generated from the file in fixed-size blocks while the DATA command
+# is being sent, so memory use does not grow with the report size. Attachments larger than
+# EMAIL_COMPRESS_THRESHOLD_BYTES are first compressed to a temporary .gz or .zip file.
+#
+# Configuration (.env):
+#   EMAIL_ADDRESS / EMAIL_PASSWORD - sender credentials
+#   SMTP_SERVER / SMTP_PORT        - SMTP server; port 465 uses SSL, other ports use STARTTLS
+#   SMTP_SECURITY                  - override: ssl, starttls or none (plain, e.g. a local test server)
+#   SMTP_TIMEOUT                   - socket timeout in seconds (default 20)
+#   SMTP_MAX_SESSIONS              - sessions open at once in the process (default 2)
+#   SMTP_MAX_IDLE_SECONDS          - idle time after which a pooled session is not reused (default 60)
+#   EMAIL_ATTACHMENT_COMPRESSION   - gzip, zip or none (default gzip)
+#   EMAIL_COMPRESS_THRESHOLD_BYTES - attachments larger than this are compressed (default 1000000)
+
+import atexit
+import base64
+import gzip
+import os
+import re
+import shutil
+import smtplib
+import socket
+import tempfile
+import threading
+import time
+import uuid
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from email.message import EmailMessage
+from email.policy import SMTP as SMTP_POLICY
+from typing import Dict, Any, Iterator, List, Optional, Tuple, Union
+
+DEFAULT_TIMEOUT = 20.0
+DEFAULT_MAX_SESSIONS = 2
+DEFAULT_MAX_IDLE_SECONDS = 60.0
+DEFAULT_RECONNECT_ATTEMPTS = 2
+SECURITY_MODES = ("ssl", "starttls", "none")
+DEFAULT_COMPRESSION = "gzip"
+DEFAULT_COMPRESS_THRESHOLD_BYTES = 1_000_000
+COMPRESSION_MODES = ("gzip", "zip", "none")
+# Read size for attachments: a multiple of 57 bytes, so every block encodes to whole 76-character base64 lines.
+READ_BLOCK_BYTES = 57 * 1024
+DOT_AT_LINE_START = re.compile(rb"^\.", re.MULTILINE)
+
+
+# --- Report Messages ---
+# A report email whose attachment stays on disk. The message without the attachment data is flattened
+# once (CRLF line endings); chunks() yields it with the base64 attachment lines generated in between.
+# Call close() (or use it as a context manager) to remove a temporary compressed attachment.
+class ReportEmail:
+    def __init__(self, sender_email: str, recipient_email: Union[str, List[str]], subject: str, body: str,
+                 file_path: str, compression: str = "none", compress_threshold: Optional[int] = None,
+                 attachment_name: Optional[str] = None):
+        if compression not in COMPRESSION_MODES:
+            raise ValueError(f"Unknown attachment compression '{compression}'. Must be one of {', '.join(COMPRESSION_MODES)}.")
+        self.file_path = file_path
+        self.original_bytes = os.path.getsize(file_path)
+        self._temp_path: Optional[str] = None
+        self.attachment_path = file_path
+        self.attachment_name = attachment_name or os.path.basename(file_path)
+        content_type = ("application", "octet-stream")
+        if compression != "none" and compress_threshold is not None and self.original_bytes > compress_threshold:
+            self._temp_path, self.attachment_name, content_type = self._compress(file_path, compression, self.attachment_name)
+            self.attachment_path = self._temp_path
+        self.attachment_bytes = os.path.getsize(self.attachment_path)
+
+        self.message = EmailMessage(policy=SMTP_POLICY)
+        self.message['From'] = sender_email
+        self.message['To'] = recipient_email if isinstance(recipient_email, str) else ", ".join(recipient_email)
+        self.message['Subject'] = subject
+        self.message.set_content(body)
+        # The attachment part carries a placeholder payload that marks where the streamed data goes.
+        marker = f"streamed-attachment-{uuid.uuid4().hex}"
+        self.message.add_attachment(b"", maintype=content_type[0], subtype=content_type[1], filename=self.attachment_name)
+        list(self.message.iter_attachments())[-1].set_payload(marker)
+        self._prefix, self._suffix = self.message.as_bytes().split(marker.encode("ascii"), 1)
+        if self.attachment_bytes and self._suffix.startswith(b"\r\n"):
+            self._suffix = self._suffix[2:]
+
+    # Compresses `path` into a temporary file in blocks; returns (temp path, attachment name, content type).
+    @staticmethod
+    def _compress(path: str, compression: str, name: str) -> Tuple[str, str, Tuple[str, str]]:
+        suffix = ".zip" if compression == "zip" else ".gz"
+        fd, temp_path = tempfile.mkstemp(prefix="report-attachment-", suffix=suffix)
+        try:
+            with os.fdopen(fd, "wb") as target:
+                if compression == "zip":
+                    with zipfile.ZipFile(target, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+                        archive.write(path, arcname=name)
+                else:
+                    with open(path, "rb") as source, gzip.GzipFile(filename=name, mode="wb", fileobj=target) as compressed:
+                        shutil.copyfileobj(source, compressed, READ_BLOCK_BYTES)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        return temp_path, name + suffix, ("application", "zip" if compression == "zip" else "gzip")
+
+    # Size of the serialized message in bytes (before SMTP dot-stuffing).
+    @property
+    def size(self) -> int:
+        blocks, remainder = divmod(self.attachment_bytes, 57)
+        encoded = blocks * 78 + (4 * -(-remainder // 3) + 2 if remainder else 0)
+        return len(self._prefix) + encoded + len(self._suffix)
+
+    # The serialized message in pieces that each start at a line boundary.
+    def chunks(self) -> Iterator[bytes]:
+        yield self._prefix
+        with open(self.attachment_path, "rb") as attachment:
+            for block in iter(lambda: attachment.read(READ_BLOCK_BYTES), b""):
+                yield base64.encodebytes(block).replace(b"\n", b"\r\n")
+        yield self._suffix
+
+    def as_bytes(self) -> bytes:
+        return b"".join(self.chunks())
+
+    def as_string(self) -> str:
+        return self.as_bytes().decode("ascii")
+
+    def close(self) -> None:
+        if self._temp_path is not None:
+            try:
+                os.remove(self._temp_path)
+            except OSError:
+                pass
+            self._temp_path = None
+
+    def __enter__(self) -> "ReportEmail":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+# Builds the report email; raises IOError (OSError) if the file cannot be read.
+def build_email_message(sender_email, recipient_email, subject, body, file_path, compression="none", compress_threshold=None):
+    return ReportEmail(sender_email, recipient_email, subject, body, file_path, compression, compress_threshold)
+
+
+# Sends a ReportEmail with the same SMTP steps as smtplib's sendmail(), but writes the DATA phase
+# chunk by chunk instead of from one string. Returns the refused recipients like sendmail().
+def send_streamed(server: smtplib.SMTP, from_addr: str, to_addrs: List[str], message: ReportEmail) -> Dict[str, Any]:
+    server.ehlo_or_helo_if_needed()
+    options = [f"SIZE={message.size}"] if server.has_extn("size") else []
+    code, reply = server.mail(from_addr, options)
+    if code != 250:
+        _abort_transaction(server, code)
+        raise smtplib.SMTPSenderRefused(code, reply, from_addr)
+    refused = {}
+    for address in to_addrs:
+        code, reply = server.rcpt(address)
+        if code not in (250, 251):
+            refused[address] = (code, reply)
+        if code == 421:
+            server.close()
+            raise smtplib.SMTPRecipientsRefused(refused)
+    if len(refused) == len(to_addrs):
+        _abort_transaction(server, code)
+        raise smtplib.SMTPRecipientsRefused(refused)
+    server.putcmd("data")
+    code, reply = server.getreply()
+    if code != 354:
+        _abort_transaction(server, code)
+        raise smtplib.SMTPDataError(code, reply)
+    for chunk in message.chunks():
+        server.send(DOT_AT_LINE_START.sub(b"..", chunk))
+    server.send(b".\r\n")
+    code, reply = server.getreply()
+    if code != 250:
+        _abort_transaction(server, code)
+        raise smtplib.SMTPDataError(code, reply)
+    return refused
+
+
+def _abort_transaction(server: smtplib.SMTP, code: int) -> None:
+    if code == 421:
+        server.close()
+        return
+    try:
+        server.rset()
+    except smtplib.SMTPServerDisconnected:
+        pass
+
+
+# Splits comma-separated strings and lists of strings into a flat list of addresses.
+def recipient_list(recipients: Union[str, List[str], None]) -> List[str]:
+    values = [recipients] if isinstance(recipients, str) else list(recipients or [])
+    return [address.strip() for value in values for address in value.split(",") if address.strip()]
+
+
+@dataclass
+class SMTPSettings:
+    sender_email: Optional[str]
+    password: Optional[str]
+    server: Optional[str]
+    port: Optional[int]
+    security: str = "starttls"
+    timeout: float = DEFAULT_TIMEOUT
+
+    @classmethod
+    def from_env(cls) -> "SMTPSettings":
+        port_value = os.getenv("SMTP_PORT")
+        try:
+            port = int(port_value) if port_value else None
+        except ValueError:
+            port = -1
+        security = (os.getenv("SMTP_SECURITY") or ("ssl" if port == 465 else "starttls")).strip().lower()
+        return cls(
+            sender_email=os.getenv("EMAIL_ADDRESS"),
+            password=os.getenv("EMAIL_PASSWORD"),
+            server=os.getenv("SMTP_SERVER"),
+            port=port,
+            security=security,
+            timeout=float(os.getenv("SMTP_TIMEOUT", DEFAULT_TIMEOUT)),
+        )
+
+    # Returns a description of what is missing or invalid, or None if the settings are usable.
+    def problem(self) -> Optional[str]:
+        if not all([self.sender_email, self.password, self.server, self.port]):
+            return ("Email credentials or SMTP server details not found in .env file. "
+                    "Please ensure EMAIL_ADDRESS, EMAIL_PASSWORD, SMTP_SERVER, and SMTP_PORT are set.")
+        if self.port < 1:
+            return f"Invalid SMTP_PORT defined in .env file: {os.getenv('SMTP_PORT')}. Must be a number."
+        if self.security not in SECURITY_MODES:
+            return f"Invalid SMTP_SECURITY '{self.security}'. Must be one of {', '.join(SECURITY_MODES)}."
+        return None
+
+
+# --- SMTP Session Pool ---
+# Raised when a session taken from the pool turns out to have been dropped by the server; the
+# message can be retried on a fresh session.
+class StaleSessionError(smtplib.SMTPServerDisconnected):
+    pass
+
+
+class SMTPSessionPool:
+    def __init__(self, settings: SMTPSettings, max_sessions: int = DEFAULT_MAX_SESSIONS,
+                 max_idle_seconds: float = DEFAULT_MAX_IDLE_SECONDS):
+        if max_sessions < 1:
+            raise ValueError(f"max_sessions must be at least 1, got {max_sessions}.")
+        self.settings = settings
+        self.max_sessions = max_sessions
+        self.max_idle_seconds = max_idle_seconds
+        self._slots = threading.BoundedSemaphore(max_sessions)
+        self._idle: List[Any] = []
+        self._lock = threading.Lock()
+        self._stats = {"connections": 0, "logins": 0, "sessions_reused": 0, "sessions_discarded": 0}
+
+    def _count(self, counter: str) -> None:
+        with self._lock:
+            self._stats[counter] += 1
+
+    # Opens and authenticates a new session.
+    def _connect(self) -> smtplib.SMTP:
+        settings = self.settings
+        if settings.security == "ssl":
+            server = smtplib.SMTP_SSL(settings.server, settings.port, timeout=settings.timeout)
+        else:
+            server = smtplib.SMTP(settings.server, settings.port, timeout=settings.timeout)
+        try:
+            if settings.security == "starttls":
+                server.ehlo()
+                server.starttls()
+                server.ehlo()
+            self._count("connections")
+            server.login(settings.sender_email, settings.password)
+            self._count("logins")
+        except BaseException:
+            self._close(server)
+            raise
+        return server
+
+    @staticmethod
+    def _close(server: Any) -> None:
+        try:
+            server.quit()
+        except (smtplib.SMTPException, OSError):
+            server.close()
+
+    # Checks a session out of the pool (waiting while all sessions are in use). A session that
+    # raises SMTPServerDisconnected or a socket error is discarded; after an SMTP error reply (which
+    # smtplib follows with RSET) or success it is returned to the pool. A reused session that was
+    # dropped raises StaleSessionError instead of SMTPServerDisconnected.
+    @contextmanager
+    def session(self) -> Iterator[smtplib.SMTP]:
+        self._slots.acquire()
+        server = None
+        try:
+            server = self._take_idle()
+            reused = server is not None
+            if server is None:
+                server = self._connect()
+            try:
+                yield server
+            except OSError as e:
+                if isinstance(e, smtplib.SMTPServerDisconnected) or not isinstance(e, smtplib.SMTPException):
+                    self._count("sessions_discarded")
+                    server.close()
+                    server = None
+                    if reused and isinstance(e, smtplib.SMTPServerDisconnected):
+                        raise StaleSessionError(*e.args) from e
+                raise
+        finally:
+            if server is not None:
+                with self._lock:
+                    self._idle.append((time.monotonic(), server))
+            self._slots.release()
+
+    def _take_idle(self) -> Optional[smtplib.SMTP]:
+        while True:
+            with self._lock:
+                if not self._idle:
+                    return None
+                last_used, server = self._idle.pop()
+            if time.monotonic() - last_used <= self.max_idle_seconds:
+                self._count("sessions_reused")
+                return server
+            self._close(server)
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for _, server in idle:
+            self._close(server)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["idle_sessions"] = len(self._idle)
+        return stats
+
+
+# --- Report Mailer ---
+@dataclass
+class DeliveryResult:
+    file_path: str
+    recipients: List[str]
+    delivered: List[str] = field(default_factory=list)
+    refused: Dict[str, str] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and not self.refused and bool(self.delivered)
+
+
+class ReportMailer:
+    def __init__(self, settings: Optional[SMTPSettings] = None, pool: Optional[SMTPSessionPool] = None,
+                 reconnect_attempts: int = DEFAULT_RECONNECT_ATTEMPTS, compression: str = DEFAULT_COMPRESSION,
+                 compress_threshold: Optional[int] = DEFAULT_COMPRESS_THRESHOLD_BYTES):
+        self.settings = settings or (pool.settings if pool is not None else SMTPSettings.from_env())
+        self.pool = pool or SMTPSessionPool(self.settings)
+        self.reconnect_attempts = reconnect_attempts
+        self.compression = compression
+        self.compress_threshold = compress_threshold
+        self._lock = threading.Lock()
+        self._stats = {"messages": 0, "delivered_recipients": 0, "refused_recipients": 0, "failed_messages": 0,
+                       "reconnects": 0}
+
+    @classmethod
+    def from_env(cls) -> "ReportMailer":
+        settings = SMTPSettings.from_env()
+        pool = SMTPSessionPool(settings, max_sessions=int(os.getenv("SMTP_MAX_SESSIONS", DEFAULT_MAX_SESSIONS)),
+                               max_idle_seconds=float(os.getenv("SMTP_MAX_IDLE_SECONDS", DEFAULT_MAX_IDLE_SECONDS)))
+        return cls(settings, pool,
+                   compression=os.getenv("EMAIL_ATTACHMENT_COMPRESSION", DEFAULT_COMPRESSION).strip().lower(),
+                   compress_threshold=int(os.getenv("EMAIL_COMPRESS_THRESHOLD_BYTES", DEFAULT_COMPRESS_THRESHOLD_BYTES)))
+
+    def _count(self, counter: str, amount: int = 1) -> None:
+        with self._lock:
+            self._stats[counter] += amount
+
+    # Sends one report to every recipient in a single message. Errors are reported in the result.
+    # `attachment_name` overrides the file name the attachment is given (default: that of file_path).
+    def send_report(self, recipients: Union[str, List[str]], subject: str, body: str, file_path: str,
+                    attachment_name: Optional[str] = None) -> DeliveryResult:
+        result = DeliveryResult(file_path, recipient_list(recipients))
+        result.error = self.settings.problem()
+        if result.error is None:
+            invalid = [address for address in result.recipients if '@' not in address]
+            if not result.recipients or invalid:
+                result.error = f"Invalid recipient email address provided: {', '.join(invalid) or recipients!r}"
+            elif not os.path.exists(file_path):
+                result.error = f"Attachment file not found at: {file_path}"
+        message = None
+        if result.error is None:
+            try:
+                message = ReportEmail(self.settings.sender_email, result.recipients, subject, body, file_path,
+                                      self.compression, self.compress_threshold, attachment_name)
+            except IOError as e:
+                result.error = f"Error reading attachment file '{file_path}': {e}"
+            except ValueError as e:
+                result.error = str(e)
+        if message is not None:
+            try:
+                with message:
+                    refused = self._send(message, result.recipients)
+                result.refused = {address: f"{code} {reply.decode(errors='replace') if isinstance(reply, bytes) else reply}"
+                                  for address, (code, reply) in refused.items()}
+                result.delivered = [address for address in result.recipients if address not in refused]
+            except smtplib.SMTPAuthenticationError:
+                result.error = ("SMTP Authentication failed. Check EMAIL_ADDRESS and EMAIL_PASSWORD/app password in .env file. "
+                                "(If using Gmail with 2FA, ensure you are using an App Password).")
+            except smtplib.SMTPRecipientsRefused as e:
+                result.refused = {address: f"{code} {reply.decode(errors='replace') if isinstance(reply, bytes) else reply}"
+                                  for address, (code, reply) in e.recipients.items()}
+            except (smtplib.SMTPConnectError, smtplib.SMTPServerDisconnected) as e:
+                result.error = self._connection_error(e)
+            except smtplib.SMTPException as e:
+                result.error = f"An SMTP error occurred: {e}"
+            except (socket.gaierror, socket.timeout, OSError) as e:
+                result.error = self._connection_error(e)
+
+        self._count("messages")
+        self._count("delivered_recipients", len(result.delivered))
+        self._count("refused_recipients", len(result.refused))
+        if result.error is not None:
+            self._count("failed_messages")
+            print(f"Error: {result.error}")
+        for address, reason in result.refused.items():
+            print(f"Warning: Recipient {address} refused by the SMTP server: {reason}")
+        return result
+
+    def _connection_error(self, error: BaseException) -> str:
+        return (f"Could not connect to or communicate with SMTP server {self.settings.server}:{self.settings.port}. "
+                f"Check server/port details, network connection, and firewall. Specific error: {error}")
+
+    # Sends on a pooled session, retrying on a fresh session if the server had dropped a reused one.
+    # Failures on a fresh session (including while connecting) are not retried.
+    def _send(self, message: ReportEmail, recipients: List[str]) -> Dict[str, Any]:
+        attempt = 0
+        while True:
+            try:
+                with self.pool.session() as server:
+                    return send_streamed(server, self.settings.sender_email, recipients, message)
+            except StaleSessionError:
+                if attempt >= self.reconnect_attempts:
+                    raise
+                attempt += 1
+                self._count("reconnects")
+                print(f"Warning: SMTP server closed the connection; reconnecting (attempt {attempt}/{self.reconnect_attempts}).")
+
+    # Sends several reports, each as {"recipients", "subject", "body", "file_path"}, reusing pooled
+    # sessions; up to the pool size are sent concurrently. Results keep the order of `deliveries`.
+    def send_reports(self, deliveries: List[Dict[str, Any]]) -> List[DeliveryResult]:
+        if len(deliveries) <= 1 or self.pool.max_sessions == 1:
+            return [self.send_report(**delivery) for delivery in deliveries]
+        with ThreadPoolExecutor(max_workers=self.pool.max_sessions, thread_name_prefix="smtp") as executor:
+            return list(executor.map(lambda delivery: self.send_report(**delivery), deliveries))
+
+    def close(self) -> None:
+        self.pool.close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats.update(self.pool.stats())
+        return stats
+
+
+# --- Process-wide Instance ---
+_shared_mailer: Optional[ReportMailer] = None
+_shared_mailer_lock = threading.Lock()
+
+
+# The shared mailer's idle sessions are closed (QUIT) when the process exits.
+def get_mailer() -> ReportMailer:
+    global _shared_mailer
+    if _shared_mailer is None:
+        with _shared_mailer_lock:
+            if _shared_mailer is None:
+                _shared_mailer = ReportMailer.from_env()
+                atexit.register(_shared_mailer.close)
+    return _shared_mailer
@@ -0,0 +1,417 @@
+# email_outbox.py
+
+# --- Durable Email Outbox ---
+# Report emails are queued on disk and delivered by a background sender, so a run does not wait on
+# SMTP and a failed delivery is retried instead of dropped. Enqueueing copies the report into the
+# outbox and writes the job atomically (temporary file + fsync + rename) before returning, so a
+# queued email survives crashes and later deletion of the report. The sender retries transient
+# failures with exponential backoff; a job that runs out of attempts, or whose recipients are all
+# refused permanently (5xx), is moved to the dead-letter folder and reported, never discarded.
+# A report already queued or sent to the same recipients (same report hash) is not queued again.
+#
+# Layout of OUTBOX_DIR:
+#   pending/      jobs waiting for their next delivery attempt
+#   sending/      jobs claimed by a sender; returned to pending if that sender died mid-delivery
+#   sent/         delivery records, kept for deduplication
+#   dead_letter/  jobs that failed permanently; `python email_outbox.py retry <id>` requeues one
+#   attachments/  a copy of each queued report, removed once its job has been sent
+#
+# Configuration (.env):
+#   OUTBOX_ENABLED             - "false" sends report emails synchronously instead (default true)
+#   OUTBOX_DIR                 - outbox directory (default outbox)
+#   OUTBOX_MAX_ATTEMPTS        - delivery attempts before a job is dead-lettered (default 8)
+#   OUTBOX_BACKOFF_SECONDS     - delay after the first failed attempt, doubled per attempt (default 30)
+#   OUTBOX_BACKOFF_MAX_SECONDS - upper bound for the retry delay (default 3600)
+#   OUTBOX_FLUSH_SECONDS       - how long a finishing run waits for due emails before exiting (default 0:
+#                                exit right after enqueueing; the next run's sender or `drain` delivers them)
+#
+# Usage:
+#   python email_outbox.py status
+#   python email_outbox.py drain [--wait]   - deliver due jobs (with --wait, until none are left)
+#   python email_outbox.py retry <id>       - move a dead-letter job back to pending
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+
+from email_delivery import get_mailer, recipient_list
+
+DEFAULT_OUTBOX_DIR = "outbox"
+DEFAULT_MAX_ATTEMPTS = 8
+DEFAULT_BACKOFF_SECONDS = 30.0
+DEFAULT_BACKOFF_MAX_SECONDS = 3600.0
+DEFAULT_FLUSH_SECONDS = 0.0
+DEFAULT_LEASE_SECONDS = 600.0
+DEFAULT_POLL_SECONDS = 5.0
+FOLDERS = ("pending", "sending", "sent", "dead_letter", "attachments")
+HASH_BLOCK_BYTES = 1024 * 1024
+
+
+def _env_flag(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_BYTES), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# Permanent refusals are 5xx replies; DeliveryResult.refused values start with the reply code.
+def _is_permanent(reason: str) -> bool:
+    return reason.strip()[:1] == "5"
+
+
+class EmailOutbox:
+    def __init__(self, directory: str = DEFAULT_OUTBOX_DIR, max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+                 backoff_seconds: float = DEFAULT_BACKOFF_SECONDS, backoff_max_seconds: float = DEFAULT_BACKOFF_MAX_SECONDS,
+                 lease_seconds: float = DEFAULT_LEASE_SECONDS):
+        self.directory = directory
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self.lease_seconds = lease_seconds
+        for folder in FOLDERS:
+            os.makedirs(os.path.join(directory, folder), exist_ok=True)
+
+    @classmethod
+    def from_env(cls) -> Optional["EmailOutbox"]:
+        if not _env_flag("OUTBOX_ENABLED", True):
+            return None
+        return cls(
+            os.getenv("OUTBOX_DIR", DEFAULT_OUTBOX_DIR),
+            max_attempts=int(os.getenv("OUTBOX_MAX_ATTEMPTS", DEFAULT_MAX_ATTEMPTS)),
+            backoff_seconds=float(os.getenv("OUTBOX_BACKOFF_SECONDS", DEFAULT_BACKOFF_SECONDS)),
+            backoff_max_seconds=float(os.getenv("OUTBOX_BACKOFF_MAX_SECONDS", DEFAULT_BACKOFF_MAX_SECONDS)),
+        )
+
+    def _path(self, folder: str, job_id: str) -> str:
+        return os.path.join(self.directory, folder, f"{job_id}.json")
+
+    # Writes a job file atomically (temporary file + fsync + rename).
+    def _write(self, folder: str, job: Dict[str, Any]) -> None:
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.join(self.directory, folder), suffix=".tmp")
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(job, f, indent=2, default=str)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._path(folder, job["id"]))
+
+    def _read(self, path: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Warning: Ignoring unreadable outbox job '{path}': {e}")
+            return None
+
+    def job_ids(self, folder: str) -> List[str]:
+        return sorted(name[:-5] for name in os.listdir(os.path.join(self.directory, folder)) if name.endswith(".json"))
+
+    def find(self, job_id: str) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+        for folder in ("pending", "sending", "sent", "dead_letter"):
+            job = self._read(self._path(folder, job_id))
+            if job is not None:
+                return folder, job
+        return None, None
+
+    # --- Enqueueing ---
+    # Queues `file_path` for delivery to `recipients`; returns the job id. The report is copied into
+    # the outbox first. Raises OSError if the report cannot be read or the outbox cannot be written.
+    def enqueue(self, recipients: List[str], subject: str, body: str, file_path: str) -> str:
+        recipients = recipient_list(recipients)
+        report_hash = file_sha256(file_path)
+        job_id = hashlib.sha256(f"{report_hash}|{','.join(sorted(recipients))}".encode("utf-8")).hexdigest()[:32]
+        folder, _ = self.find(job_id)
+        if folder is not None:
+            print(f"Report '{file_path}' is already {'sent' if folder == 'sent' else 'queued'} to "
+                  f"{', '.join(recipients)} (outbox job {job_id} in {folder}/); not queued again.")
+            return job_id
+
+        extension = os.path.splitext(file_path)[1]
+        attachment = os.path.join(self.directory, "attachments", f"{job_id}{extension}")
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(attachment), suffix=".tmp")
+        with os.fdopen(fd, 'wb') as target, open(file_path, 'rb') as source:
+            shutil.copyfileobj(source, target, HASH_BLOCK_BYTES)
+            target.flush()
+            os.fsync(target.fileno())
+        os.replace(tmp_path, attachment)
+        self._write("pending", {
+            "id": job_id,
+            "report_hash": report_hash,
+            "report_path": file_path,
+            "attachment": attachment,
+            "attachment_name": os.path.basename(file_path),
+            "recipients": recipients,
+            "subject": subject,
+            "body": body,
+            "created_at": datetime.now().isoformat(),
+            "attempts": 0,
+            "next_attempt_at": time.time(),
+            "delivered": [],
+            "refused": {},
+            "history": [],
+        })
+        return job_id
+
+    # --- Delivery ---
+    # Moves jobs left in sending/ by a sender that died back to pending/.
+    def recover_stale(self) -> int:
+        recovered = 0
+        for job_id in self.job_ids("sending"):
+            path = self._path("sending", job_id)
+            try:
+                if time.time() - os.path.getmtime(path) > self.lease_seconds:
+                    os.replace(path, self._path("pending", job_id))
+                    recovered += 1
+            except OSError:
+                continue
+        return recovered
+
+    # Pending jobs due for an attempt, oldest first, and the seconds until the next later one is due.
+    def due_jobs(self) -> Tuple[List[str], Optional[float]]:
+        now = time.time()
+        due, next_due = [], None
+        for job_id in self.job_ids("pending"):
+            job = self._read(self._path("pending", job_id))
+            if job is None:
+                continue
+            if job.get("next_attempt_at", 0) <= now:
+                due.append((job.get("next_attempt_at", 0), job_id))
+            else:
+                wait = job["next_attempt_at"] - now
+                next_due = wait if next_due is None else min(next_due, wait)
+        return [job_id for _, job_id in sorted(due)], next_due
+
+    # Claims a pending job by renaming it into sending/; None if another sender claimed it first.
+    def claim(self, job_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            os.replace(self._path("pending", job_id), self._path("sending", job_id))
+        except FileNotFoundError:
+            return None
+        os.utime(self._path("sending", job_id))
+        return self._read(self._path("sending", job_id))
+
+    # Makes one delivery attempt for a claimed job and files it as sent, pending (retry) or dead letter.
+    def deliver(self, job: Dict[str, Any], mailer: Optional[Any] = None) -> str:
+        mailer = mailer or get_mailer()
+        remaining = [address for address in job["recipients"] if address not in job["delivered"] and address not in job["refused"]]
+        attempt_started = datetime.now().isoformat()
+        # The outbox copy is mailed under the report's own file name.
+        result = mailer.send_report(remaining, job["subject"], job["body"], job["attachment"],
+                                    attachment_name=job.get("attachment_name"))
+
+        job["attempts"] += 1
+        job["delivered"].extend(result.delivered)
+        for address, reason in result.refused.items():
+            if _is_permanent(reason):
+                job["refused"][address] = reason
+        job["history"].append({"at": attempt_started, "delivered": result.delivered, "refused": result.refused,
+                               "error": result.error})
+        remaining = [address for address in job["recipients"] if address not in job["delivered"] and address not in job["refused"]]
+
+        if not remaining and not job["refused"]:
+            job["sent_at"] = datetime.now().isoformat()
+            return self._file(job, "sent")
+        if not remaining:
+            job["last_error"] = f"Recipients refused permanently: {', '.join(f'{a} ({r})' for a, r in job['refused'].items())}"
+            return self._file(job, "dead_letter")
+        job["last_error"] = result.error or f"Recipients deferred: {', '.join(a for a in result.refused if a in remaining)}"
+        if job["attempts"] >= self.max_attempts:
+            return self._file(job, "dead_letter")
+        delay = min(self.backoff_max_seconds, self.backoff_seconds * (2 ** (job["attempts"] - 1))) * random.uniform(0.8, 1.2)
+        job["next_attempt_at"] = time.time() + delay
+        print(f"Warning: Email '{job['subject']}' not delivered to {', '.join(remaining)} (attempt {job['attempts']}/"
+              f"{self.max_attempts}); retrying in {delay:.0f}s. Outbox job {job['id']}.")
+        return self._file(job, "pending")
+
+    def _file(self, job: Dict[str, Any], folder: str) -> str:
+        if folder == "dead_letter":
+            job["dead_lettered_at"] = datetime.now().isoformat()
+            print(f"Error: Email '{job['subject']}' moved to the dead-letter folder after {job['attempts']} attempt(s): "
+                  f"{job.get('last_error')}. Requeue with: python email_outbox.py retry {job['id']}")
+        self._write(folder, job)
+        try:
+            os.remove(self._path("sending", job["id"]))
+        except FileNotFoundError:
+            pass
+        if folder == "sent":
+            print(f"Email '{job['subject']}' delivered to {', '.join(job['delivered'])} (outbox job {job['id']}).")
+            try:
+                os.remove(job["attachment"])
+            except FileNotFoundError:
+                pass
+        return folder
+
+    # Delivers every due job once; returns how many jobs ended in each folder.
+    def drain(self, mailer: Optional[Any] = None) -> Dict[str, int]:
+        self.recover_stale()
+        outcome = {"sent": 0, "pending": 0, "dead_letter": 0}
+        due, _ = self.due_jobs()
+        for job_id in due:
+            job = self.claim(job_id)
+            if job is not None:
+                outcome[self.deliver(job, mailer)] += 1
+        return outcome
+
+    def retry_dead_letter(self, job_id: str) -> bool:
+        job = self._read(self._path("dead_letter", job_id))
+        if job is None:
+            return False
+        job.update({"attempts": 0, "next_attempt_at": time.time(), "refused": {}})
+        job.pop("dead_lettered_at", None)
+        self._write("pending", job)
+        os.remove(self._path("dead_letter", job_id))
+        return True
+
+    def counts(self) -> Dict[str, int]:
+        return {folder: len(self.job_ids(folder)) for folder in FOLDERS if folder != "attachments"}
+
+
+# --- Background Sender ---
+# Drains the outbox on a daemon thread. wake() starts a pass immediately (e.g. after enqueue());
+# otherwise the outbox is checked every `poll_seconds` or when the next retry is due.
+class OutboxSender:
+    def __init__(self, outbox: EmailOutbox, mailer: Optional[Any] = None, poll_seconds: float = DEFAULT_POLL_SECONDS):
+        self.outbox = outbox
+        self.mailer = mailer
+        self.poll_seconds = poll_seconds
+        self._wake = threading.Event()
+        self._idle = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="email-outbox", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            self._wake.clear()
+            self._idle.clear()
+            next_due = None
+            try:
+                self.outbox.drain(self.mailer)
+                _, next_due = self.outbox.due_jobs()
+            except Exception as e:
+                print(f"Warning: Email outbox pass failed: {type(e).__name__}: {e}")
+            self._idle.set()
+            self._wake.wait(self.poll_seconds if next_due is None else min(self.poll_seconds, max(next_due, 0.1)))
+
+    def wake(self) -> None:
+        self._idle.clear()
+        self._wake.set()
+
+    # Waits up to `timeout` seconds until no job is due; returns the outbox counts afterwards.
+    # Jobs waiting for a later retry stay queued on disk.
+    def flush(self, timeout: float = DEFAULT_FLUSH_SECONDS) -> Dict[str, int]:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            self.wake()
+            if not self._idle.wait(max(deadline - time.monotonic(), 0)):
+                break
+            due, _ = self.outbox.due_jobs()
+            if not due and not self.outbox.job_ids("sending"):
+                break
+        return self.outbox.counts()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._wake.set()
+        self._thread.join(timeout=self.poll_seconds)
+
+
+# --- Process-wide Instance ---
+_shared_sender: Optional[OutboxSender] = None
+_shared_sender_lock = threading.Lock()
+
+
+# The process-wide sender, started on first use; None when OUTBOX_ENABLED is false.
+def get_outbox_sender() -> Optional[OutboxSender]:
+    global _shared_sender
+    if _shared_sender is None:
+        with _shared_sender_lock:
+            if _shared_sender is None:
+                outbox = EmailOutbox.from_env()
+                if outbox is None:
+                    return None
+                _shared_sender = OutboxSender(outbox)
+    return _shared_sender
+
+
+# Waits (up to `timeout`, default OUTBOX_FLUSH_SECONDS) for due emails of a finishing process and
+# reports what is left. Queued jobs are already on disk, so a timeout of 0 returns immediately.
+def flush_outbox(timeout: Optional[float] = None) -> Optional[Dict[str, int]]:
+    if _shared_sender is None:
+        return None
+    counts = _shared_sender.flush(float(os.getenv("OUTBOX_FLUSH_SECONDS", DEFAULT_FLUSH_SECONDS)) if timeout is None else timeout)
+    waiting = counts["pending"] + counts["sending"]
+    if waiting:
+        print(f"{waiting} email(s) still queued in '{_shared_sender.outbox.directory}' for a later retry; "
+              f"they are sent by the next run or by: python email_outbox.py drain --wait")
+    if counts["dead_letter"]:
+        print(f"Warning: {counts['dead_letter']} email(s) in the dead-letter folder "
+              f"'{os.path.join(_shared_sender.outbox.directory, 'dead_letter')}'.")
+    return counts
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Inspect and deliver the durable report email outbox.")
+    parser.add_argument("--dir", default=None, help=f"Outbox directory (default OUTBOX_DIR or {DEFAULT_OUTBOX_DIR})")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("status", help="Show job counts and dead-letter jobs")
+    drain_parser = subparsers.add_parser("drain", help="Deliver due jobs")
+    drain_parser.add_argument("--wait", action="store_true", help="Keep going until no job is pending (waits for retries)")
+    retry_parser = subparsers.add_parser("retry", help="Requeue a dead-letter job")
+    retry_parser.add_argument("job_id")
+    args = parser.parse_args(argv)
+
+    outbox = EmailOutbox.from_env() or EmailOutbox()
+    if args.dir:
+        outbox = EmailOutbox(args.dir, outbox.max_attempts, outbox.backoff_seconds, outbox.backoff_max_seconds)
+
+    if args.command == "status":
+        print(json.dumps(outbox.counts()))
+        for job_id in outbox.job_ids("dead_letter"):
+            _, job = outbox.find(job_id)
+            if job is not None:
+                print(f"dead_letter {job_id}: '{job['subject']}' to {', '.join(job['recipients'])} - {job.get('last_error')}")
+        return 0
+    if args.command == "retry":
+        if not outbox.retry_dead_letter(args.job_id):
+            print(f"Error: No dead-letter job '{args.job_id}'.")
+            return 1
+        print(f"Job {args.job_id} moved back to pending.")
+        return 0
+
+    while True:
+        outcome = outbox.drain()
+        print(json.dumps(outcome))
+        due, next_due = outbox.due_jobs()
+        if due:
+            continue
+        if not args.wait or next_due is None:
+            break
+        time.sleep(next_due)
+    get_mailer().close()
+    return 0 if not outbox.job_ids("dead_letter") else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,162 +1,185 @@
-# ks.py - Script to test email sending functionality
+# email_test.py - Script to test email sending functionality
 
+# Sends a test email through the same pooled delivery component the analysis uses (email_delivery.py).
+#   python email_test.py            - prompts for recipients and sends README.md via the SMTP server in .env
+#   python email_test.py --local    - runs a batch against a local stand-in SMTP server (no network or
+#                                     credentials needed) and checks session reuse and reconnects
+
+import argparse
+import base64
 import os
-import smtplib
-import socket
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-from email.mime.base import MIMEBase
-from email import encoders
-import traceback
+import socketserver
+import sys
+import threading
+import time
+from typing import Dict, Any, List, Optional, Set
+
 from dotenv import load_dotenv
 
+from email_delivery import ReportMailer, SMTPSessionPool, SMTPSettings, get_mailer, recipient_list
+
 # Load environment variables from .env file
 load_dotenv()
 
-# --- Copied send_email_with_attachment function from advance_agent.py --- 
-def send_email_with_attachment(recipient_email, subject, body, file_path):
-    """Sends an email with the specified file attached."""
-    # Use EMAIL_ADDRESS and EMAIL_PASSWORD as specified for .env
-    sender_email = os.getenv("EMAIL_ADDRESS") 
-    sender_password = os.getenv("EMAIL_PASSWORD")
-    smtp_server = os.getenv("SMTP_SERVER")
-    smtp_port = os.getenv("SMTP_PORT")
-
-    # --- Add Debug Print --- 
-    print(f"DEBUG: Read SMTP_PORT from environment: '{smtp_port}'") 
-    # -----------------------
-
-    # --- Input Validation ---
-    if not all([sender_email, sender_password, smtp_server, smtp_port]):
-        print("Error: Email credentials or SMTP server details not found in .env file.")
-        print("Please ensure EMAIL_ADDRESS, EMAIL_PASSWORD, SMTP_SERVER, and SMTP_PORT are set.")
-        return False
-    if not recipient_email or '@' not in recipient_email:
-        print(f"Error: Invalid recipient email address provided: {recipient_email}")
-        return False
-    if not os.path.exists(file_path):
-        print(f"Error: Attachment file not found at: {file_path}")
-        return False
-
-    try:
-        smtp_port = int(smtp_port)
-    except ValueError:
-        # Use the exact value read for the error message
-        print(f"Error: Invalid SMTP_PORT defined in .env file: {os.getenv('SMTP_PORT')}. Must be a number.") 
-        return False
-
-    # --- Create the email message ---
-    message = MIMEMultipart()
-    message['From'] = sender_email
-    message['To'] = recipient_email
-    message['Subject'] = subject
-    message.attach(MIMEText(body, 'plain'))
-
-    # --- Attach the file ---
-    try:
-        with open(file_path, "rb") as attachment:
-            part = MIMEBase("application", "octet-stream")
-            part.set_payload(attachment.read())
-        encoders.encode_base64(part)
-        filename = os.path.basename(file_path)
-        part.add_header("Content-Disposition", f"attachment; filename= {filename}")
-        message.attach(part)
-    except IOError as e:
-        print(f"Error reading attachment file '{file_path}': {e}")
-        return False
-    except Exception as e:
-        print(f"An unexpected error occurred while processing the attachment: {e}")
-        return False
-
-    # --- Connect to SMTP server and send ---
-    server = None
-    try:
-        # Use the exact value read for the error message if connection fails
-        server_name_read = os.getenv("SMTP_SERVER") 
-        # --- Add Debug Print for Server --- 
-        print(f"DEBUG: Read SMTP_SERVER from environment: '{server_name_read}'")
-        # -----------------------------------
-        print(f"Connecting to SMTP server {server_name_read}:{smtp_port}...")
-        if smtp_port == 465:
-             print("Using SMTP_SSL.")
-             server = smtplib.SMTP_SSL(server_name_read, smtp_port, timeout=20) # Use SSL for port 465
-        else:
-             print("Using SMTP with STARTTLS.")
-             server = smtplib.SMTP(server_name_read, smtp_port, timeout=20) # Use standard SMTP for others (like 587)
-             server.ehlo() # Greet server before TLS
-             server.starttls() # Encrypt connection
-             server.ehlo() # Re-greet server over TLS
-
-        print("Logging in...")
-        server.login(sender_email, sender_password)
-        print("Sending email...")
-        text = message.as_string()
-        server.sendmail(sender_email, recipient_email, text)
-        print(f"Email sent successfully to {recipient_email}!")
-        return True
-    except smtplib.SMTPAuthenticationError:
-        print("Error: SMTP Authentication failed. Check EMAIL_ADDRESS and EMAIL_PASSWORD/app password in .env file.")
-        print("       (If using Gmail with 2FA, ensure you are using an App Password).")
-        return False
-    except (smtplib.SMTPConnectError, socket.gaierror, socket.timeout, smtplib.SMTPServerDisconnected) as e:
-        # Use the exact value read for the error message
-        server_name_read = os.getenv("SMTP_SERVER") 
-        port_read = os.getenv("SMTP_PORT")
-        print(f"Error: Could not connect to or communicate with SMTP server {server_name_read}:{port_read}. Check server/port details, network connection, and firewall.")
-        print(f"       Specific error: {e}")
-        return False
-    except smtplib.SMTPException as e:
-        print(f"An SMTP error occurred: {e}")
-        return False
-    except Exception as e:
-        print(f"An unexpected error occurred during email sending: {e}")
-        traceback.print_exc()
-        return False
-    finally:
-        if server:
-            try:
-                print("Closing SMTP connection.")
-                server.quit()
-            except smtplib.SMTPException:
-                pass # Ignore errors during quit
-# --- End of copied function ---
+
+# --- Local Stand-in SMTP Server ---
+# Minimal plain-text SMTP server (EHLO, AUTH PLAIN/LOGIN, MAIL, RCPT, DATA, RSET, NOOP, QUIT) that
+# records every message. `drop_after` closes a connection after that many messages, like a server
+# ending a long-lived session; `handshake_delay` adds latency to each new connection; addresses in
+# `refuse` are rejected at RCPT.
+class LocalSMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, drop_after: Optional[int] = None,
+                 handshake_delay: float = 0.0, refuse: Optional[Set[str]] = None):
+        super().__init__((host, port), _SMTPHandler)
+        self.drop_after = drop_after
+        self.handshake_delay = handshake_delay
+        self.refuse = set(refuse or ())
+        self.messages: List[Dict[str, Any]] = []
+        self.connections = 0
+        self.logins = 0
+        self._lock = threading.Lock()
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def settings(self) -> SMTPSettings:
+        return SMTPSettings("sender@example.invalid", "local-password", "127.0.0.1", self.port, security="none", timeout=5)
+
+    def __enter__(self) -> "LocalSMTPServer":
+        threading.Thread(target=self.serve_forever, name="local-smtp", daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    disable_nagle_algorithm = True
+
+    def reply(self, line: str) -> None:
+        self.wfile.write(line.encode("ascii") + b"\r\n")
+
+    def handle(self) -> None:
+        server = self.server
+        with server._lock:
+            server.connections += 1
+        time.sleep(server.handshake_delay)
+        self.reply("220 localhost stand-in SMTP")
+        sent = 0
+        mail_from, rcpt_tos = None, []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command, _, argument = line.decode("utf-8", "replace").strip().partition(" ")
+            command = command.upper()
+            if command in ("EHLO", "HELO"):
+                self.reply("250-localhost")
+                self.reply("250 AUTH PLAIN LOGIN")
+            elif command == "AUTH":
+                if argument.upper().startswith("LOGIN"):
+                    for prompt in ("VXNlcm5hbWU6", "UGFzc3dvcmQ6"):
+                        self.reply(f"334 {prompt}")
+                        self.rfile.readline()
+                elif " " not in argument:
+                    self.reply("334 ")
+                    base64.b64decode(self.rfile.readline().strip())
+                with server._lock:
+                    server.logins += 1
+                self.reply("235 Authentication successful")
+            elif command == "MAIL":
+                mail_from, rcpt_tos = argument.split(":", 1)[1].strip().strip("<>"), []
+                self.reply("250 OK")
+            elif command == "RCPT":
+                address = argument.split(":", 1)[1].strip().strip("<>")
+                if address in server.refuse:
+                    self.reply("550 Mailbox unavailable")
+                else:
+                    rcpt_tos.append(address)
+                    self.reply("250 OK")
+            elif command == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                size = 0
+                for data_line in iter(self.rfile.readline, b""):
+                    if data_line in (b".\r\n", b".\n"):
+                        break
+                    size += len(data_line)
+                with server._lock:
+                    server.messages.append({"from": mail_from, "to": rcpt_tos, "bytes": size})
+                self.reply("250 OK queued")
+                sent += 1
+                if server.drop_after is not None and sent >= server.drop_after:
+                    return
+            elif command in ("RSET", "NOOP"):
+                self.reply("250 OK")
+            elif command == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+# --- Local Self-check ---
+# Mails three reports to two recipients through one pooled session; the server drops the session
+# after two messages, so the third is sent after a transparent reconnect.
+def run_local_check(attachment_path: str) -> bool:
+    with LocalSMTPServer(drop_after=2) as server:
+        mailer = ReportMailer(pool=SMTPSessionPool(server.settings(), max_sessions=1))
+        recipients = ["first@example.invalid", "second@example.invalid"]
+        results = mailer.send_reports([
+            {"recipients": recipients, "subject": f"Local test {n}", "body": "Stand-in delivery test.", "file_path": attachment_path}
+            for n in range(1, 4)
+        ])
+        mailer.close()
+        stats = mailer.stats()
+        print(f"Messages received: {len(server.messages)}, connections: {server.connections}, logins: {server.logins}")
+        print(f"Mailer stats: {stats}")
+        ok = (all(result.ok for result in results) and len(server.messages) == 3
+              and all(message["to"] == recipients for message in server.messages)
+              and server.logins == 2 and stats["reconnects"] == 1)
+    print("Local delivery check passed." if ok else "Local delivery check FAILED.")
+    return ok
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Send a test email with README.md attached.")
+    parser.add_argument("--local", action="store_true", help="Test against a local stand-in SMTP server instead of .env settings")
+    args = parser.parse_args()
     print("--- Email Sending Test --- ")
 
     # 1. Define Test Parameters
     test_subject = "CrewAI Email Test"
-    test_body = "This is a test email sent from the ks.py script to verify SMTP settings."
+    test_body = "This is a test email sent from the email_test.py script to verify SMTP settings."
     # Use an existing file as a dummy attachment
-    dummy_attachment_path = "README.md" 
+    dummy_attachment_path = "README.md"
 
     # 2. Check if dummy attachment exists
     if not os.path.exists(dummy_attachment_path):
         print(f"Error: Dummy attachment file '{dummy_attachment_path}' not found in the current directory.")
-        print("Please create a dummy file or change the path in ks.py.")
-    else:
-        # 3. Prompt for Recipient Email
-        recipient = input(f"Enter the recipient email address to send a test email (with {dummy_attachment_path} attached): ").strip()
-
-        # 4. Validate and Send
-        if recipient and '@' in recipient:
-            print(f"\nAttempting to send test email to {recipient}...")
-            
-            success = send_email_with_attachment(
-                recipient_email=recipient,
-                subject=test_subject,
-                body=test_body,
-                file_path=dummy_attachment_path
-            )
-
-            if success:
-                print("\nTest email sent successfully!")
-            else:
-                print("\nTest email failed to send. Please check the errors above and your .env settings.")
-        elif recipient:
-            print(f"Invalid email address format entered ('{recipient}'). Aborting test.")
+        print("Please create a dummy file or change the path in email_test.py.")
+        sys.exit(1)
+    if args.local:
+        sys.exit(0 if run_local_check(dummy_attachment_path) else 1)
+
+    # 3. Prompt for Recipient Emails
+    recipients = recipient_list(input(f"Enter recipient email address(es), comma-separated, to send a test email (with {dummy_attachment_path} attached): "))
+
+    # 4. Validate and Send (one message to all recipients over a pooled session)
+    if recipients and all('@' in address for address in recipients):
+        print(f"\nAttempting to send test email to {', '.join(recipients)}...")
+        result = get_mailer().send_report(recipients, test_subject, test_body, dummy_attachment_path)
+        if result.ok:
+            print("\nTest email sent successfully!")
         else:
-            print("No recipient email entered. Aborting test.")
+            print("\nTest email failed to send. Please check the errors above and your .env settings.")
+    elif recipients:
+        print(f"Invalid email address format entered ('{', '.join(recipients)}'). Aborting test.")
+    else:
+        print("No recipient email entered. Aborting test.")
 
     print("--- Test Script Finished ---")
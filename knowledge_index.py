@@ -0,0 +1,161 @@
+# knowledge_index.py
+
+# --- Knowledge Base Retrieval Index ---
+# Precomputed index over a knowledge snapshot, built once per (re)load instead of per query:
+# - an exact-match table of normalized topic keys,
+# - an Aho-Corasick automaton over normalized topic and category keys, so all keys contained in a
+#   query are found in a single pass over the query text,
+# - an inverted index with BM25 ranking over the topic titles and content bodies, used when the
+#   query does not name a topic directly.
+
+import math
+import re
+from collections import Counter, deque
+from dataclasses import dataclass
+from typing import Dict, List, Mapping, Optional, Set, Tuple
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+STOPWORDS = frozenset(
+    "a an and are as at be by for from how in into is it of on or the their this to what with".split()
+)
+
+
+def normalize_key(key: str) -> str:
+    return key.replace("_", " ").lower().strip()
+
+
+# Folds simple plurals so "objections" matches "objection".
+def _stem(token: str) -> str:
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    return [_stem(token) for token in re.findall(r"[a-z0-9]+", text.lower()) if token not in STOPWORDS]
+
+
+@dataclass(frozen=True)
+class KnowledgeEntry:
+    category: str
+    topic: str
+    content: str
+
+    @property
+    def title(self) -> str:
+        return normalize_key(self.topic).title()
+
+
+# --- Aho-Corasick Automaton ---
+# Multi-pattern substring matcher; match() returns every pattern occurring in the text.
+class AhoCorasick:
+    def __init__(self, patterns: List[str]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[str]] = [[]]
+        for pattern in patterns:
+            if pattern:
+                self._add(pattern)
+        self._build_failure_links()
+
+    def _add(self, pattern: str) -> None:
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = next_state
+        self._output[state].append(pattern)
+
+    def _build_failure_links(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def match(self, text: str) -> Set[str]:
+        found: Set[str] = set()
+        state = 0
+        for char in text:
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            if self._output[state]:
+                found.update(self._output[state])
+        return found
+
+
+class KnowledgeIndex:
+    def __init__(self, knowledge: Mapping[str, Mapping[str, str]]):
+        self.entries: List[KnowledgeEntry] = []
+        self.categories: Dict[str, Tuple[str, List[str]]] = {}
+        self._topics: Dict[str, int] = {}
+        for category, topics in knowledge.items():
+            if not isinstance(topics, Mapping):
+                continue
+            self.categories[normalize_key(category)] = (category, list(topics.keys()))
+            for topic, content in topics.items():
+                self._topics.setdefault(normalize_key(topic), len(self.entries))
+                self.entries.append(KnowledgeEntry(category, topic, str(content)))
+        self._automaton = AhoCorasick(list(self._topics) + list(self.categories))
+        self._build_inverted_index()
+
+    def _build_inverted_index(self) -> None:
+        self._postings: Dict[str, List[Tuple[int, int]]] = {}
+        self._doc_lengths: List[int] = []
+        for doc_id, entry in enumerate(self.entries):
+            terms = Counter(tokenize(f"{normalize_key(entry.topic)} {entry.content}"))
+            self._doc_lengths.append(sum(terms.values()))
+            for term, frequency in terms.items():
+                self._postings.setdefault(term, []).append((doc_id, frequency))
+        count = len(self.entries)
+        self._avg_doc_length = (sum(self._doc_lengths) / count) if count else 0.0
+        self._idf = {
+            term: math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in self._postings.items()
+        }
+
+    # Exact topic match on the normalized query.
+    def exact_topic(self, query: str) -> Optional[KnowledgeEntry]:
+        doc_id = self._topics.get(normalize_key(query))
+        return self.entries[doc_id] if doc_id is not None else None
+
+    # Longest topic key contained in the query, if any.
+    def contained_topic(self, query: str) -> Optional[KnowledgeEntry]:
+        matches = [key for key in self._automaton.match(normalize_key(query)) if key in self._topics]
+        if not matches:
+            return None
+        return self.entries[self._topics[max(matches, key=len)]]
+
+    # Longest category key contained in the query, with its original name and topic list.
+    def contained_category(self, query: str) -> Optional[Tuple[str, List[str]]]:
+        matches = [key for key in self._automaton.match(normalize_key(query)) if key in self.categories]
+        if not matches:
+            return None
+        return self.categories[max(matches, key=len)]
+
+    # BM25-ranked entries for the query, highest score first.
+    def search(self, query: str, top_k: int = 3) -> List[Tuple[float, KnowledgeEntry]]:
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            idf = self._idf.get(term)
+            if idf is None:
+                continue
+            for doc_id, frequency in self._postings[term]:
+                length_norm = 1 - BM25_B + BM25_B * self._doc_lengths[doc_id] / self._avg_doc_length
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * frequency * (BM25_K1 + 1) / (frequency + BM25_K1 * length_norm)
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:top_k]
+        return [(score, self.entries[doc_id]) for doc_id, score in ranked]
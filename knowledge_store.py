@@ -0,0 +1,132 @@
+# knowledge_store.py
+
+# --- Shared Knowledge Store ---
+# Loads knowledge_base.json once per process and shares a single read-only snapshot (and the
+# retrieval index built from it) with every KnowledgeBaseTool instance. The file is re-checked
+# at most once per reload interval; when its mtime/size changes and its content hash differs,
+# a new snapshot is parsed and swapped in atomically. A file that fails to parse leaves the
+# previous snapshot in place.
+#
+# Configuration (.env):
+#   KNOWLEDGE_BASE_RELOAD_INTERVAL - seconds between file change checks (default 2, 0 checks on every access)
+
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+from knowledge_index import KnowledgeIndex
+
+DEFAULT_RELOAD_INTERVAL = 2.0
+
+
+# Recursively wraps dicts in read-only mapping proxies so a snapshot cannot be mutated by callers.
+def _freeze(value: Any) -> Any:
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+# A loaded version of the knowledge base together with its retrieval index.
+@dataclass(frozen=True)
+class KnowledgeSnapshot:
+    data: Mapping[str, Mapping[str, str]]
+    index: KnowledgeIndex
+    digest: str = ""
+    version: int = 0
+    loaded_at: float = 0.0
+
+
+EMPTY_SNAPSHOT = KnowledgeSnapshot(data=MappingProxyType({}), index=KnowledgeIndex({}))
+
+
+class KnowledgeStore:
+    def __init__(self, path: str, reload_interval: float = DEFAULT_RELOAD_INTERVAL):
+        self.path = path
+        self.reload_interval = reload_interval
+        self._snapshot = EMPTY_SNAPSHOT
+        self._file_signature: Optional[Tuple[int, int]] = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+        self.reload_count = 0
+        self._refresh(force=True)
+
+    # Returns the current snapshot, reloading first if the file changed since the last check.
+    def snapshot(self) -> KnowledgeSnapshot:
+        if time.monotonic() >= self._next_check:
+            self._refresh()
+        return self._snapshot
+
+    @property
+    def data(self) -> Mapping[str, Mapping[str, str]]:
+        return self.snapshot().data
+
+    def _refresh(self, force: bool = False) -> None:
+        with self._lock:
+            now = time.monotonic()
+            if not force and now < self._next_check:
+                return
+            self._next_check = now + self.reload_interval
+            try:
+                stat = os.stat(self.path)
+            except FileNotFoundError:
+                if force or self._file_signature is not None:
+                    print(f"Error: Knowledge base file '{self.path}' not found. Initializing with empty knowledge.")
+                self._file_signature = None
+                return
+            signature = (stat.st_mtime_ns, stat.st_size)
+            if not force and signature == self._file_signature:
+                return
+            self._file_signature = signature
+            self._load()
+
+    # Parses the file and swaps the snapshot if its content hash changed. Called with the lock held.
+    def _load(self) -> None:
+        try:
+            with open(self.path, 'rb') as f:
+                raw = f.read()
+            digest = hashlib.sha256(raw).hexdigest()
+            if digest == self._snapshot.digest:
+                return
+            data: Dict[str, Dict[str, str]] = json.loads(raw.decode('utf-8'))
+            if not isinstance(data, dict):
+                raise ValueError("top-level JSON value must be an object")
+        except json.JSONDecodeError as e:
+            print(f"Error: Failed to decode JSON from '{self.path}': {e}. Keeping previously loaded knowledge.")
+            return
+        except Exception as e:
+            print(f"An unexpected error occurred loading knowledge base from '{self.path}': {e}")
+            return
+        frozen = _freeze(data)
+        self._snapshot = KnowledgeSnapshot(
+            data=frozen, index=KnowledgeIndex(frozen), digest=digest,
+            version=self._snapshot.version + 1, loaded_at=time.time()
+        )
+        self.reload_count += 1
+        action = "loaded" if self._snapshot.version == 1 else "reloaded"
+        print(f"Knowledge base {action} from {self.path} ({len(data)} categories, version {self._snapshot.version}).")
+
+
+# --- Process-wide Registry ---
+# One store per knowledge file path, shared by all tool instances in the process.
+_stores: Dict[str, KnowledgeStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_knowledge_store(path: str) -> KnowledgeStore:
+    key = os.path.abspath(path)
+    store = _stores.get(key)
+    if store is None:
+        with _stores_lock:
+            store = _stores.get(key)
+            if store is None:
+                interval = float(os.getenv("KNOWLEDGE_BASE_RELOAD_INTERVAL", DEFAULT_RELOAD_INTERVAL))
+                store = KnowledgeStore(path, reload_interval=interval)
+                _stores[key] = store
+    return store
@@ -0,0 +1,294 @@
+# llm_cache.py
+
+# --- LLM Response Cache ---
+# Opt-in, SQLite-backed cache of LLM completions shared by every agent. A completion is keyed on the
+# model name, the fully rendered messages (task description, context, tool observations) and the
+# sampling parameters, so rerunning a report for the same company/industry replays identical
+# completions instead of paying for them again. Hits and misses are also counted per task.
+#
+# Modes:
+#   off        - no caching; agents use crewai's default LLM (default)
+#   read_write - serve hits from the cache, call the model and store the result on a miss
+#   refresh    - always call the model and overwrite the cached result
+#   cache_only - serve hits from the cache and raise LLMCacheMissError on a miss (no model calls)
+#
+# Configuration (.env):
+#   LLM_CACHE_MODE         - one of the modes above (default off)
+#   LLM_CACHE_MATCH        - "exact" keys on the messages verbatim; "normalized" collapses whitespace
+#                            in message contents first (default exact)
+#   LLM_CACHE_PATH         - SQLite file location (default llm_cache.sqlite3)
+#   LLM_CACHE_TTL_HOURS    - lifetime of an entry in hours, 0 keeps entries forever (default 168)
+#   LLM_CACHE_MAX_ENTRIES  - entries kept before LRU eviction (default 2000)
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Union
+
+from run_context import current_task
+
+DEFAULT_CACHE_PATH = "llm_cache.sqlite3"
+DEFAULT_TTL_HOURS = 168.0
+DEFAULT_MAX_ENTRIES = 2000
+CACHE_MODES = ("off", "read_write", "refresh", "cache_only")
+MATCH_MODES = ("exact", "normalized")
+
+# LLM attributes that change the completion and therefore belong in the cache key.
+SAMPLING_PARAMS = (
+    "temperature", "top_p", "n", "stop", "max_tokens", "max_completion_tokens", "presence_penalty",
+    "frequency_penalty", "logit_bias", "seed", "logprobs", "top_logprobs", "reasoning_effort",
+)
+
+
+class LLMCacheMissError(RuntimeError):
+    """Raised in cache_only mode when a prompt has no cached completion."""
+
+
+def _normalize_messages(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    normalized = []
+    for message in messages:
+        message = dict(message)
+        if isinstance(message.get("content"), str):
+            message["content"] = re.sub(r"\s+", " ", message["content"]).strip()
+        normalized.append(message)
+    return normalized
+
+
+class LLMResponseCache:
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, mode: str = "read_write", match: str = "exact",
+                 ttl_seconds: float = DEFAULT_TTL_HOURS * 3600, max_entries: int = DEFAULT_MAX_ENTRIES):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Unknown LLM cache mode '{mode}'; expected one of {', '.join(CACHE_MODES)}.")
+        if match not in MATCH_MODES:
+            raise ValueError(f"Unknown LLM cache match mode '{match}'; expected one of {', '.join(MATCH_MODES)}.")
+        self.path = path
+        self.mode = mode
+        self.match = match
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+        self._task_stats: Dict[str, Dict[str, int]] = {}
+        if self.enabled:
+            self._connection().execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                " key TEXT PRIMARY KEY, model TEXT NOT NULL, response TEXT NOT NULL,"
+                " created_at REAL NOT NULL, last_accessed REAL NOT NULL)"
+            )
+            self._connection().execute(
+                "CREATE INDEX IF NOT EXISTS idx_llm_cache_last_accessed ON llm_cache (last_accessed)"
+            )
+
+    @classmethod
+    def from_env(cls) -> "LLMResponseCache":
+        return cls(
+            path=os.getenv("LLM_CACHE_PATH", DEFAULT_CACHE_PATH),
+            mode=os.getenv("LLM_CACHE_MODE", "off").strip().lower() or "off",
+            match=os.getenv("LLM_CACHE_MATCH", "exact").strip().lower() or "exact",
+            ttl_seconds=float(os.getenv("LLM_CACHE_TTL_HOURS", DEFAULT_TTL_HOURS)) * 3600,
+            max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off"
+
+    # One connection per thread; WAL mode lets concurrent tasks and batch workers share the file.
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def cache_key(self, model: str, messages: List[Dict[str, Any]], params: Dict[str, Any]) -> str:
+        if self.match == "normalized":
+            messages = _normalize_messages(messages)
+        payload = json.dumps({"model": model, "messages": messages, "params": params},
+                             sort_keys=True, default=str, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _record(self, outcome: str) -> None:
+        task = current_task() or "(outside task)"
+        with self._lock:
+            self._stats[outcome] += 1
+            counters = self._task_stats.setdefault(task, {"hits": 0, "misses": 0})
+            counters[outcome] += 1
+
+    # Returns the cached completion, or None on a miss. Refresh mode always misses.
+    def get(self, key: str) -> Optional[str]:
+        if not self.enabled or self.mode == "refresh":
+            if self.mode == "refresh":
+                self._record("misses")
+            return None
+        now = time.time()
+        try:
+            connection = self._connection()
+            row = connection.execute("SELECT response, created_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is not None and self.ttl_seconds > 0 and now - row[1] > self.ttl_seconds:
+                connection.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                row = None
+            if row is None:
+                self._record("misses")
+                return None
+            connection.execute("UPDATE llm_cache SET last_accessed = ? WHERE key = ?", (now, key))
+            self._record("hits")
+            return row[0]
+        except sqlite3.Error as e:
+            print(f"Warning: LLM cache read failed: {e}")
+            self._record("misses")
+            return None
+
+    def put(self, key: str, model: str, response: str) -> None:
+        if not self.enabled or self.mode == "cache_only":
+            return
+        now = time.time()
+        try:
+            connection = self._connection()
+            connection.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, model, response, created_at, last_accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, model, response, now, now),
+            )
+            with self._lock:
+                self._stats["writes"] += 1
+            self._evict(connection)
+        except sqlite3.Error as e:
+            print(f"Warning: LLM cache write failed: {e}")
+
+    # Drops expired entries, then the least recently used ones beyond max_entries.
+    def _evict(self, connection: sqlite3.Connection) -> None:
+        removed = 0
+        if self.ttl_seconds > 0:
+            removed += connection.execute(
+                "DELETE FROM llm_cache WHERE created_at < ?", (time.time() - self.ttl_seconds,)
+            ).rowcount
+        (count,) = connection.execute("SELECT COUNT(*) FROM llm_cache").fetchone()
+        overflow = count - self.max_entries
+        if overflow > 0:
+            removed += connection.execute(
+                "DELETE FROM llm_cache WHERE key IN "
+                "(SELECT key FROM llm_cache ORDER BY last_accessed ASC LIMIT ?)", (overflow,)
+            ).rowcount
+        if removed:
+            with self._lock:
+                self._stats["evictions"] += removed
+
+    def clear(self) -> None:
+        if self.enabled:
+            self._connection().execute("DELETE FROM llm_cache")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._stats)
+            by_task = {task: dict(counters) for task, counters in self._task_stats.items()}
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+        for counters in by_task.values():
+            task_lookups = counters["hits"] + counters["misses"]
+            counters["hit_rate"] = round(counters["hits"] / task_lookups, 3) if task_lookups else 0.0
+        stats["mode"] = self.mode
+        stats["by_task"] = by_task
+        return stats
+
+
+# --- Process-wide Instance ---
+_shared_cache: Optional[LLMResponseCache] = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> LLMResponseCache:
+    global _shared_cache
+    if _shared_cache is None:
+        with _shared_cache_lock:
+            if _shared_cache is None:
+                _shared_cache = LLMResponseCache.from_env()
+    return _shared_cache
+
+
+# --- Cached LLM ---
+# Defined lazily so this module can be imported (and its cache inspected) without crewai/litellm.
+_cached_llm_class = None
+
+
+def _cached_llm_type() -> type:
+    global _cached_llm_class
+    if _cached_llm_class is not None:
+        return _cached_llm_class
+
+    from crewai.llm import LLM
+    from crewai.utilities.events import crewai_event_bus
+    from crewai.utilities.events.llm_events import LLMCallStartedEvent, LLMCallType
+
+    class CachedLLM(LLM):
+        """crewai LLM whose plain-text completions are served from an LLMResponseCache."""
+
+        response_cache: LLMResponseCache
+
+        def _cache_params(self) -> Dict[str, Any]:
+            params = {name: getattr(self, name, None) for name in SAMPLING_PARAMS}
+            response_format = getattr(self, "response_format", None)
+            params["response_format"] = getattr(response_format, "__name__", response_format)
+            params.update(self.additional_params or {})
+            return {k: v for k, v in params.items() if v not in (None, [], {})}
+
+        def call(self, messages: Union[str, List[Dict[str, str]]], tools: Optional[List[dict]] = None,
+                 callbacks: Optional[List[Any]] = None, available_functions: Optional[Dict[str, Any]] = None) -> Any:
+            # Native function calls execute tools as a side effect, so they always go to the model.
+            if available_functions:
+                return super().call(messages, tools, callbacks, available_functions)
+            if isinstance(messages, str):
+                messages = [{"role": "user", "content": messages}]
+            params = self._cache_params()
+            if tools:
+                params["tools"] = tools
+            key = self.response_cache.cache_key(self.model, messages, params)
+
+            cached = self.response_cache.get(key)
+            if cached is not None:
+                crewai_event_bus.emit(self, event=LLMCallStartedEvent(messages=messages, tools=tools,
+                                                                      callbacks=callbacks, available_functions=None))
+                self._handle_emit_call_events(cached, LLMCallType.LLM_CALL)
+                return cached
+            if self.response_cache.mode == "cache_only":
+                raise LLMCacheMissError(
+                    f"No cached completion for model '{self.model}' (task: {current_task() or 'unknown'}) "
+                    "and LLM_CACHE_MODE is cache_only."
+                )
+
+            response = super().call(messages, tools, callbacks, available_functions)
+            if isinstance(response, str) and response:
+                self.response_cache.put(key, self.model, response)
+            return response
+
+    _cached_llm_class = CachedLLM
+    return CachedLLM
+
+
+# Returns an LLM for an Agent's `llm=` argument. With the cache off this returns `llm` unchanged
+# (None lets crewai pick its default model); otherwise crewai's LLM for `llm` is wrapped so its
+# completions go through the shared cache.
+def cached_llm(llm: Any = None) -> Any:
+    cache = get_llm_cache()
+    if not cache.enabled:
+        return llm
+    from crewai.utilities.llm_utils import create_llm
+
+    base = create_llm(llm)
+    if base is None:
+        print("Warning: Could not create an LLM for the response cache; using the agent default.")
+        return llm
+    cached_class = _cached_llm_type()
+    wrapped = cached_class.__new__(cached_class)
+    wrapped.__dict__.update(base.__dict__)
+    wrapped.response_cache = cache
+    return wrapped
@@ -0,0 +1,308 @@
+# prior_reports.py
+
+# --- Prior Report Retrieval ---
+# Local search over the results of earlier analyses so agents can reuse past research before going
+# to the web. Sources are the runs in the results store (results.sqlite3, if present), report files
+# matching PRIOR_REPORTS_GLOB and legacy crew_results.json files; a report already recorded in the
+# results store is not indexed twice. Every task section is split into passages of about
+# PRIOR_REPORTS_CHUNK_WORDS words, and passages are embedded as L2-normalized TF-IDF vectors
+# (sublinear term frequency, smoothed IDF) stored per term as NumPy posting arrays, so a query only
+# touches the postings of its own terms.
+#
+# The index is built on first use and rebuilt when a source file or the results store changes
+# (checked at most every PRIOR_REPORTS_REFRESH_SECONDS). Hit-rate statistics count queries that
+# returned passages above PRIOR_REPORTS_MIN_SCORE, and estimate the web searches avoided: a hit
+# counts as avoided unless a similar query (token Jaccard >= 0.5) is later sent to web search.
+#
+# Configuration (.env):
+#   PRIOR_REPORTS_ENABLED         - set to false to index nothing (default true)
+#   PRIOR_REPORTS_GLOB            - report files to index (default *_report_*.txt)
+#   PRIOR_REPORTS_FILES           - comma-separated crew_results.json-style files (default crew_results.json)
+#   PRIOR_REPORTS_CHUNK_WORDS     - target passage length in words (default 120)
+#   PRIOR_REPORTS_MIN_SCORE       - minimum cosine similarity for a passage to count (default 0.12)
+#   PRIOR_REPORTS_REFRESH_SECONDS - seconds between source change checks (default 30)
+# The results store is read from RESULTS_STORE_PATH unless RESULTS_STORE_ENABLED is false (see results_store.py).
+
+import glob
+import math
+import os
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, Any, List, Optional, Set, Tuple
+
+import numpy as np
+
+from knowledge_index import tokenize
+from results_store import DEFAULT_STORE_PATH, ResultsStore, parse_crew_results, parse_text_report
+
+DEFAULT_REPORT_GLOB = "*_report_*.txt"
+DEFAULT_RESULT_FILES = "crew_results.json"
+DEFAULT_CHUNK_WORDS = 120
+DEFAULT_TOP_K = 3
+DEFAULT_MIN_SCORE = 0.12
+DEFAULT_REFRESH_SECONDS = 30.0
+SIMILAR_QUERY_JACCARD = 0.5
+
+
+def _env_flag(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+@dataclass(frozen=True)
+class Passage:
+    text: str
+    company: str
+    industry: str
+    date: str
+    section: str
+    source: str
+
+
+def _section_label(name: Optional[str], description: Optional[str]) -> str:
+    if name:
+        return name
+    return (description or "Untitled section").split(".")[0].strip()[:80]
+
+
+# Splits a task output into passages of roughly `chunk_words` words, breaking only between lines.
+def chunk_text(text: str, chunk_words: int) -> List[str]:
+    chunks: List[str] = []
+    current: List[str] = []
+    words = 0
+    for line in (text or "").splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        current.append(line)
+        words += len(line.split())
+        if words >= chunk_words:
+            chunks.append("\n".join(current))
+            current, words = [], 0
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+class PriorReportIndex:
+    def __init__(self, passages: List[Passage]):
+        self.passages = passages
+        documents = [Counter(tokenize(f"{p.company} {p.section} {p.text}")) for p in passages]
+        self.vocabulary: Dict[str, int] = {}
+        for counts in documents:
+            for term in counts:
+                self.vocabulary.setdefault(term, len(self.vocabulary))
+        document_frequency = np.zeros(len(self.vocabulary), dtype=np.float64)
+        for counts in documents:
+            for term in counts:
+                document_frequency[self.vocabulary[term]] += 1
+        self.idf = np.log((1 + len(passages)) / (1 + document_frequency)) + 1.0
+
+        # Per-document weights, normalized, then regrouped by term into posting arrays.
+        term_ids, doc_ids, weights = [], [], []
+        for doc_id, counts in enumerate(documents):
+            ids = np.fromiter((self.vocabulary[term] for term in counts), dtype=np.int64, count=len(counts))
+            tf = 1.0 + np.log(np.fromiter(counts.values(), dtype=np.float64, count=len(counts)))
+            vector = tf * self.idf[ids]
+            norm = np.linalg.norm(vector)
+            term_ids.append(ids)
+            doc_ids.append(np.full(len(ids), doc_id, dtype=np.int64))
+            weights.append(vector / norm if norm else vector)
+        term_ids_flat = np.concatenate(term_ids) if term_ids else np.zeros(0, dtype=np.int64)
+        order = np.argsort(term_ids_flat, kind="stable")
+        self._posting_docs = (np.concatenate(doc_ids) if doc_ids else np.zeros(0, dtype=np.int64))[order]
+        self._posting_weights = (np.concatenate(weights) if weights else np.zeros(0))[order].astype(np.float32)
+        self._posting_starts = np.searchsorted(term_ids_flat[order], np.arange(len(self.vocabulary) + 1))
+
+    # Returns (cosine similarity, passage) pairs above `min_score`, best first.
+    # Query terms missing from every passage (e.g. an unseen company name) keep their weight in the
+    # query norm, so a query about something no report covers does not match on its generic terms.
+    def search(self, query: str, top_k: int = DEFAULT_TOP_K, min_score: float = DEFAULT_MIN_SCORE) -> List[Tuple[float, Passage]]:
+        counts = Counter(tokenize(query))
+        known = [term for term in counts if term in self.vocabulary]
+        if not known or not self.passages:
+            return []
+        unseen_idf = math.log(1 + len(self.passages)) + 1.0
+        unseen_weights = [(1.0 + math.log(counts[term])) * unseen_idf for term in counts if term not in self.vocabulary]
+        ids = np.array([self.vocabulary[term] for term in known], dtype=np.int64)
+        query_weights = (1.0 + np.log(np.array([counts[term] for term in known], dtype=np.float64))) * self.idf[ids]
+        query_weights /= math.sqrt(float(np.dot(query_weights, query_weights)) + sum(w * w for w in unseen_weights))
+
+        scores = np.zeros(len(self.passages), dtype=np.float32)
+        for term_id, weight in zip(ids, query_weights):
+            start, end = self._posting_starts[term_id], self._posting_starts[term_id + 1]
+            scores[self._posting_docs[start:end]] += weight * self._posting_weights[start:end]
+        candidates = np.flatnonzero(scores >= min_score)
+        if not len(candidates):
+            return []
+        best = candidates[np.argsort(-scores[candidates], kind="stable")[:top_k]]
+        return [(float(scores[i]), self.passages[i]) for i in best]
+
+
+class PriorReportLibrary:
+    def __init__(self, report_glob: str = DEFAULT_REPORT_GLOB, result_files: Optional[List[str]] = None,
+                 store_path: Optional[str] = DEFAULT_STORE_PATH, chunk_words: int = DEFAULT_CHUNK_WORDS,
+                 min_score: float = DEFAULT_MIN_SCORE, refresh_seconds: float = DEFAULT_REFRESH_SECONDS):
+        self.report_glob = report_glob
+        self.result_files = list(result_files if result_files is not None else [DEFAULT_RESULT_FILES])
+        self.store_path = store_path
+        self.chunk_words = chunk_words
+        self.min_score = min_score
+        self.refresh_seconds = refresh_seconds
+        self._index: Optional[PriorReportIndex] = None
+        self._signature: Optional[Tuple] = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+        self._stats = {"queries": 0, "hits": 0, "misses": 0, "web_searches": 0, "web_searches_after_hit": 0,
+                       "search_seconds": 0.0, "index_builds": 0}
+        self._hit_queries: List[Set[str]] = []
+        self._excluded: Set[str] = set()
+
+    @classmethod
+    def from_env(cls) -> "PriorReportLibrary":
+        enabled = _env_flag("PRIOR_REPORTS_ENABLED", True)
+        use_store = enabled and _env_flag("RESULTS_STORE_ENABLED", True)
+        return cls(
+            report_glob=os.getenv("PRIOR_REPORTS_GLOB", DEFAULT_REPORT_GLOB) if enabled else "",
+            result_files=[p.strip() for p in os.getenv("PRIOR_REPORTS_FILES", DEFAULT_RESULT_FILES).split(",") if p.strip()] if enabled else [],
+            store_path=os.getenv("RESULTS_STORE_PATH", DEFAULT_STORE_PATH) if use_store else None,
+            chunk_words=int(os.getenv("PRIOR_REPORTS_CHUNK_WORDS", DEFAULT_CHUNK_WORDS)),
+            min_score=float(os.getenv("PRIOR_REPORTS_MIN_SCORE", DEFAULT_MIN_SCORE)),
+            refresh_seconds=float(os.getenv("PRIOR_REPORTS_REFRESH_SECONDS", DEFAULT_REFRESH_SECONDS)),
+        )
+
+    # Leaves a file out of the index, e.g. the report the current run is still writing.
+    def exclude(self, path: str) -> None:
+        with self._lock:
+            self._excluded.add(os.path.abspath(path))
+            self._next_check = 0.0
+
+    def _source_files(self) -> List[str]:
+        files = sorted(glob.glob(self.report_glob)) if self.report_glob else []
+        files += [path for path in self.result_files if os.path.exists(path)]
+        return [path for path in files if os.path.abspath(path) not in self._excluded]
+
+    def _current_signature(self) -> Tuple:
+        paths = self._source_files()
+        if self.store_path:
+            paths += [path for path in (self.store_path, self.store_path + "-wal") if os.path.exists(path)]
+        signature = []
+        for path in paths:
+            try:
+                stat = os.stat(path)
+                signature.append((path, stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                continue
+        return tuple(signature)
+
+    # Current index, rebuilt if the sources changed since the last check.
+    def index(self) -> PriorReportIndex:
+        if self._index is not None and time.monotonic() < self._next_check:
+            return self._index
+        with self._lock:
+            if self._index is None or time.monotonic() >= self._next_check:
+                signature = self._current_signature()
+                if self._index is None or signature != self._signature:
+                    started = time.perf_counter()
+                    self._index = PriorReportIndex(self._load_passages())
+                    self._signature = signature
+                    self._stats["index_builds"] += 1
+                    print(f"Prior report index built: {len(self._index.passages)} passages from "
+                          f"{len({p.source for p in self._index.passages})} reports in {time.perf_counter() - started:.2f}s.")
+                self._next_check = time.monotonic() + self.refresh_seconds
+            return self._index
+
+    def _load_passages(self) -> List[Passage]:
+        passages: List[Passage] = []
+        recorded: Set[str] = set()
+        if self.store_path and os.path.exists(self.store_path):
+            try:
+                store = ResultsStore(self.store_path)
+                for run in store.iter_runs():
+                    for path in (run.get("source"), run.get("report_path")):
+                        if path:
+                            recorded.add(os.path.abspath(path))
+                for row in store.iter_task_results():
+                    self._add_passages(passages, row.get("output"), row["company"], row["industry"],
+                                       (row.get("finished_at") or "")[:10],
+                                       _section_label(row.get("name"), row.get("description")), f"results store run {row['run_id']}")
+            except Exception as e:
+                print(f"Warning: Could not read prior results from '{self.store_path}': {e}")
+
+        for path in self._source_files():
+            if os.path.abspath(path) in recorded:
+                continue
+            try:
+                if path.lower().endswith(".json"):
+                    input_data, tasks, finished_at = parse_crew_results(path)
+                else:
+                    input_data, tasks, _, finished_at = parse_text_report(path)
+            except (OSError, ValueError) as e:
+                print(f"Warning: Could not index prior report '{path}': {e}")
+                continue
+            for task in tasks:
+                self._add_passages(passages, task.get("output"), input_data.get('company_name', 'Unknown Company'),
+                                   input_data.get('industry', 'Unknown Industry'), finished_at[:10],
+                                   _section_label(task.get("name"), task.get("description")), path)
+        return passages
+
+    def _add_passages(self, passages: List[Passage], text: Optional[str], company: str, industry: str,
+                      date: str, section: str, source: str) -> None:
+        for chunk in chunk_text(text or "", self.chunk_words):
+            passages.append(Passage(chunk, company, industry, date, section, source))
+
+    # --- Queries and Statistics ---
+    def search(self, query: str, top_k: int = DEFAULT_TOP_K) -> List[Tuple[float, Passage]]:
+        index = self.index()
+        started = time.perf_counter()
+        results = index.search(query, top_k=top_k, min_score=self.min_score)
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self._stats["queries"] += 1
+            self._stats["search_seconds"] += elapsed
+            if results:
+                self._stats["hits"] += 1
+                self._hit_queries.append(set(tokenize(query)))
+            else:
+                self._stats["misses"] += 1
+        return results
+
+    # Called for every web search; a search similar to an earlier hit means that hit did not avoid it.
+    def note_web_search(self, query: str) -> None:
+        terms = set(tokenize(query))
+        with self._lock:
+            self._stats["web_searches"] += 1
+            for i, hit_terms in enumerate(self._hit_queries):
+                union = terms | hit_terms
+                if union and len(terms & hit_terms) / len(union) >= SIMILAR_QUERY_JACCARD:
+                    self._stats["web_searches_after_hit"] += 1
+                    del self._hit_queries[i]
+                    break
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        queries = stats["queries"]
+        stats["hit_rate"] = round(stats["hits"] / queries, 3) if queries else 0.0
+        stats["web_calls_avoided"] = max(stats["hits"] - stats["web_searches_after_hit"], 0)
+        stats["mean_search_ms"] = round(stats.pop("search_seconds") / queries * 1000, 3) if queries else None
+        stats["passages"] = len(self._index.passages) if self._index is not None else 0
+        return stats
+
+
+# --- Process-wide Instance ---
+_shared_library: Optional[PriorReportLibrary] = None
+_shared_library_lock = threading.Lock()
+
+
+def get_prior_reports() -> PriorReportLibrary:
+    global _shared_library
+    if _shared_library is None:
+        with _shared_library_lock:
+            if _shared_library is None:
+                _shared_library = PriorReportLibrary.from_env()
+    return _shared_library
@@ -0,0 +1,181 @@
+# report_writer.py
+
+# --- Report Formatting ---
+# Builds the text report from the crew's task outputs. The report is made of a header, one section
+# per task and an execution-metadata footer; each part is produced by its own function so the report
+# can be written incrementally.
+#
+# StreamingReportWriter appends each task's section to the report file as soon as the task completes
+# (driven by the scheduler's on_task_complete callback), flushing and fsyncing after every section so
+# a crash leaves all finished sections on disk. Sections are written in declared task order: a task
+# that finishes before an earlier one is held until the earlier section has been written. The footer
+# (including token usage) is written by finalize() once the run returns.
+
+import os
+from typing import Dict, Any, Iterator, List, Optional
+
+SECTION_RULE = "-" * 40
+
+
+def report_header_lines(company_name: str, industry: str, execution_time: str) -> List[str]:
+    return [
+        f"{company_name} Strategic Analysis Report",
+        f"Industry: {industry}",
+        f"Generated on: {execution_time}",
+        "=" * 50,
+        "",
+    ]
+
+
+# Lines for one task's section; `number` is the 1-based position of the task in the crew.
+def task_section_lines(number: int, task: Any, task_output: Any, company_name: str, industry: str) -> Iterator[str]:
+    task_desc = task.description.split(".")[0]
+    task_desc_formatted = task_desc.replace("{company_name}", company_name).replace("{industry}", industry).strip()
+    yield f"\nTask {number}: {task_desc_formatted}"
+    yield SECTION_RULE
+
+    # Safely access the raw output content.
+    output_content = getattr(task_output, 'raw', None)
+    if output_content is None:
+        print(f"Debug: Task {number} output object type: {type(task_output)}, lacks 'raw'. Value: {str(task_output)[:200]}...")
+        output_content = str(task_output)
+
+    yield "Key Findings:"
+    # Basic formatting for the output content.
+    if output_content and isinstance(output_content, str):
+        for line in output_content.strip().split("\n"):
+            line_stripped = line.strip()
+            if line_stripped.startswith(("**", "##", "1.", "2.", "3.", "4.", "5.", "-")) and len(line_stripped) > 2:
+                yield line_stripped
+            elif line_stripped:
+                yield f"  - {line_stripped}"
+    elif output_content:
+        yield f"  - Output (non-string): {str(output_content)[:300]}..."
+    else:
+        yield "  - No output content found for this task."
+    yield ""
+
+
+def report_footer_lines(tasks: List[Any], agents: List[Any], executed_count: int,
+                        usage_metrics: Optional[Dict[str, Any]]) -> List[str]:
+    lines = ["\n--- Execution Metadata ---", SECTION_RULE]
+    agent_roles = [agent.role for agent in agents]
+    lines.append(f"Agents Used: {', '.join(agent_roles)}")
+    lines.append(f"Tasks Defined: {len(tasks)}")
+    if executed_count: lines.append(f"Tasks Executed (with output): {executed_count}")
+    if usage_metrics:
+        lines.append(f"Total Tokens Used: {usage_metrics.get('total_tokens', 'N/A')}")
+    return lines
+
+
+# Function to format the raw results from the Crew execution into a readable text report.
+def format_to_text(execution_time, tasks, result_container, agents, input_data):
+    company_name = input_data.get('company_name', 'Unknown Company')
+    industry = input_data.get('industry', 'Unknown Industry')
+    output_lines = report_header_lines(company_name, industry, execution_time)
+
+    task_outputs = []
+    total_usage_metrics = {}
+    # Safely extract task outputs and usage metrics from the result object.
+    if result_container:
+        if hasattr(result_container, 'tasks_output') and isinstance(result_container.tasks_output, list):
+            task_outputs = result_container.tasks_output
+        if hasattr(result_container, 'usage_metrics'):
+             total_usage_metrics = result_container.usage_metrics
+        elif not hasattr(result_container, 'tasks_output'):
+             print(f"Debug: Result object type: {type(result_container)}, value: {str(result_container)[:500]}... Lacks 'tasks_output'.")
+
+    # Process and format the output of each task.
+    if task_outputs and len(task_outputs) == len(tasks):
+        output_lines.append("--- Task Results ---")
+        for i, (task, task_output) in enumerate(zip(tasks, task_outputs)):
+            output_lines.extend(task_section_lines(i + 1, task, task_output, company_name, industry))
+    elif not task_outputs:
+        output_lines.append("Execution resulted in no task outputs.")
+        if result_container: output_lines.append(f"Raw result: {str(result_container)[:500]}...")
+    else:
+        output_lines.append(f"Task output count ({len(task_outputs)}) does not match defined task count ({len(tasks)}).")
+        output_lines.append(f"Raw result: {str(result_container)[:500]}...")
+
+    output_lines.extend(report_footer_lines(tasks, agents, len(task_outputs), total_usage_metrics))
+    return "\n".join(output_lines)
+
+
+# --- Streaming Report Writer ---
+class StreamingReportWriter:
+    # Creates (truncates) the report file and writes the header; raises OSError if it cannot be opened.
+    def __init__(self, path: str, tasks: List[Any], agents: List[Any], input_data: Dict[str, Any],
+                 execution_time: str, fsync: bool = True):
+        self.path = path
+        self.tasks = list(tasks)
+        self.agents = list(agents)
+        self.company_name = input_data.get('company_name', 'Unknown Company')
+        self.industry = input_data.get('industry', 'Unknown Industry')
+        self.fsync = fsync
+        self.sections_written = 0
+        self.failed = False
+        self._pending: Dict[int, Any] = {}
+        self._file = open(path, 'w', encoding='utf-8')
+        self._write(report_header_lines(self.company_name, self.industry, execution_time) + ["--- Task Results ---"])
+
+    @property
+    def closed(self) -> bool:
+        return self._file.closed
+
+    # Scheduler callback: queues the finished task and writes every section that is now in order.
+    def task_completed(self, index: int, task: Any, task_output: Any) -> None:
+        if self.closed:
+            return
+        self._pending[index] = task_output
+        while self.sections_written in self._pending:
+            i = self.sections_written
+            self._write(task_section_lines(i + 1, self.tasks[i], self._pending.pop(i), self.company_name, self.industry))
+            self.sections_written += 1
+
+    # Writes the execution-metadata footer and closes the file. Returns False if any write failed.
+    def finalize(self, result_container: Any = None) -> bool:
+        usage_metrics = getattr(result_container, 'usage_metrics', None) or {}
+        self._write_held_sections()
+        if self.sections_written < len(self.tasks):
+            self._write([f"\nTask output count ({self.sections_written}) does not match defined task count ({len(self.tasks)})."])
+        self._write(report_footer_lines(self.tasks, self.agents, self.sections_written, usage_metrics))
+        self._close()
+        return not self.failed
+
+    # Ends an interrupted run: held sections are written, followed by a note and the footer.
+    def abort(self, error: BaseException) -> None:
+        if self.closed:
+            return
+        self._write_held_sections()
+        self._write([f"\nRun did not complete after {self.sections_written} of {len(self.tasks)} tasks: "
+                     f"{type(error).__name__}: {error}"])
+        self._write(report_footer_lines(self.tasks, self.agents, self.sections_written, None))
+        self._close()
+
+    # Sections held back behind an unfinished earlier task, written out of order with their task numbers.
+    def _write_held_sections(self) -> None:
+        for i in sorted(self._pending):
+            self._write(task_section_lines(i + 1, self.tasks[i], self._pending.pop(i), self.company_name, self.industry))
+            self.sections_written += 1
+
+    # Writes the lines one at a time, then flushes (and fsyncs) so the section is durable on disk.
+    def _write(self, lines) -> None:
+        if self.failed:
+            return
+        try:
+            for line in lines:
+                self._file.write(line)
+                self._file.write("\n")
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+        except OSError as e:
+            self.failed = True
+            print(f"Error writing report file '{self.path}': {e}")
+
+    def _close(self) -> None:
+        try:
+            self._file.close()
+        except OSError as e:
+            self.failed = True
+            print(f"Error writing report file '{self.path}': {e}")
@@ -0,0 +1,278 @@
+# research_fanout.py
+
+# --- Concurrent Research Fan-out ---
+# Agents tend to pass AdvancedResearchTool one long compound request ("Research company: X,
+# Industry: Y. Focus: market position, developments, ..."), which a web search answers poorly.
+# The fan-out splits such a request into focused sub-queries, runs them concurrently on a bounded
+# thread pool through the shared search client (so the process-wide rate limit still applies) and
+# merges the hits into one ranked, deduplicated list. Ranking is reciprocal-rank fusion: a snippet
+# found near the top of several sub-queries ranks first. Hits with the same URL or the same text
+# are reported once.
+# Each request has a deadline; sub-queries still running at the deadline are left out of the
+# answer (and named in it), but finish in the background and are cached for the next call.
+#
+# Configuration (.env):
+#   RESEARCH_FANOUT_ENABLED           - "false" sends compound requests as one search (default true)
+#   RESEARCH_FANOUT_MAX_QUERIES       - focus items searched per request, besides the company overview (default 6)
+#   RESEARCH_FANOUT_MAX_WORKERS       - concurrent searches across the process (default 4)
+#   RESEARCH_FANOUT_DEADLINE_SECONDS  - time budget per request (default 15)
+#   RESEARCH_FANOUT_MAX_RESULTS       - merged hits returned per request (default 12)
+
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional, Tuple
+
+from search_cache import get_search_cache, normalize_query
+from search_client import get_search_client
+
+DEFAULT_MAX_QUERIES = 6
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_DEADLINE_SECONDS = 15.0
+DEFAULT_MAX_RESULTS = 12
+# Reciprocal-rank fusion constant; damps the advantage of the very first positions.
+RRF_K = 60
+# Raw search hits are cached as JSON under their own namespace.
+HITS_NAMESPACE = "hits"
+DEDUP_TEXT_CHARS = 160
+
+COMPANY_PATTERN = re.compile(r"\b(?:research\s+)?(?:company|organi[sz]ation|target)\s*:\s*([^,.;\n]+)", re.IGNORECASE)
+INDUSTRY_PATTERN = re.compile(r"\b(?:industry|sector)\s*:\s*([^,.;\n]+)", re.IGNORECASE)
+FOCUS_PATTERN = re.compile(r"\b(?:focus(?:ing)?(?:\s+on)?|topics|aspects)\s*:\s*(.+)", re.IGNORECASE | re.DOTALL)
+# Focus items are separated by commas, semicolons or line breaks; "and" only counts after a comma
+# (", and pricing"), so topics like "research and development" stay whole.
+ITEM_SEPARATOR = re.compile(r"\s*[,;\n]\s*(?:and\b\s*)?", re.IGNORECASE)
+PART_SEPARATOR = re.compile(r"\s*[;\n]+\s*")
+LABEL_PATTERN = re.compile(r"\b(?:research\s+)?(?:company|organi[sz]ation|target|industry|sector)\s*:\s*", re.IGNORECASE)
+
+
+def _env_flag(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None or not value.strip():
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+# --- Query Splitting ---
+# Returns the focused sub-queries for a compound request, or [query] when it does not split.
+# "Company: X, Industry: Y. Focus: a, b" becomes ["X Y", "X a", "X b"]; otherwise the request is
+# split at semicolons and line breaks, and parts that do not name the company get it prepended.
+# At most `max_queries` focus items or parts are searched (the "X Y" overview query is not counted);
+# items beyond that are reported, not searched.
+def split_research_query(query: str, max_queries: int = DEFAULT_MAX_QUERIES) -> List[str]:
+    company = COMPANY_PATTERN.search(query)
+    industry = INDUSTRY_PATTERN.search(query)
+    company = company.group(1).strip() if company else ""
+    industry = industry.group(1).strip() if industry else ""
+    subject = company or industry
+
+    focus = FOCUS_PATTERN.search(query)
+    overview = []
+    if focus:
+        overview = [f"{company} {industry}"] if company and industry else []
+        candidates = [f"{subject} {item}".strip() for item in ITEM_SEPARATOR.split(focus.group(1).strip().rstrip(".")) if item]
+    else:
+        candidates = [LABEL_PATTERN.sub("", part).strip().rstrip(".") for part in PART_SEPARATOR.split(query)]
+        candidates = [part if not subject or subject.lower() in part.lower() else f"{subject} {part}" for part in candidates]
+
+    subqueries, seen = [], set()
+    for candidate in overview + candidates:
+        key = normalize_query(candidate)
+        if key and key not in seen:
+            seen.add(key)
+            subqueries.append(" ".join(candidate.split()))
+    limit = max_queries + len(overview)
+    if len(subqueries) > limit:
+        print(f"Warning: Research request has more than {max_queries} focus items; not searched: "
+              f"{', '.join(subqueries[limit:])}.")
+        subqueries = subqueries[:limit]
+    return subqueries if len(subqueries) > 1 else [query]
+
+
+# Hits for one query from the search cache (raw hits namespace) or the search client; the flag is
+# True on a cache hit. Empty answers are not cached.
+def search_hits(query: str, bypass: bool = False, client: Optional[Any] = None,
+                search_cache: Optional[Any] = None) -> Tuple[List[Dict[str, str]], bool]:
+    client = client or get_search_client()
+    search_cache = search_cache or get_search_cache()
+    cached = search_cache.get(query, bypass=bypass, namespace=HITS_NAMESPACE)
+    if cached is not None:
+        try:
+            return json.loads(cached), True
+        except json.JSONDecodeError:
+            pass
+    hits = client.results(query)
+    if hits:
+        search_cache.put(query, json.dumps(hits), namespace=HITS_NAMESPACE)
+    return hits, False
+
+
+# One numbered line per hit: "1. Title: snippet (url)".
+def format_hit(position: int, hit: Dict[str, Any]) -> str:
+    source = f" ({hit['href']})" if hit.get("href") else ""
+    return f"{position}. {hit.get('title') or 'Untitled'}: {(hit.get('body') or '').strip()}{source}"
+
+
+def _url_key(href: str) -> str:
+    href = re.sub(r"^https?://(www\.)?", "", href.strip().lower())
+    return href.split("#", 1)[0].rstrip("/")
+
+
+@dataclass
+class FanoutResult:
+    query: str
+    subqueries: List[str]
+    # Merged hits, best first: {"title", "href", "body", "score", "queries"}.
+    hits: List[Dict[str, Any]] = field(default_factory=list)
+    timed_out: List[str] = field(default_factory=list)
+    failed: Dict[str, str] = field(default_factory=dict)
+    cache_hits: int = 0
+    duplicates: int = 0
+    seconds: float = 0.0
+
+    # Which sub-queries were searched, and which of them are missing from the hits.
+    def summary(self) -> str:
+        lines = [f"Searched {len(self.subqueries)} focused queries concurrently: {' | '.join(self.subqueries)}"]
+        if self.timed_out:
+            lines.append(f"Not answered within the deadline: {' | '.join(self.timed_out)}")
+        if self.failed:
+            lines.append(f"Failed: {' | '.join(self.failed)}")
+        return "\n".join(lines)
+
+    def as_text(self) -> str:
+        return "\n".join([self.summary(), ""] + [format_hit(i, hit) for i, hit in enumerate(self.hits, start=1)])
+
+
+class ResearchFanout:
+    def __init__(self, max_queries: int = DEFAULT_MAX_QUERIES, max_workers: int = DEFAULT_MAX_WORKERS,
+                 deadline_seconds: float = DEFAULT_DEADLINE_SECONDS, max_results: int = DEFAULT_MAX_RESULTS,
+                 enabled: bool = True):
+        self.max_queries = max_queries
+        self.max_workers = max_workers
+        self.deadline_seconds = deadline_seconds
+        self.max_results = max_results
+        self.enabled = enabled
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "subqueries": 0, "cache_hits": 0, "timed_out": 0, "failed": 0,
+                       "duplicates_removed": 0, "seconds": 0.0}
+
+    @classmethod
+    def from_env(cls) -> "ResearchFanout":
+        return cls(
+            max_queries=int(os.getenv("RESEARCH_FANOUT_MAX_QUERIES", DEFAULT_MAX_QUERIES)),
+            max_workers=int(os.getenv("RESEARCH_FANOUT_MAX_WORKERS", DEFAULT_MAX_WORKERS)),
+            deadline_seconds=float(os.getenv("RESEARCH_FANOUT_DEADLINE_SECONDS", DEFAULT_DEADLINE_SECONDS)),
+            max_results=int(os.getenv("RESEARCH_FANOUT_MAX_RESULTS", DEFAULT_MAX_RESULTS)),
+            enabled=_env_flag("RESEARCH_FANOUT_ENABLED", True),
+        )
+
+    # Sub-queries a request would fan out to; a single entry means it is searched as is.
+    def plan(self, query: str) -> List[str]:
+        if not self.enabled or self.max_queries < 2:
+            return [query]
+        return split_research_query(query, self.max_queries)
+
+    def _pool(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="research-fanout")
+        return self._executor
+
+    # Runs the sub-queries concurrently and merges whatever answered before the deadline.
+    def search(self, query: str, subqueries: Optional[List[str]] = None, bypass: bool = False) -> FanoutResult:
+        subqueries = subqueries or self.plan(query)
+        started = time.monotonic()
+        # The client and cache are bound now, so searches finishing after the deadline use the same ones.
+        client, search_cache = get_search_client(), get_search_cache()
+        futures = [self._pool().submit(search_hits, subquery, bypass, client, search_cache) for subquery in subqueries]
+        wait(futures, timeout=self.deadline_seconds)
+
+        result = FanoutResult(query, subqueries)
+        answered: List[Tuple[str, List[Dict[str, str]]]] = []
+        for subquery, future in zip(subqueries, futures):
+            if not future.done():
+                result.timed_out.append(subquery)
+                continue
+            try:
+                hits, cached = future.result()
+            except Exception as e:
+                result.failed[subquery] = f"{type(e).__name__}: {e}"
+                print(f"Warning: Research sub-query '{subquery}' failed: {type(e).__name__}: {e}")
+                continue
+            result.cache_hits += cached
+            answered.append((subquery, hits))
+        result.hits, result.duplicates = self.merge(answered)
+        result.seconds = time.monotonic() - started
+        if result.timed_out:
+            print(f"Warning: {len(result.timed_out)} of {len(subqueries)} research sub-queries missed the "
+                  f"{self.deadline_seconds:g}s deadline for '{query[:60]}'.")
+
+        with self._lock:
+            self._stats["requests"] += 1
+            self._stats["subqueries"] += len(subqueries)
+            self._stats["cache_hits"] += result.cache_hits
+            self._stats["timed_out"] += len(result.timed_out)
+            self._stats["failed"] += len(result.failed)
+            self._stats["duplicates_removed"] += result.duplicates
+            self._stats["seconds"] += result.seconds
+        return result
+
+    # Reciprocal-rank fusion over the per-query hit lists; hits sharing a URL or text are merged.
+    # Returns the best `max_results` hits and the number of duplicates removed.
+    def merge(self, answered: List[Tuple[str, List[Dict[str, str]]]]) -> Tuple[List[Dict[str, Any]], int]:
+        merged: List[Dict[str, Any]] = []
+        by_key: Dict[str, Dict[str, Any]] = {}
+        duplicates = 0
+        for subquery, hits in answered:
+            for rank, hit in enumerate(hits, start=1):
+                body = (hit.get("body") or "").strip()
+                keys = [key for key in (f"url:{_url_key(hit.get('href') or '')}" if hit.get("href") else "",
+                                        f"text:{normalize_query(body)[:DEDUP_TEXT_CHARS]}" if body else "") if key]
+                if not keys:
+                    continue
+                entry = next((by_key[key] for key in keys if key in by_key), None)
+                if entry is None:
+                    entry = {"title": hit.get("title", ""), "href": hit.get("href", ""), "body": body,
+                             "score": 0.0, "queries": []}
+                    merged.append(entry)
+                else:
+                    duplicates += 1
+                    if len(body) > len(entry["body"]):
+                        entry["body"] = body
+                for key in keys:
+                    by_key.setdefault(key, entry)
+                entry["score"] += 1.0 / (RRF_K + rank)
+                if subquery not in entry["queries"]:
+                    entry["queries"].append(subquery)
+        # sorted() is stable, so equally scored hits keep their first-seen order.
+        ranked = sorted(merged, key=lambda entry: entry["score"], reverse=True)
+        for entry in ranked:
+            entry["score"] = round(entry["score"], 6)
+        return ranked[:self.max_results], duplicates
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        seconds = stats.pop("seconds")
+        stats["mean_wall_ms"] = round(seconds / stats["requests"] * 1000, 3) if stats["requests"] else 0.0
+        return stats
+
+
+# --- Process-wide Instance ---
+_shared_fanout: Optional[ResearchFanout] = None
+_shared_fanout_lock = threading.Lock()
+
+
+def get_research_fanout() -> ResearchFanout:
+    global _shared_fanout
+    if _shared_fanout is None:
+        with _shared_fanout_lock:
+            if _shared_fanout is None:
+                _shared_fanout = ResearchFanout.from_env()
+    return _shared_fanout
@@ -0,0 +1,403 @@
+# results_store.py
+
+# --- Results Store ---
+# Append-only SQLite log of every analysis run: inputs, per-task outputs, timings and token usage.
+# Runs are never updated or deleted; each completed run adds one `runs` row plus one `task_results`
+# row per task in a single transaction. Runs are indexed by company, industry and date, so queries
+# such as "latest report per company" or "token usage trend" read only the rows they need, and the
+# iter_* methods stream history in batches instead of loading it whole.
+#
+# Existing loose results (crew_results.json and *_report_<timestamp>.txt files) can be imported:
+#   python results_store.py import crew_results.json *_report_*.txt
+# and queried from the command line (one JSON object per line):
+#   python results_store.py latest [--industry NAME]
+#   python results_store.py history --company NAME
+#   python results_store.py tokens [--company NAME] [--industry NAME] [--period day|week|month]
+#
+# Configuration (.env):
+#   RESULTS_STORE_ENABLED - "false" disables recording runs (default true)
+#   RESULTS_STORE_PATH    - SQLite file location (default results.sqlite3)
+
+import argparse
+import glob
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+from datetime import datetime
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+DEFAULT_STORE_PATH = "results.sqlite3"
+DEFAULT_BATCH_SIZE = 200
+TREND_PERIODS = {"day": "%Y-%m-%d", "week": "%Y-W%W", "month": "%Y-%m"}
+
+RUN_COLUMNS = ("id", "company", "industry", "run_date", "started_at", "finished_at", "status", "wall_seconds",
+               "total_tokens", "prompt_tokens", "completion_tokens", "cached_prompt_tokens", "successful_requests",
+               "tasks", "report_path", "source")
+TASK_COLUMNS = ("position", "name", "agent", "description", "output", "output_bytes", "status", "wall_seconds",
+                "llm_calls", "prompt_tokens", "completion_tokens", "tool_calls")
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS runs ("
+    " id INTEGER PRIMARY KEY AUTOINCREMENT, company TEXT NOT NULL, company_key TEXT NOT NULL,"
+    " industry TEXT NOT NULL, industry_key TEXT NOT NULL, run_date TEXT NOT NULL, started_at TEXT,"
+    " finished_at TEXT NOT NULL, status TEXT NOT NULL, wall_seconds REAL, total_tokens INTEGER,"
+    " prompt_tokens INTEGER, completion_tokens INTEGER, cached_prompt_tokens INTEGER,"
+    " successful_requests INTEGER, tasks INTEGER NOT NULL, report_path TEXT, source TEXT UNIQUE,"
+    " inputs TEXT, metadata TEXT)",
+    "CREATE TABLE IF NOT EXISTS task_results ("
+    " run_id INTEGER NOT NULL REFERENCES runs (id), position INTEGER NOT NULL, name TEXT, agent TEXT,"
+    " description TEXT, output TEXT, output_bytes INTEGER, status TEXT, wall_seconds REAL,"
+    " llm_calls INTEGER, prompt_tokens INTEGER, completion_tokens INTEGER, tool_calls INTEGER,"
+    " PRIMARY KEY (run_id, position))",
+    "CREATE INDEX IF NOT EXISTS idx_runs_company ON runs (company_key, finished_at)",
+    "CREATE INDEX IF NOT EXISTS idx_runs_industry ON runs (industry_key, finished_at)",
+    "CREATE INDEX IF NOT EXISTS idx_runs_date ON runs (run_date)",
+)
+
+
+def _env_flag(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None or not value.strip():
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+# Case- and whitespace-insensitive key used for the company and industry indexes.
+def index_key(value: str) -> str:
+    return " ".join((value or "").lower().split())
+
+
+class ResultsStore:
+    def __init__(self, path: str = DEFAULT_STORE_PATH):
+        self.path = path
+        self._local = threading.local()
+        connection = self._connection()
+        for statement in SCHEMA:
+            connection.execute(statement)
+
+    @classmethod
+    def from_env(cls) -> Optional["ResultsStore"]:
+        if not _env_flag("RESULTS_STORE_ENABLED", True):
+            return None
+        return cls(os.getenv("RESULTS_STORE_PATH", DEFAULT_STORE_PATH))
+
+    # One connection per thread; WAL mode lets dashboards read while a run is being appended.
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    # --- Appending ---
+    # Records one run. `tasks` are dicts with TASK_COLUMNS keys (missing ones are stored as NULL);
+    # `usage` holds crewai's usage metrics. Returns the run id, or None if `source` was already recorded.
+    # `source` is stored as an absolute path, so a live run and a later import of its report match.
+    def append(self, input_data: Dict[str, Any], tasks: List[Dict[str, Any]], usage: Optional[Dict[str, Any]],
+               finished_at: str, started_at: Optional[str] = None, status: str = "completed",
+               wall_seconds: Optional[float] = None, report_path: Optional[str] = None,
+               source: Optional[str] = None, metadata: Optional[Dict[str, Any]] = None) -> Optional[int]:
+        company = input_data.get('company_name') or 'Unknown Company'
+        industry = input_data.get('industry') or 'Unknown Industry'
+        usage = usage or {}
+        source = os.path.abspath(source) if source else None
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            cursor = connection.execute(
+                "INSERT OR IGNORE INTO runs (company, company_key, industry, industry_key, run_date, started_at,"
+                " finished_at, status, wall_seconds, total_tokens, prompt_tokens, completion_tokens,"
+                " cached_prompt_tokens, successful_requests, tasks, report_path, source, inputs, metadata)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (company, index_key(company), industry, index_key(industry), finished_at[:10], started_at,
+                 finished_at, status, wall_seconds, usage.get('total_tokens'), usage.get('prompt_tokens'),
+                 usage.get('completion_tokens'), usage.get('cached_prompt_tokens'), usage.get('successful_requests'),
+                 len(tasks), report_path, source, json.dumps(input_data, default=str),
+                 json.dumps(metadata, default=str) if metadata else None),
+            )
+            if cursor.rowcount == 0:
+                connection.execute("ROLLBACK")
+                return None
+            run_id = cursor.lastrowid
+            connection.executemany(
+                f"INSERT INTO task_results (run_id, {', '.join(TASK_COLUMNS)}) VALUES (?{', ?' * len(TASK_COLUMNS)})",
+                [(run_id, *(self._task_value(task, column, position) for column in TASK_COLUMNS))
+                 for position, task in enumerate(tasks, start=1)],
+            )
+            connection.execute("COMMIT")
+            return run_id
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    @staticmethod
+    def _task_value(task: Dict[str, Any], column: str, position: int) -> Any:
+        if column == "position":
+            return position
+        if column == "output_bytes":
+            return len((task.get("output") or "").encode("utf-8"))
+        return task.get(column)
+
+    # Records a finished crew run: task outputs from `result`, per-task timings and token counts from
+    # a RunTelemetry snapshot when one is given.
+    def append_run(self, input_data: Dict[str, Any], crew_tasks: List[Any], result: Any, started_at: str,
+                   finished_at: str, wall_seconds: Optional[float] = None, report_path: Optional[str] = None,
+                   telemetry: Optional[Dict[str, Any]] = None) -> Optional[int]:
+        from task_scheduler import task_label
+
+        task_telemetry = (telemetry or {}).get("tasks", {})
+        outputs = getattr(result, 'tasks_output', None) or []
+        tasks = []
+        for task, output in zip(crew_tasks, outputs):
+            label = task_label(task)
+            record = task_telemetry.get(label, {})
+            tasks.append({
+                "name": label,
+                "agent": getattr(task.agent, "role", None),
+                "description": task.description,
+                "output": getattr(output, 'raw', None) or str(output),
+                "status": record.get("status", "completed"),
+                "wall_seconds": record.get("wall_seconds"),
+                "llm_calls": record.get("llm_calls"),
+                "prompt_tokens": record.get("prompt_tokens"),
+                "completion_tokens": record.get("completion_tokens"),
+                "tool_calls": record.get("tool_calls"),
+            })
+        status = "completed" if len(tasks) == len(crew_tasks) else "incomplete"
+        return self.append(input_data, tasks, getattr(result, 'usage_metrics', None), finished_at,
+                           started_at=started_at, status=status, wall_seconds=wall_seconds,
+                           report_path=report_path, source=report_path)
+
+    # --- Queries ---
+    def _filters(self, company: Optional[str], industry: Optional[str], since: Optional[str],
+                 until: Optional[str]) -> Tuple[str, List[Any]]:
+        clauses, params = [], []
+        if company:
+            clauses.append("company_key = ?")
+            params.append(index_key(company))
+        if industry:
+            clauses.append("industry_key = ?")
+            params.append(index_key(industry))
+        if since:
+            clauses.append("run_date >= ?")
+            params.append(since[:10])
+        if until:
+            clauses.append("run_date <= ?")
+            params.append(until[:10])
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    # Streams rows of `query` in batches of `batch_size` as dicts keyed by `columns`.
+    def _stream(self, query: str, params: List[Any], columns: Tuple[str, ...], batch_size: int) -> Iterator[Dict[str, Any]]:
+        cursor = self._connection().execute(query, params)
+        try:
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    return
+                for row in rows:
+                    yield dict(zip(columns, row))
+        finally:
+            cursor.close()
+
+    # Runs matching the filters (dates as YYYY-MM-DD, inclusive), newest first by default.
+    def iter_runs(self, company: Optional[str] = None, industry: Optional[str] = None, since: Optional[str] = None,
+                  until: Optional[str] = None, newest_first: bool = True,
+                  batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[Dict[str, Any]]:
+        where, params = self._filters(company, industry, since, until)
+        order = "DESC" if newest_first else "ASC"
+        return self._stream(f"SELECT {', '.join(RUN_COLUMNS)} FROM runs{where} ORDER BY finished_at {order}, id {order}",
+                            params, RUN_COLUMNS, batch_size)
+
+    # Task results (with their run's company, industry and finish time) for matching runs, oldest first.
+    def iter_task_results(self, run_id: Optional[int] = None, company: Optional[str] = None,
+                          industry: Optional[str] = None, task_name: Optional[str] = None,
+                          include_output: bool = True, batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[Dict[str, Any]]:
+        where, params = self._filters(company, industry, None, None)
+        clauses = [where[len(" WHERE "):]] if where else []
+        if run_id is not None:
+            clauses.append("runs.id = ?")
+            params.append(run_id)
+        if task_name:
+            clauses.append("task_results.name = ?")
+            params.append(task_name)
+        task_columns = tuple(c for c in TASK_COLUMNS if include_output or c != "output")
+        columns = ("run_id", "company", "industry", "finished_at") + task_columns
+        query = (f"SELECT runs.id, company, industry, finished_at, {', '.join('task_results.' + c for c in task_columns)}"
+                 f" FROM task_results JOIN runs ON runs.id = task_results.run_id"
+                 f"{' WHERE ' + ' AND '.join(clauses) if clauses else ''}"
+                 f" ORDER BY runs.finished_at, runs.id, task_results.position")
+        return self._stream(query, params, columns, batch_size)
+
+    def get_run(self, run_id: int) -> Optional[Dict[str, Any]]:
+        row = self._connection().execute(f"SELECT {', '.join(RUN_COLUMNS)}, inputs FROM runs WHERE id = ?", (run_id,)).fetchone()
+        if row is None:
+            return None
+        run = dict(zip(RUN_COLUMNS, row))
+        run["inputs"] = json.loads(row[-1]) if row[-1] else {}
+        run["task_results"] = [{key: value for key, value in task.items() if key not in ("run_id", "company", "industry", "finished_at")}
+                               for task in self.iter_task_results(run_id=run_id)]
+        return run
+
+    # The most recent run of every company (optionally within one industry).
+    def latest_per_company(self, industry: Optional[str] = None) -> List[Dict[str, Any]]:
+        where, params = self._filters(None, industry, None, None)
+        query = (f"SELECT {', '.join('r.' + c for c in RUN_COLUMNS)} FROM runs r"
+                 f" JOIN (SELECT company_key, MAX(finished_at) AS latest FROM runs{where} GROUP BY company_key) l"
+                 f" ON r.company_key = l.company_key AND r.finished_at = l.latest"
+                 f" ORDER BY r.company")
+        latest: Dict[str, Dict[str, Any]] = {}
+        for run in self._stream(query, params, RUN_COLUMNS, DEFAULT_BATCH_SIZE):
+            latest[index_key(run["company"])] = run
+        return list(latest.values())
+
+    # Token usage per day, week or month for matching runs, oldest period first.
+    def token_usage_trend(self, company: Optional[str] = None, industry: Optional[str] = None,
+                          period: str = "day") -> List[Dict[str, Any]]:
+        if period not in TREND_PERIODS:
+            raise ValueError(f"Unknown trend period '{period}'; expected one of {', '.join(TREND_PERIODS)}.")
+        where, params = self._filters(company, industry, None, None)
+        query = (f"SELECT strftime('{TREND_PERIODS[period]}', run_date) AS period, COUNT(*),"
+                 f" SUM(COALESCE(total_tokens, 0)), SUM(COALESCE(prompt_tokens, 0)), SUM(COALESCE(completion_tokens, 0))"
+                 f" FROM runs{where} GROUP BY period ORDER BY period")
+        trend = []
+        for period_key, runs, total, prompt, completion in self._connection().execute(query, params):
+            trend.append({"period": period_key, "runs": runs, "total_tokens": total, "prompt_tokens": prompt,
+                          "completion_tokens": completion, "avg_tokens_per_run": round(total / runs, 1) if runs else 0})
+        return trend
+
+    # --- Importing Existing Results ---
+    # Imports a text report or a crew_results.json file; returns the run id (None if already imported).
+    def import_file(self, path: str) -> Optional[int]:
+        if path.lower().endswith(".json"):
+            input_data, tasks, finished_at = parse_crew_results(path)
+            return self.append(input_data, tasks, None, finished_at, source=path, status="imported")
+        input_data, tasks, usage, finished_at = parse_text_report(path)
+        return self.append(input_data, tasks, usage, finished_at, report_path=path, source=path, status="imported")
+
+
+# --- Legacy Formats ---
+REPORT_TITLE_SUFFIX = " Strategic Analysis Report"
+TASK_HEADING = re.compile(r"^Task (\d+): (.*)$")
+RESEARCH_TARGET = re.compile(r"research on (.+?) in the (.+?) sector", re.IGNORECASE)
+
+
+# Parses a report written by format_to_text back into inputs, task sections and token usage.
+def parse_text_report(path: str) -> Tuple[Dict[str, Any], List[Dict[str, Any]], Dict[str, Any], str]:
+    input_data: Dict[str, Any] = {}
+    usage: Dict[str, Any] = {}
+    finished_at = datetime.fromtimestamp(os.path.getmtime(path)).isoformat()
+    tasks: List[Dict[str, Any]] = []
+    current: Optional[Dict[str, Any]] = None
+    in_description = False
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.rstrip("\n")
+            if not input_data.get('company_name') and line.endswith(REPORT_TITLE_SUFFIX):
+                input_data['company_name'] = line[:-len(REPORT_TITLE_SUFFIX)].strip()
+            elif line.startswith("Industry: ") and 'industry' not in input_data:
+                input_data['industry'] = line[len("Industry: "):].strip()
+            elif line.startswith("Generated on: "):
+                try:
+                    finished_at = datetime.strptime(line[len("Generated on: "):].strip(), "%Y-%m-%d_%H-%M-%S").isoformat()
+                except ValueError:
+                    pass
+            elif TASK_HEADING.match(line):
+                current = {"description": TASK_HEADING.match(line).group(2).strip(), "lines": []}
+                tasks.append(current)
+                in_description = True
+            elif line.startswith("--- Execution Metadata ---"):
+                current = None
+            elif line.startswith("Total Tokens Used: "):
+                value = line[len("Total Tokens Used: "):].strip()
+                if value.isdigit():
+                    usage['total_tokens'] = int(value)
+            elif current is not None:
+                if in_description:
+                    if line.startswith("-" * 10):
+                        in_description = False
+                    elif line.strip():
+                        current["description"] += " " + line.strip()
+                elif line != "Key Findings:":
+                    current["lines"].append(line)
+    for task in tasks:
+        task["output"] = "\n".join(task.pop("lines")).strip()
+    return input_data, tasks, usage, finished_at
+
+
+# Parses the legacy crew_results.json ({"execution_time", "results": [{"task", "output"}], ...}).
+def parse_crew_results(path: str) -> Tuple[Dict[str, Any], List[Dict[str, Any]], str]:
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    results = data.get("results", [])
+    tasks = [{"description": item.get("task"), "output": item.get("output")} for item in results]
+    input_data: Dict[str, Any] = {}
+    match = RESEARCH_TARGET.search(results[0].get("task", "")) if results else None
+    if match:
+        input_data = {'company_name': match.group(1), 'industry': match.group(2)}
+    agents = data.get("execution_metadata", {}).get("agents_used") or []
+    for task, agent in zip(tasks, agents):
+        task["agent"] = agent
+    finished_at = data.get("execution_time") or datetime.fromtimestamp(os.path.getmtime(path)).isoformat()
+    return input_data, tasks, finished_at
+
+
+# --- Command Line ---
+def main(argv: Optional[List[str]] = None) -> int:
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Query or import the analysis results store.")
+    parser.add_argument("--path", default=os.getenv("RESULTS_STORE_PATH", DEFAULT_STORE_PATH),
+                        help=f"Store file (default RESULTS_STORE_PATH or {DEFAULT_STORE_PATH})")
+    commands = parser.add_subparsers(dest="command", required=True)
+    import_parser = commands.add_parser("import", help="Import text reports and crew_results.json files")
+    import_parser.add_argument("files", nargs="*", help="Files to import (default crew_results.json and *_report_*.txt)")
+    latest_parser = commands.add_parser("latest", help="Latest run per company")
+    latest_parser.add_argument("--industry")
+    history_parser = commands.add_parser("history", help="Runs of one company, newest first")
+    history_parser.add_argument("--company", required=True)
+    history_parser.add_argument("--since", help="Earliest run date (YYYY-MM-DD)")
+    tokens_parser = commands.add_parser("tokens", help="Token usage trend")
+    tokens_parser.add_argument("--company")
+    tokens_parser.add_argument("--industry")
+    tokens_parser.add_argument("--period", choices=sorted(TREND_PERIODS), default="day")
+    args = parser.parse_args(argv)
+
+    store = ResultsStore(args.path)
+    if args.command == "import":
+        files = args.files or sorted(glob.glob("crew_results.json") + glob.glob("*_report_*.txt"))
+        imported = 0
+        for path in files:
+            try:
+                run_id = store.import_file(path)
+            except (OSError, ValueError) as e:
+                print(f"Warning: Could not import '{path}': {e}")
+                continue
+            if run_id is None:
+                print(f"Skipped '{path}' (already imported).")
+            else:
+                imported += 1
+                print(f"Imported '{path}' as run {run_id}.")
+        print(f"Imported {imported} of {len(files)} file(s) into {args.path}.")
+        return 0
+    if args.command == "latest":
+        rows = store.latest_per_company(industry=args.industry)
+    elif args.command == "history":
+        rows = store.iter_runs(company=args.company, since=args.since)
+    else:
+        rows = store.token_usage_trend(company=args.company, industry=args.industry, period=args.period)
+    for row in rows:
+        print(json.dumps(row, default=str))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,25 @@
+# run_context.py
+
+# --- Run Context ---
+# Tracks which task the current thread of execution is working on, so shared components (the LLM
+# response cache, telemetry) can attribute their work to a task without it being passed through
+# crewai's call chain. The scheduler enters task_scope() around every task it runs.
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+_current_task: ContextVar[Optional[str]] = ContextVar("current_task", default=None)
+
+
+def current_task() -> Optional[str]:
+    return _current_task.get()
+
+
+@contextmanager
+def task_scope(label: str) -> Iterator[None]:
+    token = _current_task.set(label)
+    try:
+        yield
+    finally:
+        _current_task.reset(token)
@@ -0,0 +1,184 @@
+# search_cache.py
+
+# --- Persistent Search Cache ---
+# SQLite-backed cache for web search results, shared by every AdvancedResearchTool call in the
+# process and across reruns (and batch workers) that use the same cache file.
+# Entries are keyed by a normalized query, expire after a TTL and are evicted least-recently-used
+# once the cache grows past its entry limit.
+#
+# Configuration (.env):
+#   SEARCH_CACHE_ENABLED      - "false" disables the cache entirely (default true)
+#   SEARCH_CACHE_PATH         - SQLite file location (default search_cache.sqlite3)
+#   SEARCH_CACHE_TTL_HOURS    - lifetime of an entry in hours (default 24)
+#   SEARCH_CACHE_MAX_ENTRIES  - entries kept before LRU eviction (default 5000)
+#   SEARCH_CACHE_REFRESH      - "true" bypasses cached results and refreshes them (default false)
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+DEFAULT_CACHE_PATH = "search_cache.sqlite3"
+DEFAULT_TTL_HOURS = 24.0
+DEFAULT_MAX_ENTRIES = 5000
+
+
+def _env_flag(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None or not value.strip():
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+# Lowercases the query, drops punctuation and collapses whitespace so that trivially
+# different phrasings of the same search share one cache entry.
+def normalize_query(query: str) -> str:
+    normalized = re.sub(r"[^\w\s&+\-]", " ", query.lower())
+    return re.sub(r"\s+", " ", normalized).strip()
+
+
+class SearchCache:
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, ttl_seconds: float = DEFAULT_TTL_HOURS * 3600,
+                 max_entries: int = DEFAULT_MAX_ENTRIES, enabled: bool = True, refresh: bool = False):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self.refresh = refresh
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "expired": 0, "bypassed": 0, "writes": 0, "evictions": 0}
+        if self.enabled:
+            self._connection().execute(
+                "CREATE TABLE IF NOT EXISTS search_cache ("
+                " key TEXT PRIMARY KEY, query TEXT NOT NULL, result TEXT NOT NULL,"
+                " created_at REAL NOT NULL, last_accessed REAL NOT NULL)"
+            )
+            self._connection().execute(
+                "CREATE INDEX IF NOT EXISTS idx_search_cache_last_accessed ON search_cache (last_accessed)"
+            )
+
+    @classmethod
+    def from_env(cls) -> "SearchCache":
+        return cls(
+            path=os.getenv("SEARCH_CACHE_PATH", DEFAULT_CACHE_PATH),
+            ttl_seconds=float(os.getenv("SEARCH_CACHE_TTL_HOURS", DEFAULT_TTL_HOURS)) * 3600,
+            max_entries=int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)),
+            enabled=_env_flag("SEARCH_CACHE_ENABLED", True),
+            refresh=_env_flag("SEARCH_CACHE_REFRESH", False),
+        )
+
+    # One connection per thread; WAL mode lets concurrent batch workers read while one writes.
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def _count(self, counter: str) -> None:
+        with self._lock:
+            self._stats[counter] += 1
+
+    # A `namespace` keeps differently shaped results for the same query (e.g. raw hits) apart.
+    @staticmethod
+    def cache_key(query: str, namespace: str = "") -> str:
+        key = normalize_query(query)
+        if namespace:
+            key = f"{namespace}\x00{key}"
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    # Returns the cached result for the query, or None on a miss, an expired entry or a bypass.
+    def get(self, query: str, bypass: bool = False, namespace: str = "") -> Optional[str]:
+        if not self.enabled:
+            return None
+        if bypass or self.refresh:
+            self._count("bypassed")
+            return None
+        key = self.cache_key(query, namespace)
+        now = time.time()
+        try:
+            connection = self._connection()
+            row = connection.execute("SELECT result, created_at FROM search_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self._count("misses")
+                return None
+            result, created_at = row
+            if self.ttl_seconds > 0 and now - created_at > self.ttl_seconds:
+                connection.execute("DELETE FROM search_cache WHERE key = ?", (key,))
+                self._count("expired")
+                self._count("misses")
+                return None
+            connection.execute("UPDATE search_cache SET last_accessed = ? WHERE key = ?", (now, key))
+            self._count("hits")
+            return result
+        except sqlite3.Error as e:
+            print(f"Warning: Search cache read failed for '{query}': {e}")
+            self._count("misses")
+            return None
+
+    def put(self, query: str, result: str, namespace: str = "") -> None:
+        if not self.enabled:
+            return
+        now = time.time()
+        try:
+            connection = self._connection()
+            connection.execute(
+                "INSERT OR REPLACE INTO search_cache (key, query, result, created_at, last_accessed) VALUES (?, ?, ?, ?, ?)",
+                (self.cache_key(query, namespace), normalize_query(query), result, now, now),
+            )
+            self._count("writes")
+            self._evict(connection)
+        except sqlite3.Error as e:
+            print(f"Warning: Search cache write failed for '{query}': {e}")
+
+    # Drops expired entries, then the least recently used ones beyond max_entries.
+    def _evict(self, connection: sqlite3.Connection) -> None:
+        removed = 0
+        if self.ttl_seconds > 0:
+            removed += connection.execute(
+                "DELETE FROM search_cache WHERE created_at < ?", (time.time() - self.ttl_seconds,)
+            ).rowcount
+        (count,) = connection.execute("SELECT COUNT(*) FROM search_cache").fetchone()
+        overflow = count - self.max_entries
+        if overflow > 0:
+            removed += connection.execute(
+                "DELETE FROM search_cache WHERE key IN "
+                "(SELECT key FROM search_cache ORDER BY last_accessed ASC LIMIT ?)", (overflow,)
+            ).rowcount
+        if removed:
+            with self._lock:
+                self._stats["evictions"] += removed
+
+    def clear(self) -> None:
+        if self.enabled:
+            self._connection().execute("DELETE FROM search_cache")
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+        return stats
+
+
+# --- Process-wide Instance ---
+_shared_cache: Optional[SearchCache] = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_search_cache() -> SearchCache:
+    global _shared_cache
+    if _shared_cache is None:
+        with _shared_cache_lock:
+            if _shared_cache is None:
+                _shared_cache = SearchCache.from_env()
+    return _shared_cache
@@ -0,0 +1,175 @@
+# search_client.py
+
+# --- Shared Search Client ---
+# One process-wide DuckDuckGo client used by every AdvancedResearchTool instance.
+# HTTP sessions are reused (one DDGS session per worker thread instead of one per call), and
+# every search passes through a shared token-bucket rate limiter. When the backend throttles,
+# the limiter pauses all callers, halves its rate and retries with exponential backoff; the rate
+# then recovers gradually as searches succeed again.
+#
+# Configuration (.env):
+#   SEARCH_RATE_PER_MINUTE  - sustained searches per minute across the process (default 20)
+#   SEARCH_BURST            - searches allowed back-to-back before throttling kicks in (default 3)
+#   SEARCH_MAX_RETRIES      - retries after a rate-limit response (default 3)
+#   SEARCH_MAX_RESULTS      - results requested per search (default 5)
+
+import os
+import random
+import threading
+import time
+from typing import Callable, Dict, Any, List, Optional
+
+from duckduckgo_search import DDGS
+from duckduckgo_search.exceptions import RatelimitException
+
+DEFAULT_RATE_PER_MINUTE = 20.0
+DEFAULT_BURST = 3
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_MAX_RESULTS = 5
+BACKOFF_BASE_SECONDS = 2.0
+BACKOFF_MAX_SECONDS = 60.0
+
+
+# --- Token Bucket Rate Limiter ---
+# Thread-safe token bucket with additive-increase / multiplicative-decrease rate adaptation.
+class TokenBucketRateLimiter:
+    def __init__(self, rate_per_second: float, capacity: int, min_rate_per_second: Optional[float] = None):
+        if rate_per_second <= 0 or capacity < 1:
+            raise ValueError("Rate limiter needs a positive rate and a capacity of at least 1.")
+        self.max_rate = rate_per_second
+        self.min_rate = min_rate_per_second or rate_per_second / 8
+        self.rate = rate_per_second
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        self.total_wait_seconds = 0.0
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    # Blocks until a token is available (and any throttling pause has elapsed).
+    def acquire(self) -> float:
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self._paused_until and self._tokens >= 1:
+                    self._tokens -= 1
+                    self.total_wait_seconds += waited
+                    return waited
+                delay = max(self._paused_until - now, (1 - self._tokens) / self.rate)
+            time.sleep(delay)
+            waited += delay
+
+    # Called when the backend throttles: pause every caller and halve the sustained rate.
+    def penalize(self, pause_seconds: float) -> None:
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self._tokens = 0.0
+            self._paused_until = max(self._paused_until, time.monotonic() + pause_seconds)
+
+    # Called after a successful request: recover the rate in small steps up to the configured maximum.
+    def reward(self) -> None:
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 10)
+
+
+# Default backend: one DDGS session per thread, reused for every search made on that thread.
+class DuckDuckGoBackend:
+    def __init__(self, timeout: int = 10):
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def __call__(self, query: str, max_results: int) -> List[Dict[str, str]]:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = DDGS(timeout=self.timeout)
+            self._local.session = session
+        return session.text(query, max_results=max_results) or []
+
+
+class SharedSearchClient:
+    # `backend` is any callable (query, max_results) -> list of {"title", "href", "body"} dicts.
+    def __init__(self, backend: Optional[Callable[[str, int], List[Dict[str, str]]]] = None,
+                 rate_per_minute: float = DEFAULT_RATE_PER_MINUTE, burst: int = DEFAULT_BURST,
+                 max_retries: int = DEFAULT_MAX_RETRIES, max_results: int = DEFAULT_MAX_RESULTS):
+        self.backend = backend or DuckDuckGoBackend()
+        self.limiter = TokenBucketRateLimiter(rate_per_minute / 60.0, burst)
+        self.max_retries = max_retries
+        self.max_results = max_results
+        self._lock = threading.Lock()
+        self._stats = {"searches": 0, "backend_calls": 0, "throttled": 0, "failures": 0}
+
+    @classmethod
+    def from_env(cls) -> "SharedSearchClient":
+        return cls(
+            rate_per_minute=float(os.getenv("SEARCH_RATE_PER_MINUTE", DEFAULT_RATE_PER_MINUTE)),
+            burst=int(os.getenv("SEARCH_BURST", DEFAULT_BURST)),
+            max_retries=int(os.getenv("SEARCH_MAX_RETRIES", DEFAULT_MAX_RETRIES)),
+            max_results=int(os.getenv("SEARCH_MAX_RESULTS", DEFAULT_MAX_RESULTS)),
+        )
+
+    def _count(self, counter: str) -> None:
+        with self._lock:
+            self._stats[counter] += 1
+
+    # Returns the individual search hits for a query, retrying with backoff when throttled.
+    def results(self, query: str, max_results: Optional[int] = None) -> List[Dict[str, str]]:
+        self._count("searches")
+        attempt = 0
+        while True:
+            self.limiter.acquire()
+            self._count("backend_calls")
+            try:
+                hits = self.backend(query, max_results or self.max_results)
+                self.limiter.reward()
+                return list(hits)
+            except RatelimitException as e:
+                self._count("throttled")
+                if attempt >= self.max_retries:
+                    self._count("failures")
+                    raise
+                delay = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * (2 ** attempt)) * random.uniform(0.5, 1.5)
+                print(f"Warning: Search backend throttled ({e}); backing off {delay:.1f}s before retry {attempt + 1}/{self.max_retries}.")
+                self.limiter.penalize(delay)
+                attempt += 1
+            except Exception:
+                self._count("failures")
+                raise
+
+    # Returns the snippets joined into one string, like DuckDuckGoSearchRun.run (empty if nothing found).
+    def run(self, query: str) -> str:
+        return " ".join(hit.get("body", "") for hit in self.results(query) if hit.get("body"))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["current_rate_per_minute"] = round(self.limiter.rate * 60, 2)
+        stats["rate_limit_wait_seconds"] = round(self.limiter.total_wait_seconds, 3)
+        return stats
+
+
+# --- Process-wide Instance ---
+_shared_client: Optional[SharedSearchClient] = None
+_shared_client_lock = threading.Lock()
+
+
+def get_search_client() -> SharedSearchClient:
+    global _shared_client
+    if _shared_client is None:
+        with _shared_client_lock:
+            if _shared_client is None:
+                _shared_client = SharedSearchClient.from_env()
+    return _shared_client
+
+
+# Replaces the process-wide client (e.g. with a different backend); returns the previous one.
+def set_search_client(client: Optional[SharedSearchClient]) -> Optional[SharedSearchClient]:
+    global _shared_client
+    with _shared_client_lock:
+        previous, _shared_client = _shared_client, client
+    return previous
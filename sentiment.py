@@ -0,0 +1,128 @@
+# sentiment.py
+
+# --- Lexicon-Based Sentiment Scoring ---
+# Scores many documents in one call. Texts are tokenized on word boundaries (so "loss" no longer
+# matches inside "glossary"), every occurrence of a lexicon term counts, and term weights come
+# from a JSON lexicon file. Counting is done with a NumPy document x term frequency matrix.
+#
+# Configuration (.env):
+#   SENTIMENT_LEXICON_PATH - lexicon file with "positive"/"negative" word -> weight maps
+#                            (default sentiment_lexicon.json)
+
+import json
+import os
+import re
+import threading
+from dataclasses import dataclass, field
+from itertools import chain
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+DEFAULT_LEXICON_PATH = "sentiment_lexicon.json"
+TOKEN_PATTERN = re.compile(r"[a-z]+(?:['-][a-z]+)*")
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+@dataclass
+class SentimentScore:
+    score: float
+    positive: float
+    negative: float
+    token_count: int
+    positive_terms: List[Tuple[str, int]] = field(default_factory=list)
+    negative_terms: List[Tuple[str, int]] = field(default_factory=list)
+
+    @property
+    def label(self) -> str:
+        if self.score > 0:
+            return "positive"
+        if self.score < 0:
+            return "negative"
+        return "neutral"
+
+
+class SentimentAnalyzer:
+    # `lexicon` maps "positive"/"negative" to {word: weight}; weights are stored as magnitudes.
+    def __init__(self, lexicon: Dict[str, Dict[str, float]]):
+        weights: Dict[str, float] = {}
+        for polarity, sign in (("positive", 1.0), ("negative", -1.0)):
+            for word, weight in (lexicon.get(polarity) or {}).items():
+                term = word.lower().strip()
+                if not TOKEN_PATTERN.fullmatch(term):
+                    print(f"Warning: Skipping sentiment lexicon entry '{word}' (only single words are supported).")
+                    continue
+                weights[term] = sign * abs(float(weight))
+        self.vocabulary = np.array(sorted(weights))
+        self.weights = np.array([weights[term] for term in self.vocabulary], dtype=np.float64)
+        self._positive_weights = np.clip(self.weights, 0, None)
+        self._negative_weights = np.clip(-self.weights, 0, None)
+
+    @classmethod
+    def from_file(cls, path: str) -> "SentimentAnalyzer":
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    # Builds the (documents x lexicon terms) count matrix for the given texts.
+    def term_frequency_matrix(self, texts: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        tokens_per_doc = [tokenize(text or "") for text in texts]
+        lengths = np.fromiter((len(tokens) for tokens in tokens_per_doc), dtype=np.int64, count=len(texts))
+        matrix = np.zeros((len(texts), len(self.vocabulary)), dtype=np.int64)
+        if not len(self.vocabulary) or not lengths.sum():
+            return matrix, lengths
+
+        tokens = np.array(list(chain.from_iterable(tokens_per_doc)))
+        doc_ids = np.repeat(np.arange(len(texts)), lengths)
+        term_ids = np.searchsorted(self.vocabulary, tokens)
+        term_ids[term_ids == len(self.vocabulary)] = 0
+        in_lexicon = self.vocabulary[term_ids] == tokens
+        np.add.at(matrix, (doc_ids[in_lexicon], term_ids[in_lexicon]), 1)
+        return matrix, lengths
+
+    # Scores every text in one pass; the result list is aligned with the input.
+    def score_batch(self, texts: List[str], top_terms: int = 3) -> List[SentimentScore]:
+        if not texts:
+            return []
+        matrix, lengths = self.term_frequency_matrix(texts)
+        positive = matrix @ self._positive_weights
+        negative = matrix @ self._negative_weights
+        scores = []
+        for i in range(len(texts)):
+            scores.append(SentimentScore(
+                score=round(float(positive[i] - negative[i]), 3),
+                positive=round(float(positive[i]), 3),
+                negative=round(float(negative[i]), 3),
+                token_count=int(lengths[i]),
+                positive_terms=self._top_terms(matrix[i], self._positive_weights, top_terms),
+                negative_terms=self._top_terms(matrix[i], self._negative_weights, top_terms),
+            ))
+        return scores
+
+    def _top_terms(self, counts: np.ndarray, weights: np.ndarray, limit: int) -> List[Tuple[str, int]]:
+        contributions = counts * weights
+        ranked = np.argsort(-contributions, kind="stable")[:limit]
+        return [(str(self.vocabulary[j]), int(counts[j])) for j in ranked if contributions[j] > 0]
+
+
+# --- Process-wide Analyzer ---
+_analyzers: Dict[str, SentimentAnalyzer] = {}
+_analyzers_lock = threading.Lock()
+
+
+def get_sentiment_analyzer(path: Optional[str] = None) -> SentimentAnalyzer:
+    path = path or os.getenv("SENTIMENT_LEXICON_PATH", DEFAULT_LEXICON_PATH)
+    analyzer = _analyzers.get(path)
+    if analyzer is None:
+        with _analyzers_lock:
+            analyzer = _analyzers.get(path)
+            if analyzer is None:
+                analyzer = SentimentAnalyzer.from_file(path)
+                _analyzers[path] = analyzer
+    return analyzer
+
+
+def score_texts(texts: List[str], lexicon_path: Optional[str] = None) -> List[SentimentScore]:
+    return get_sentiment_analyzer(lexicon_path).score_batch(texts)
@@ -0,0 +1,77 @@
+# single_flight.py
+
+# --- Single-Flight Call Coalescing ---
+# Ensures only one execution of an identical call is in flight at a time. The first caller for a
+# key (the leader) runs the function; callers arriving with the same key while it is running wait
+# for and share the leader's result (or exception) instead of starting a duplicate call.
+# Works from plain threads and from asyncio code (waiting callers do not block the event loop).
+
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._in_flight: Dict[Hashable, Future] = {}
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    # Registers the caller for `key`; returns the shared future and whether this caller leads.
+    def _join(self, key: Hashable, namespace: str) -> Tuple[Future, bool]:
+        with self._lock:
+            counters = self._stats.setdefault(namespace, {"executed": 0, "coalesced": 0})
+            future = self._in_flight.get(key)
+            if future is not None:
+                counters["coalesced"] += 1
+                return future, False
+            future = Future()
+            self._in_flight[key] = future
+            counters["executed"] += 1
+            return future, True
+
+    def _finish(self, key: Hashable, future: Future, fn: Callable[[], Any]) -> Any:
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    # Runs fn() unless an identical call is already in flight, in which case its result is shared.
+    def do(self, key: Hashable, fn: Callable[[], Any], namespace: str = "default") -> Any:
+        future, leader = self._join(key, namespace)
+        if not leader:
+            return future.result()
+        return self._finish(key, future, fn)
+
+    # Asyncio variant: the leader runs the blocking fn() in the loop's default executor and
+    # waiting callers await the shared future.
+    async def do_async(self, key: Hashable, fn: Callable[[], Any], namespace: str = "default") -> Any:
+        future, leader = self._join(key, namespace)
+        if not leader:
+            return await asyncio.wrap_future(future)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._finish, key, future, fn)
+
+    def stats(self, namespace: Optional[str] = None) -> Dict[str, Any]:
+        with self._lock:
+            if namespace is not None:
+                return dict(self._stats.get(namespace, {"executed": 0, "coalesced": 0}))
+            per_namespace = {name: dict(counters) for name, counters in self._stats.items()}
+        return {
+            "executed": sum(c["executed"] for c in per_namespace.values()),
+            "coalesced": sum(c["coalesced"] for c in per_namespace.values()),
+            "by_namespace": per_namespace,
+        }
+
+
+# --- Process-wide Group for Tool Calls ---
+# Shared by every EnhancedBaseTool instance so duplicate tool objects still coalesce.
+tool_call_group = SingleFlight()
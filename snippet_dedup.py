@@ -0,0 +1,201 @@
+# snippet_dedup.py
+
+# --- Near-duplicate Snippet Elimination ---
+# Syndicated news shows up in search results many times with small edits (different outlet, date
+# line or trailing sentence), and an agent repeating or rephrasing a search gets the same snippets
+# again, so the same text reaches the LLM again and again. Each snippet is shingled into word 3-grams and summarized by a
+# MinHash signature; locality-sensitive hashing (banded signatures) finds candidate matches without
+# comparing every pair, and a candidate counts as a duplicate when its estimated Jaccard similarity
+# reaches the threshold. Within one result, near-duplicates of a higher-ranked snippet are dropped;
+# snippets already returned earlier in the same scope (the task whose agent made the call) are
+# dropped as well. Scopes are separate because an agent only sees its own task's tool observations,
+# never the raw snippets another task received. Removed snippets and the estimated tokens saved are
+# counted per run.
+#
+# Configuration (.env):
+#   SNIPPET_DEDUP_ENABLED     - "false" passes search results through unchanged (default true)
+#   SNIPPET_DEDUP_THRESHOLD   - estimated Jaccard similarity at which snippets are duplicates (default 0.6)
+#   SNIPPET_DEDUP_ACROSS_RUN  - "false" only removes duplicates within one result, not snippets
+#                               already returned to the same task (default true)
+
+import os
+import threading
+import zlib
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+
+from context_compaction import estimate_tokens
+from search_cache import normalize_query
+
+DEFAULT_THRESHOLD = 0.6
+SHINGLE_WORDS = 3
+NUM_PERMUTATIONS = 64
+# 16 bands of 4 rows: pairs at Jaccard 0.6 become candidates ~89% of the time, at 0.8 >99.9%.
+LSH_BANDS = 16
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+PERMUTATION_SEED = 1
+
+
+def _env_flag(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None or not value.strip():
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def shingles(text: str, size: int = SHINGLE_WORDS) -> List[str]:
+    words = normalize_query(text).split()
+    if len(words) <= size:
+        return [" ".join(words)] if words else []
+    return [" ".join(words[i:i + size]) for i in range(len(words) - size + 1)]
+
+
+# --- MinHash / LSH ---
+class MinHasher:
+    def __init__(self, num_permutations: int = NUM_PERMUTATIONS, seed: int = PERMUTATION_SEED):
+        generator = np.random.RandomState(seed)
+        self.num_permutations = num_permutations
+        self._a = generator.randint(1, int(MERSENNE_PRIME), size=num_permutations, dtype=np.uint64)
+        self._b = generator.randint(0, int(MERSENNE_PRIME), size=num_permutations, dtype=np.uint64)
+
+    # Minimum of each universal hash permutation over the text's shingles; None for empty text.
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        hashed = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in set(shingles(text))), dtype=np.uint64)
+        if not hashed.size:
+            return None
+        permuted = ((np.outer(hashed, self._a) + self._b) % MERSENNE_PRIME) & MAX_HASH
+        return permuted.min(axis=0)
+
+
+class LSHIndex:
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD, bands: int = LSH_BANDS):
+        self.threshold = threshold
+        self.bands = bands
+        self._buckets: List[Dict[bytes, List[int]]] = [{} for _ in range(bands)]
+        self._signatures: List[np.ndarray] = []
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [band.tobytes() for band in signature.reshape(self.bands, -1)]
+
+    # Index of the most similar stored signature at or above the threshold, or None.
+    def match(self, signature: np.ndarray) -> Optional[int]:
+        candidates = set()
+        for buckets, key in zip(self._buckets, self._band_keys(signature)):
+            candidates.update(buckets.get(key, ()))
+        best, best_similarity = None, self.threshold
+        for candidate in candidates:
+            similarity = float(np.mean(self._signatures[candidate] == signature))
+            if similarity >= best_similarity:
+                best, best_similarity = candidate, similarity
+        return best
+
+    def add(self, signature: np.ndarray) -> int:
+        position = len(self._signatures)
+        self._signatures.append(signature)
+        for buckets, key in zip(self._buckets, self._band_keys(signature)):
+            buckets.setdefault(key, []).append(position)
+        return position
+
+
+@dataclass
+class DedupResult:
+    # Positions of the snippets to keep, in their original order.
+    kept: List[int] = field(default_factory=list)
+    near_duplicates: List[int] = field(default_factory=list)
+    already_seen: List[int] = field(default_factory=list)
+    tokens_saved: int = 0
+    # True when every snippet was already seen and `kept` holds repeats (filter's min_kept).
+    repeats_kept: bool = False
+
+
+class SnippetDeduplicator:
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD, across_run: bool = True, enabled: bool = True):
+        self.threshold = threshold
+        self.across_run = across_run
+        self.enabled = enabled
+        self._hasher = MinHasher()
+        self._lock = threading.Lock()
+        self.start_run()
+
+    @classmethod
+    def from_env(cls) -> "SnippetDeduplicator":
+        return cls(
+            threshold=float(os.getenv("SNIPPET_DEDUP_THRESHOLD", DEFAULT_THRESHOLD)),
+            across_run=_env_flag("SNIPPET_DEDUP_ACROSS_RUN", True),
+            enabled=_env_flag("SNIPPET_DEDUP_ENABLED", True),
+        )
+
+    # Forgets the snippets seen so far and resets the per-run counters.
+    def start_run(self) -> None:
+        with self._lock:
+            self._seen: Dict[Optional[str], LSHIndex] = {}
+            self._stats = {"results": 0, "snippets": 0, "near_duplicates": 0, "already_seen": 0, "tokens_saved": 0}
+
+    # Decides which of a result's snippets (best first) to keep. `rendered` is the text each snippet
+    # would occupy in the tool output (default the snippet itself) and is used for the token estimate.
+    # `scope` names whose earlier results count as already seen (e.g. the calling task). When every
+    # snippet was already seen, the first `min_kept` of them are kept anyway.
+    def filter(self, snippets: List[str], rendered: Optional[List[str]] = None,
+               scope: Optional[str] = None, min_kept: int = 0) -> DedupResult:
+        rendered = rendered or snippets
+        result = DedupResult()
+        if not self.enabled:
+            result.kept = list(range(len(snippets)))
+            return result
+        signatures = [self._hasher.signature(snippet) for snippet in snippets]
+        local = LSHIndex(self.threshold)
+        with self._lock:
+            seen = self._seen.setdefault(scope, LSHIndex(self.threshold))
+            for position, signature in enumerate(signatures):
+                if signature is None:
+                    result.kept.append(position)
+                elif local.match(signature) is not None:
+                    result.near_duplicates.append(position)
+                elif self.across_run and seen.match(signature) is not None:
+                    result.already_seen.append(position)
+                else:
+                    local.add(signature)
+                    result.kept.append(position)
+            if self.across_run:
+                for position in result.kept:
+                    if signatures[position] is not None:
+                        seen.add(signatures[position])
+            if not result.kept and min_kept > 0:
+                result.kept, result.already_seen = result.already_seen[:min_kept], result.already_seen[min_kept:]
+                result.repeats_kept = bool(result.kept)
+            result.tokens_saved = sum(estimate_tokens(rendered[position])
+                                      for position in result.near_duplicates + result.already_seen)
+            self._stats["results"] += 1
+            self._stats["snippets"] += len(snippets)
+            self._stats["near_duplicates"] += len(result.near_duplicates)
+            self._stats["already_seen"] += len(result.already_seen)
+            self._stats["tokens_saved"] += result.tokens_saved
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["distinct_snippets"] = sum(len(seen) for seen in self._seen.values())
+        removed = stats["near_duplicates"] + stats["already_seen"]
+        stats["removed_rate"] = round(removed / stats["snippets"], 3) if stats["snippets"] else 0.0
+        return stats
+
+
+# --- Process-wide Instance ---
+_shared_dedup: Optional[SnippetDeduplicator] = None
+_shared_dedup_lock = threading.Lock()
+
+
+def get_snippet_dedup() -> SnippetDeduplicator:
+    global _shared_dedup
+    if _shared_dedup is None:
+        with _shared_dedup_lock:
+            if _shared_dedup is None:
+                _shared_dedup = SnippetDeduplicator.from_env()
+    return _shared_dedup
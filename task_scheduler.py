@@ -0,0 +1,270 @@
+# task_scheduler.py
+
+# --- Dependency-Aware Task Scheduler ---
+# Runs the tasks of a Crew as a DAG built from each Task's `context=[...]` list instead of
+# strictly one after another. Tasks whose upstream context is complete run concurrently
+# (bounded by a configurable limit), while the returned result keeps the declared task order
+# so downstream report formatting (format_to_text) sees the same shape as crew.kickoff().
+# With a CheckpointStore, every completed task output is persisted; on a resumed run, tasks whose
+# checkpoint is still valid are restored instead of executed. With a ContextCompactor, the upstream
+# context handed to each task is kept within that task's token budget. With a RunTelemetry, per-task
+# and per-agent timings, LLM calls, tokens and tool calls are recorded. With a ToolPrecomputer, tool
+# results that follow from the kickoff inputs are computed at kickoff and appended to the context of
+# their task. An on_task_complete callback is invoked for every finished (or restored) task as soon
+# as it completes.
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Any, List, Optional
+
+from run_context import task_scope
+
+# Separator crewai uses when aggregating the raw outputs of context tasks.
+CONTEXT_DIVIDER = "\n\n----------\n\n"
+DEFAULT_MAX_CONCURRENCY = 3
+
+
+# --- Result Container ---
+# Mirrors the attributes of crewai's CrewOutput that the rest of the script relies on.
+@dataclass
+class ScheduledCrewOutput:
+    raw: str = ""
+    tasks_output: List[Any] = field(default_factory=list)
+    usage_metrics: Dict[str, Any] = field(default_factory=dict)
+    token_usage: Any = None
+
+    def __str__(self) -> str:
+        return self.raw
+
+
+def task_label(task: Any) -> str:
+    """Returns a short human-readable label for a task (its name or first sentence)."""
+    name = getattr(task, "name", None)
+    if name:
+        return name
+    return (getattr(task, "description", "") or "Unnamed Task").split(".")[0].strip()[:80]
+
+
+# --- Dependency Graph ---
+# Maps each task index to the indexes of the tasks it depends on.
+# An explicit context list (including an empty one) is taken as-is; a task without a
+# declared context depends on every earlier task, matching crewai's sequential semantics.
+def build_dependency_graph(tasks: List[Any]) -> Dict[int, List[int]]:
+    index_by_id = {id(task): i for i, task in enumerate(tasks)}
+    graph: Dict[int, List[int]] = {}
+    for i, task in enumerate(tasks):
+        context = getattr(task, "context", None)
+        if isinstance(context, list):
+            upstream = []
+            for context_task in context:
+                if id(context_task) not in index_by_id:
+                    raise ValueError(f"Task '{task_label(task)}' uses context from '{task_label(context_task)}', which is not part of the crew.")
+                upstream.append(index_by_id[id(context_task)])
+            graph[i] = sorted(set(upstream))
+        else:
+            graph[i] = list(range(i))
+    return graph
+
+
+# Groups task indexes into stages; every task in a stage only depends on earlier stages.
+# Raises ValueError if the context references form a cycle.
+def execution_stages(graph: Dict[int, List[int]]) -> List[List[int]]:
+    remaining = {i: set(deps) for i, deps in graph.items()}
+    stages: List[List[int]] = []
+    while remaining:
+        ready = sorted(i for i, deps in remaining.items() if not deps)
+        if not ready:
+            raise ValueError(f"Task context dependencies contain a cycle between tasks {sorted(remaining)}.")
+        stages.append(ready)
+        for i in ready:
+            del remaining[i]
+        for deps in remaining.values():
+            deps.difference_update(ready)
+    return stages
+
+
+class DependencyScheduler:
+    # max_concurrency defaults to the CREW_MAX_CONCURRENT_TASKS environment variable.
+    # `checkpoints` is a CheckpointStore (or None to disable); `resume` reuses valid checkpoints.
+    # `compactor` is a ContextCompactor (or None to pass upstream context through unchanged).
+    # `telemetry` is a RunTelemetry (or None to disable metrics).
+    # `precomputer` is a ToolPrecomputer (or None to leave every tool call to the agents).
+    # `on_task_complete(index, task, output)` runs on the scheduling thread, one task at a time, in
+    # completion order; exceptions it raises are reported and do not stop the run.
+    def __init__(self, max_concurrency: Optional[int] = None, verbose: bool = True,
+                 checkpoints: Optional[Any] = None, resume: bool = False, compactor: Optional[Any] = None,
+                 telemetry: Optional[Any] = None, on_task_complete: Optional[Callable[[int, Any, Any], None]] = None,
+                 precomputer: Optional[Any] = None):
+        if max_concurrency is None:
+            max_concurrency = int(os.getenv("CREW_MAX_CONCURRENT_TASKS", DEFAULT_MAX_CONCURRENCY))
+        if max_concurrency < 1:
+            raise ValueError(f"max_concurrency must be at least 1, got {max_concurrency}.")
+        self.max_concurrency = max_concurrency
+        self.verbose = verbose
+        self.checkpoints = checkpoints
+        self.resume = resume
+        self.compactor = compactor
+        self.telemetry = telemetry
+        self.on_task_complete = on_task_complete
+        self.precomputer = precomputer
+        self._inputs: Optional[Dict[str, Any]] = None
+        self.resumed_tasks: List[str] = []
+        # Keys of the checkpoints written or restored by the last kickoff.
+        self.checkpoint_keys: List[str] = []
+
+    def kickoff(self, crew: Any, inputs: Optional[Dict[str, Any]] = None) -> ScheduledCrewOutput:
+        tasks = list(crew.tasks)
+        if not tasks:
+            raise ValueError("Crew has no tasks to execute.")
+        graph = build_dependency_graph(tasks)
+        stages = execution_stages(graph)
+        if self.verbose:
+            print(f"Scheduling {len(tasks)} tasks in {len(stages)} stages (max {self.max_concurrency} concurrent):")
+            for n, stage in enumerate(stages, start=1):
+                print(f"  Stage {n}: {', '.join(task_label(tasks[i]) for i in stage)}")
+
+        self._inputs = inputs
+        self.resumed_tasks = []
+        self.checkpoint_keys = []
+        self._prepare_crew(crew, inputs)
+        if self.telemetry is not None:
+            self.telemetry.attach(crew)
+        if self.precomputer is not None:
+            self.precomputer.start(tasks, inputs)
+        try:
+            outputs = self._run_graph(crew, tasks, graph)
+        finally:
+            if self.precomputer is not None:
+                self.precomputer.close()
+            if self.telemetry is not None:
+                self.telemetry.detach()
+        return self._build_output(crew, [outputs[i] for i in range(len(tasks))])
+
+    # Performs the same per-run setup crew.kickoff() does before executing tasks.
+    def _prepare_crew(self, crew: Any, inputs: Optional[Dict[str, Any]]) -> None:
+        if inputs is not None:
+            crew._inputs = inputs
+            crew._interpolate_inputs(inputs)
+        if hasattr(crew, "_set_tasks_callbacks"):
+            crew._set_tasks_callbacks()
+        for agent in crew.agents:
+            agent.crew = crew
+            if hasattr(agent, "set_knowledge"):
+                agent.set_knowledge(crew_embedder=getattr(crew, "embedder", None))
+            if hasattr(agent, "function_calling_llm") and not agent.function_calling_llm:
+                agent.function_calling_llm = getattr(crew, "function_calling_llm", None)
+            if hasattr(agent, "step_callback") and not agent.step_callback:
+                agent.step_callback = getattr(crew, "step_callback", None)
+            agent.create_agent_executor()
+
+    # Submits tasks as their dependencies complete. Ready tasks are started in declared order,
+    # and two tasks assigned to the same agent never run at the same time because an agent
+    # keeps a single executor per run.
+    def _run_graph(self, crew: Any, tasks: List[Any], graph: Dict[int, List[int]]) -> Dict[int, Any]:
+        pending = {i: set(deps) for i, deps in graph.items()}
+        outputs: Dict[int, Any] = {}
+        running: Dict[Any, int] = {}
+        busy_agents = set()
+
+        executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="crew-task")
+        try:
+            while pending or running:
+                for i in sorted(i for i, deps in pending.items() if not deps):
+                    if len(running) >= self.max_concurrency:
+                        break
+                    agent_id = id(tasks[i].agent)
+                    if agent_id in busy_agents:
+                        continue
+                    busy_agents.add(agent_id)
+                    del pending[i]
+                    upstream = [tasks[j] for j in graph[i]]
+                    running[executor.submit(self._run_task, crew, tasks[i], upstream)] = i
+
+                if not running:
+                    raise RuntimeError("Task scheduler stalled with unfinished tasks; check task context dependencies.")
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    i = running.pop(future)
+                    busy_agents.discard(id(tasks[i].agent))
+                    outputs[i] = future.result()
+                    for deps in pending.values():
+                        deps.discard(i)
+                    self._notify_complete(i, tasks[i], outputs[i])
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+        return outputs
+
+    def _notify_complete(self, index: int, task: Any, output: Any) -> None:
+        if self.on_task_complete is None:
+            return
+        try:
+            self.on_task_complete(index, task, output)
+        except Exception as e:
+            print(f"Warning: Task completion callback failed for '{task_label(task)}': {type(e).__name__}: {e}")
+
+    # Runs one task inside a task scope so shared components (e.g. the LLM cache) can attribute work to it.
+    def _run_task(self, crew: Any, task: Any, upstream: List[Any]) -> Any:
+        label = task_label(task)
+        with task_scope(label):
+            if self.telemetry is None:
+                return self._execute_task(crew, task, upstream)
+            with self.telemetry.track_task(label, getattr(task.agent, "role", None)) as record:
+                output = self._execute_task(crew, task, upstream)
+                record["resumed"] = label in self.resumed_tasks
+                return output
+
+    def _execute_task(self, crew: Any, task: Any, upstream: List[Any]) -> Any:
+        agent = task.agent
+        if agent is None:
+            raise ValueError(f"No agent assigned to task '{task_label(task)}'.")
+        upstream_outputs = [t.output for t in upstream if getattr(t, "output", None) is not None]
+        if self.resume and self.checkpoints is not None:
+            restored = self.checkpoints.load(task, self._inputs, upstream_outputs)
+            if restored is not None:
+                task.output = restored
+                self.resumed_tasks.append(task_label(task))
+                self.checkpoint_keys.append(self.checkpoints.checkpoint_key(task, self._inputs, upstream_outputs))
+                print(f"Resumed task from checkpoint: {task_label(task)}")
+                return restored
+        if self.verbose:
+            print(f"[{threading.current_thread().name}] Starting task: {task_label(task)}")
+
+        # Task tools take precedence over agent tools; the crew adds delegation tools where allowed.
+        tools = task.tools or agent.tools or []
+        if hasattr(crew, "_prepare_tools"):
+            tools = crew._prepare_tools(agent, task, tools)
+        upstream_texts = [output.raw for output in upstream_outputs]
+        if self.compactor is not None:
+            context = self.compactor.compact(task, upstream_texts, CONTEXT_DIVIDER, label=task_label(task))
+        else:
+            context = CONTEXT_DIVIDER.join(upstream_texts)
+        # Precomputed tool results are appended after compaction so they always reach the agent intact.
+        precomputed = self.precomputer.context_for(task) if self.precomputer is not None else ""
+        if precomputed:
+            context = f"{context}{CONTEXT_DIVIDER}{precomputed}" if context else precomputed
+
+        task_output = task.execute_sync(agent=agent, context=context, tools=tools)
+        if hasattr(crew, "_process_task_result"):
+            crew._process_task_result(task, task_output)
+        if self.checkpoints is not None:
+            try:
+                self.checkpoint_keys.append(self.checkpoints.save(task, self._inputs, upstream_outputs, task_output))
+            except OSError as e:
+                print(f"Warning: Could not write checkpoint for task '{task_label(task)}': {e}")
+        if self.verbose:
+            print(f"[{threading.current_thread().name}] Finished task: {task_label(task)}")
+        return task_output
+
+    def _build_output(self, crew: Any, task_outputs: List[Any]) -> ScheduledCrewOutput:
+        token_usage = crew.calculate_usage_metrics() if hasattr(crew, "calculate_usage_metrics") else None
+        usage_metrics = token_usage.model_dump() if hasattr(token_usage, "model_dump") else {}
+        final_output = next((o for o in reversed(task_outputs) if getattr(o, "raw", None)), None)
+        return ScheduledCrewOutput(
+            raw=final_output.raw if final_output else "",
+            tasks_output=task_outputs,
+            usage_metrics=usage_metrics,
+            token_usage=token_usage,
+        )
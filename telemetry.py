@@ -0,0 +1,324 @@
+# telemetry.py
+
+# --- Run Telemetry ---
+# Records, for one crew run, the wall time, LLM call count, prompt/completion tokens and tool calls
+# per task and per agent, and exports them as a JSON sidecar and a Prometheus text-format file.
+#
+# Attribution relies on the task scope set by the scheduler (run_context): LLM and tool events and
+# token callbacks run synchronously in the thread executing the task, so work done by a delegated
+# coworker is counted under the delegating task and the coworker's agent. Agent wall time is
+# inclusive (an agent waiting on a delegated coworker keeps accumulating time).
+#
+# Configuration (.env):
+#   TELEMETRY_ENABLED       - "false" disables telemetry files (default true)
+#   TELEMETRY_TEXTFILE_DIR  - optional node exporter textfile collector directory; the latest run per
+#                             company is also written there as crew_analysis_<company>.prom
+
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from run_context import current_task
+
+COUNTERS = ("llm_calls", "llm_errors", "prompt_tokens", "completion_tokens", "cached_prompt_tokens",
+            "tool_calls", "tool_errors")
+OUTSIDE_TASK = "(outside task)"
+UNKNOWN_AGENT = "(unknown agent)"
+
+# (metric suffix, help text) for the counters exported per task and per agent.
+PROMETHEUS_COUNTERS = (
+    ("llm_calls", "LLM calls made"),
+    ("llm_errors", "LLM calls that failed"),
+    ("prompt_tokens", "Prompt tokens consumed"),
+    ("completion_tokens", "Completion tokens produced"),
+    ("tool_calls", "Tool calls made"),
+    ("tool_errors", "Tool calls that failed"),
+)
+
+
+def _new_counters() -> Dict[str, float]:
+    return {name: 0 for name in COUNTERS}
+
+
+def _add_counters(target: Dict[str, float], source: Dict[str, float]) -> None:
+    for name in COUNTERS:
+        target[name] += source.get(name, 0)
+
+
+def _escape_label(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(labels: Dict[str, Any]) -> str:
+    return "{" + ",".join(f'{key}="{_escape_label(value)}"' for key, value in labels.items()) + "}"
+
+
+def _write_atomic(path: str, content: str) -> None:
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        f.write(content)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+# Forwards everything to crewai's TokenProcess and reports token counts to the active telemetry.
+class _RecordingTokenProcess:
+    def __init__(self, inner: Any, agent_role: str):
+        self._inner = inner
+        self._agent_role = agent_role
+
+    def sum_prompt_tokens(self, tokens: int) -> None:
+        self._inner.sum_prompt_tokens(tokens)
+        _record(self._agent_role, "prompt_tokens", tokens)
+
+    def sum_completion_tokens(self, tokens: int) -> None:
+        self._inner.sum_completion_tokens(tokens)
+        _record(self._agent_role, "completion_tokens", tokens)
+
+    def sum_cached_prompt_tokens(self, tokens: int) -> None:
+        self._inner.sum_cached_prompt_tokens(tokens)
+        _record(self._agent_role, "cached_prompt_tokens", tokens)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._inner, name)
+
+
+class RunTelemetry:
+    def __init__(self, labels: Optional[Dict[str, Any]] = None):
+        self.labels = dict(labels or {})
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, str], Dict[str, float]] = {}
+        self._tools: Dict[Tuple[str, str, str], Dict[str, int]] = {}
+        self._tasks: Dict[str, Dict[str, Any]] = {}
+        self._agent_wall: Dict[str, float] = {}
+        self._agent_starts: Dict[Tuple[int, int], List[float]] = {}
+        self._llm_agents: Dict[int, str] = {}
+        self.started_at: Optional[str] = None
+        self.finished_at: Optional[str] = None
+        self._started = 0.0
+        self.wall_seconds = 0.0
+
+    # --- Lifecycle ---
+    # Starts recording for the crew's agents; called by the scheduler before any task runs.
+    def attach(self, crew: Any) -> None:
+        global _active
+        _register_event_handlers()
+        for agent in crew.agents:
+            role = getattr(agent, "role", None) or UNKNOWN_AGENT
+            process = getattr(agent, "_token_process", None)
+            if isinstance(process, _RecordingTokenProcess):
+                process._agent_role = role
+            elif process is not None:
+                agent._token_process = _RecordingTokenProcess(process, role)
+            if getattr(agent, "llm", None) is not None:
+                self._llm_agents[id(agent.llm)] = role
+        self.started_at = datetime.now().isoformat()
+        self._started = time.monotonic()
+        _active = self
+
+    def detach(self) -> None:
+        global _active
+        self.wall_seconds = time.monotonic() - self._started
+        self.finished_at = datetime.now().isoformat()
+        if _active is self:
+            _active = None
+
+    @contextmanager
+    def track_task(self, label: str, agent_role: Optional[str]) -> Iterator[Dict[str, Any]]:
+        record = {"agent": agent_role or UNKNOWN_AGENT, "status": "running", "resumed": False}
+        with self._lock:
+            self._tasks[label] = record
+        started = time.monotonic()
+        try:
+            yield record
+            record["status"] = "succeeded"
+        except BaseException:
+            record["status"] = "failed"
+            raise
+        finally:
+            record["wall_seconds"] = round(time.monotonic() - started, 3)
+
+    # --- Recording ---
+    def record(self, agent_role: Optional[str], counter: str, amount: float = 1) -> None:
+        key = (current_task() or OUTSIDE_TASK, agent_role or UNKNOWN_AGENT)
+        with self._lock:
+            self._counters.setdefault(key, _new_counters())[counter] += amount
+
+    def record_tool(self, agent_role: Optional[str], tool_name: str, error: bool = False) -> None:
+        self.record(agent_role, "tool_errors" if error else "tool_calls")
+        key = (current_task() or OUTSIDE_TASK, agent_role or UNKNOWN_AGENT, tool_name)
+        with self._lock:
+            counters = self._tools.setdefault(key, {"calls": 0, "errors": 0})
+            counters["errors" if error else "calls"] += 1
+
+    def agent_started(self, agent: Any) -> None:
+        with self._lock:
+            self._agent_starts.setdefault((threading.get_ident(), id(agent)), []).append(time.monotonic())
+
+    def agent_finished(self, agent: Any) -> None:
+        role = getattr(agent, "role", None) or UNKNOWN_AGENT
+        with self._lock:
+            starts = self._agent_starts.get((threading.get_ident(), id(agent)))
+            if starts:
+                self._agent_wall[role] = self._agent_wall.get(role, 0.0) + time.monotonic() - starts.pop()
+
+    def llm_agent(self, llm: Any) -> str:
+        return self._llm_agents.get(id(llm), UNKNOWN_AGENT)
+
+    # --- Export ---
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = {key: dict(values) for key, values in self._counters.items()}
+            tools = {key: dict(values) for key, values in self._tools.items()}
+            tasks = {label: dict(record) for label, record in self._tasks.items()}
+            agent_wall = dict(self._agent_wall)
+
+        totals = _new_counters()
+        task_rows: Dict[str, Dict[str, Any]] = {}
+        agent_rows: Dict[str, Dict[str, Any]] = {}
+        for label, record in tasks.items():
+            task_rows[label] = {**record, **_new_counters(), "agents": {}, "tools": {}}
+        for (task, agent), values in counters.items():
+            task_row = task_rows.setdefault(task, {"agent": None, "status": None, **_new_counters(), "agents": {}, "tools": {}})
+            agent_row = agent_rows.setdefault(agent, {"wall_seconds": round(agent_wall.get(agent, 0.0), 3), **_new_counters(), "tools": {}})
+            _add_counters(task_row, values)
+            _add_counters(agent_row, values)
+            _add_counters(task_row["agents"].setdefault(agent, _new_counters()), values)
+            _add_counters(totals, values)
+        for (task, agent, tool), values in tools.items():
+            for row in (task_rows[task]["tools"], agent_rows[agent]["tools"]):
+                entry = row.setdefault(tool, {"calls": 0, "errors": 0})
+                entry["calls"] += values["calls"]
+                entry["errors"] += values["errors"]
+        for agent, seconds in agent_wall.items():
+            agent_rows.setdefault(agent, {"wall_seconds": round(seconds, 3), **_new_counters(), "tools": {}})
+
+        return {
+            "run": {**self.labels, "started_at": self.started_at, "finished_at": self.finished_at,
+                    "wall_seconds": round(self.wall_seconds, 3)},
+            "totals": totals,
+            "tasks": task_rows,
+            "agents": agent_rows,
+        }
+
+    def to_prometheus(self) -> str:
+        data = self.snapshot()
+        with self._lock:
+            tools = sorted(self._tools.items())
+        base = {key: value for key, value in self.labels.items() if value is not None}
+        lines: List[str] = []
+
+        def metric(name: str, help_text: str, samples: List[Tuple[Dict[str, Any], float]]) -> None:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            for labels, value in samples:
+                lines.append(f"{name}{_format_labels({**base, **labels})} {value}")
+
+        metric("crew_run_wall_seconds", "Wall time of the crew run in seconds.", [({}, data["run"]["wall_seconds"])])
+        metric("crew_run_finished_timestamp_seconds", "Unix time the crew run finished.", [({}, round(time.time(), 3))])
+        metric("crew_task_wall_seconds", "Wall time of each task in seconds.",
+               [({"task": task, "agent": row.get("agent") or UNKNOWN_AGENT, "status": row.get("status") or "unknown"},
+                 row.get("wall_seconds", 0)) for task, row in data["tasks"].items()])
+        for counter, help_text in PROMETHEUS_COUNTERS:
+            metric(f"crew_task_{counter}", f"{help_text} per task.",
+                   [({"task": task}, row[counter]) for task, row in data["tasks"].items()])
+        metric("crew_agent_wall_seconds", "Inclusive execution time of each agent in seconds.",
+               [({"agent": agent}, row["wall_seconds"]) for agent, row in data["agents"].items()])
+        for counter, help_text in PROMETHEUS_COUNTERS:
+            metric(f"crew_agent_{counter}", f"{help_text} per agent.",
+                   [({"agent": agent}, row[counter]) for agent, row in data["agents"].items()])
+        metric("crew_tool_calls", "Tool calls per task, agent and tool.",
+               [({"task": task, "agent": agent, "tool": tool}, values["calls"])
+                for (task, agent, tool), values in tools])
+        return "\n".join(lines) + "\n"
+
+    # Writes <report>.metrics.json and <report>.prom next to the report and returns their paths.
+    def write(self, report_path: str) -> List[str]:
+        base = os.path.splitext(report_path)[0]
+        paths = [f"{base}.metrics.json", f"{base}.prom"]
+        _write_atomic(paths[0], json.dumps(self.snapshot(), indent=2, default=str))
+        prometheus_text = self.to_prometheus()
+        _write_atomic(paths[1], prometheus_text)
+        textfile_dir = os.getenv("TELEMETRY_TEXTFILE_DIR")
+        if textfile_dir:
+            company = re.sub(r"[^a-z0-9]+", "_", str(self.labels.get("company", "analysis")).lower()).strip("_")
+            paths.append(os.path.join(textfile_dir, f"crew_analysis_{company or 'analysis'}.prom"))
+            _write_atomic(paths[-1], prometheus_text)
+        return paths
+
+    @classmethod
+    def from_env(cls, labels: Optional[Dict[str, Any]] = None) -> Optional["RunTelemetry"]:
+        if os.getenv("TELEMETRY_ENABLED", "true").strip().lower() in ("0", "false", "no", "off"):
+            return None
+        return cls(labels)
+
+
+# --- Event Wiring ---
+# crewai's event bus is process-wide, so handlers are registered once and forward to the run
+# currently attached (one run per process at a time; batch mode uses one process per job).
+_active: Optional[RunTelemetry] = None
+_handlers_registered = False
+_handlers_lock = threading.Lock()
+
+
+def _record(agent_role: Optional[str], counter: str, amount: float = 1) -> None:
+    telemetry = _active
+    # Token callbacks litellm replays from its own logging threads carry no task scope; only the
+    # synchronous callback made by the LLM call itself is counted.
+    if telemetry is not None and current_task() is not None:
+        telemetry.record(agent_role, counter, amount)
+
+
+def _register_event_handlers() -> None:
+    global _handlers_registered
+    with _handlers_lock:
+        if _handlers_registered:
+            return
+        from crewai.utilities.events import crewai_event_bus
+        from crewai.utilities.events.agent_events import (
+            AgentExecutionCompletedEvent, AgentExecutionErrorEvent, AgentExecutionStartedEvent,
+        )
+        from crewai.utilities.events.llm_events import LLMCallCompletedEvent, LLMCallFailedEvent
+        from crewai.utilities.events.tool_usage_events import ToolUsageErrorEvent, ToolUsageFinishedEvent
+
+        def on_llm_completed(source: Any, event: Any) -> None:
+            if _active is not None:
+                _record(_active.llm_agent(source), "llm_calls")
+
+        def on_llm_failed(source: Any, event: Any) -> None:
+            if _active is not None:
+                _record(_active.llm_agent(source), "llm_errors")
+
+        def on_tool_finished(source: Any, event: Any) -> None:
+            if _active is not None and current_task() is not None:
+                _active.record_tool(event.agent_role, event.tool_name)
+
+        def on_tool_error(source: Any, event: Any) -> None:
+            if _active is not None and current_task() is not None:
+                _active.record_tool(event.agent_role, event.tool_name, error=True)
+
+        def on_agent_started(source: Any, event: Any) -> None:
+            if _active is not None:
+                _active.agent_started(event.agent)
+
+        def on_agent_finished(source: Any, event: Any) -> None:
+            if _active is not None:
+                _active.agent_finished(event.agent)
+
+        crewai_event_bus.register_handler(LLMCallCompletedEvent, on_llm_completed)
+        crewai_event_bus.register_handler(LLMCallFailedEvent, on_llm_failed)
+        crewai_event_bus.register_handler(ToolUsageFinishedEvent, on_tool_finished)
+        crewai_event_bus.register_handler(ToolUsageErrorEvent, on_tool_error)
+        crewai_event_bus.register_handler(AgentExecutionStartedEvent, on_agent_started)
+        crewai_event_bus.register_handler(AgentExecutionCompletedEvent, on_agent_finished)
+        crewai_event_bus.register_handler(AgentExecutionErrorEvent, on_agent_finished)
+        _handlers_registered = True
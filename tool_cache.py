@@ -0,0 +1,164 @@
+# tool_cache.py
+
+# --- Tool Result Memoization ---
+# Every agent gets its own tool instances, so the same pure tool is called with the same input many
+# times per run (and across runs in a batch). EnhancedBaseTool declares a cache policy per tool:
+# "pure" results depend only on the input and are kept until evicted, "ttl" results are kept for
+# the tool's cache_ttl_seconds (default TOOL_CACHE_TTL_SECONDS), and "none" tools are always
+# executed. Results of cacheable tools go into one process-wide LRU shared by every instance, keyed
+# on the tool's cache namespace and normalized input and bounded both by entry count and by the
+# approximate bytes held. Error results are never cached. Hits, misses and evictions are counted
+# per tool.
+#
+# Configuration (.env):
+#   TOOL_CACHE_ENABLED      - "false" executes every tool call (default true)
+#   TOOL_CACHE_MAX_ENTRIES  - results kept across all tools (default 2048)
+#   TOOL_CACHE_MAX_MB       - approximate memory cap for cached results in MB (default 32)
+#   TOOL_CACHE_TTL_SECONDS  - lifetime of "ttl" results without their own TTL (default 300)
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+CACHE_POLICIES = ("pure", "ttl", "none")
+DEFAULT_MAX_ENTRIES = 2048
+DEFAULT_MAX_MB = 32.0
+DEFAULT_TTL_SECONDS = 300.0
+# Separates the tool name from what else a tool's results depend on (e.g. its data file) in a namespace.
+NAMESPACE_SEPARATOR = "|"
+
+
+def _env_flag(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None or not value.strip():
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+class ToolResultCache:
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, max_bytes: int = int(DEFAULT_MAX_MB * 1024 * 1024),
+                 default_ttl_seconds: float = DEFAULT_TTL_SECONDS, enabled: bool = True):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.default_ttl_seconds = default_ttl_seconds
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        # (namespace, key) -> (result, expires_at or None, size in bytes); least recently used first.
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[str, Optional[float], int]]" = OrderedDict()
+        self._bytes = 0
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    @classmethod
+    def from_env(cls) -> "ToolResultCache":
+        return cls(
+            max_entries=int(os.getenv("TOOL_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)),
+            max_bytes=int(float(os.getenv("TOOL_CACHE_MAX_MB", DEFAULT_MAX_MB)) * 1024 * 1024),
+            default_ttl_seconds=float(os.getenv("TOOL_CACHE_TTL_SECONDS", DEFAULT_TTL_SECONDS)),
+            enabled=_env_flag("TOOL_CACHE_ENABLED", True),
+        )
+
+    def _counters(self, namespace: str) -> Dict[str, int]:
+        return self._stats.setdefault(namespace, {"hits": 0, "misses": 0, "expired": 0, "evictions": 0})
+
+    def _remove(self, entry_key: Tuple[str, str]) -> None:
+        _, _, size = self._entries.pop(entry_key)
+        self._bytes -= size
+
+    # Returns the cached result, or None on a miss (expired results count as misses).
+    def get(self, namespace: str, key: str) -> Optional[str]:
+        entry_key = (namespace, key)
+        with self._lock:
+            counters = self._counters(namespace)
+            entry = self._entries.get(entry_key)
+            if entry is not None and entry[1] is not None and entry[1] <= time.monotonic():
+                self._remove(entry_key)
+                counters["expired"] += 1
+                entry = None
+            if entry is None:
+                counters["misses"] += 1
+                return None
+            self._entries.move_to_end(entry_key)
+            counters["hits"] += 1
+            return entry[0]
+
+    # Stores a result; ttl_seconds None keeps it until evicted. Results larger than the whole
+    # memory cap are not stored.
+    def put(self, namespace: str, key: str, result: str, ttl_seconds: Optional[float] = None) -> None:
+        size = len(result.encode("utf-8")) + len(key.encode("utf-8")) + len(namespace.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        expires_at = time.monotonic() + ttl_seconds if ttl_seconds is not None else None
+        entry_key = (namespace, key)
+        with self._lock:
+            if entry_key in self._entries:
+                self._remove(entry_key)
+            self._entries[entry_key] = (result, expires_at, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                evicted = next(iter(self._entries))
+                self._remove(evicted)
+                self._counters(evicted[0])["evictions"] += 1
+
+    # Cached result for a call under `policy`, computing and storing it on a miss. Results for
+    # which `is_error` is true are returned but not cached.
+    def get_or_compute(self, namespace: str, key: str, policy: str, compute: Callable[[], str],
+                       is_error: Callable[[Any], bool], ttl_seconds: Optional[float] = None) -> str:
+        if not self.enabled or policy not in ("pure", "ttl"):
+            return compute()
+        cached = self.get(namespace, key)
+        if cached is not None:
+            return cached
+        result = compute()
+        if isinstance(result, str) and not is_error(result):
+            if policy == "ttl" and ttl_seconds is None:
+                ttl_seconds = self.default_ttl_seconds
+            self.put(namespace, key, result, ttl_seconds if policy == "ttl" else None)
+        return result
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self._stats = {}
+
+    # Counters for one tool (all tools when None) plus the shared cache's totals.
+    def stats(self, tool_name: Optional[str] = None) -> Dict[str, Any]:
+        def matches(namespace: str) -> bool:
+            return tool_name is None or namespace.split(NAMESPACE_SEPARATOR, 1)[0] == tool_name
+
+        with self._lock:
+            totals = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0}
+            entries = sum(1 for namespace, _ in self._entries if matches(namespace))
+            for namespace, counters in self._stats.items():
+                if matches(namespace):
+                    for name, value in counters.items():
+                        totals[name] += value
+            stats = dict(totals, entries=entries, shared_entries=len(self._entries),
+                         shared_bytes=self._bytes, max_entries=self.max_entries, max_bytes=self.max_bytes)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else None
+        return stats
+
+
+# --- Process-wide Instance ---
+_shared_cache: Optional[ToolResultCache] = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_tool_cache() -> ToolResultCache:
+    global _shared_cache
+    if _shared_cache is None:
+        with _shared_cache_lock:
+            if _shared_cache is None:
+                _shared_cache = ToolResultCache.from_env()
+    return _shared_cache
+
+
+# Replaces the process-wide cache (None recreates it from the environment); returns the previous one.
+def set_tool_cache(cache: Optional[ToolResultCache]) -> Optional[ToolResultCache]:
+    global _shared_cache
+    with _shared_cache_lock:
+        previous, _shared_cache = _shared_cache, cache
+    return previous
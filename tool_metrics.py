@@ -0,0 +1,274 @@
+# tool_metrics.py
+
+# --- Tool Call Instrumentation ---
+# Per-tool counters and latency histograms recorded by EnhancedBaseTool around every executed
+# tool call: monotonic wall time of execute_tool_logic, input/output sizes in bytes and the call
+# outcome. Latencies go into fixed log-scale buckets, so p50/p95/p99 are available in constant
+# memory (accurate to within one bucket, ~12%). Stats are kept per tool name and shared by every
+# instance of that tool in the process.
+#
+# An optional sampling profiler runs one call in N under cProfile (a .prof file plus the top
+# functions by cumulative time) or tracemalloc (peak traced memory plus the top allocation sites).
+# Only one call is profiled at a time; a sampled call that finds the profiler busy is skipped.
+#
+# Configuration (.env):
+#   TOOL_PROFILE_EVERY_N  - profile one call in N per tool, 0 disables profiling (default 0)
+#   TOOL_PROFILE_MODE     - "cprofile" or "tracemalloc" (default cprofile)
+#   TOOL_PROFILE_DIR      - directory for cProfile .prof files (default profiles)
+
+import bisect
+import cProfile
+import io
+import os
+import pstats
+import re
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+DEFAULT_PROFILE_DIR = "profiles"
+PROFILE_MODES = ("cprofile", "tracemalloc")
+PROFILE_TOP_ENTRIES = 10
+MAX_PROFILE_SAMPLES = 5
+
+# Bucket upper bounds in seconds: 0.1 ms growing by 12.5% per bucket up to ~10 minutes.
+BUCKET_BOUNDS: List[float] = []
+_bound = 0.0001
+while _bound < 600:
+    BUCKET_BOUNDS.append(round(_bound, 7))
+    _bound *= 1.125
+
+
+class LatencyHistogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(BUCKET_BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.min = seconds if self.min is None else min(self.min, seconds)
+        self.max = seconds if self.max is None else max(self.max, seconds)
+
+    # Upper bound of the bucket holding the q-th quantile, clamped to the observed range.
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        rank = max(1, int(q * self.count + 0.999999))
+        cumulative = 0
+        for i, bucket_count in enumerate(self.counts):
+            cumulative += bucket_count
+            if cumulative >= rank:
+                upper = BUCKET_BOUNDS[i] if i < len(BUCKET_BOUNDS) else self.max
+                return min(max(upper, self.min), self.max)
+        return self.max
+
+    def summary(self) -> Dict[str, Optional[float]]:
+        def seconds(value: Optional[float]) -> Optional[float]:
+            return round(value, 6) if value is not None else None
+        return {
+            "count": self.count,
+            "mean": seconds(self.total / self.count) if self.count else None,
+            "min": seconds(self.min),
+            "p50": seconds(self.percentile(0.50)),
+            "p95": seconds(self.percentile(0.95)),
+            "p99": seconds(self.percentile(0.99)),
+            "max": seconds(self.max),
+        }
+
+
+class ToolMetrics:
+    def __init__(self, tool_name: str):
+        self.tool_name = tool_name
+        self._lock = threading.Lock()
+        self.latency = LatencyHistogram()
+        self.counters = {"calls": 0, "successes": 0, "error_results": 0, "exceptions": 0}
+        self.input_bytes = 0
+        self.output_bytes = 0
+        self.max_input_bytes = 0
+        self.max_output_bytes = 0
+        self.last_error: Optional[str] = None
+        self.profiles: List[Dict[str, Any]] = []
+        self._sequence = 0
+
+    # outcome is "successes", "error_results" (the tool returned an error message) or "exceptions".
+    def record(self, seconds: float, input_bytes: int, output_bytes: int, outcome: str,
+               error: Optional[str] = None) -> None:
+        with self._lock:
+            self.latency.observe(seconds)
+            self.counters["calls"] += 1
+            self.counters[outcome] += 1
+            self.input_bytes += input_bytes
+            self.output_bytes += output_bytes
+            self.max_input_bytes = max(self.max_input_bytes, input_bytes)
+            self.max_output_bytes = max(self.max_output_bytes, output_bytes)
+            if error:
+                self.last_error = error[:200]
+
+    def _next_sequence(self) -> int:
+        with self._lock:
+            self._sequence += 1
+            return self._sequence
+
+    def _add_profile(self, sample: Dict[str, Any]) -> None:
+        with self._lock:
+            self.profiles.append(sample)
+            del self.profiles[:-MAX_PROFILE_SAMPLES]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            calls = self.counters["calls"]
+            return {
+                **self.counters,
+                "success_rate": round(self.counters["successes"] / calls, 4) if calls else None,
+                "latency_seconds": self.latency.summary(),
+                "total_seconds": round(self.latency.total, 6),
+                "input_bytes": {"total": self.input_bytes, "max": self.max_input_bytes,
+                                "mean": round(self.input_bytes / calls, 1) if calls else None},
+                "output_bytes": {"total": self.output_bytes, "max": self.max_output_bytes,
+                                 "mean": round(self.output_bytes / calls, 1) if calls else None},
+                "last_error": self.last_error,
+                "profiles": list(self.profiles),
+            }
+
+
+class SamplingProfiler:
+    def __init__(self, every_n: int = 0, mode: str = "cprofile", directory: str = DEFAULT_PROFILE_DIR):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown tool profile mode '{mode}'; expected one of {', '.join(PROFILE_MODES)}.")
+        self.every_n = every_n
+        self.mode = mode
+        self.directory = directory
+        self._busy = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "SamplingProfiler":
+        return cls(
+            every_n=int(os.getenv("TOOL_PROFILE_EVERY_N", 0)),
+            mode=os.getenv("TOOL_PROFILE_MODE", "cprofile").strip().lower() or "cprofile",
+            directory=os.getenv("TOOL_PROFILE_DIR", DEFAULT_PROFILE_DIR),
+        )
+
+    # Profiles the wrapped call if it is the N-th call of this tool and no other call is being profiled.
+    @contextmanager
+    def maybe_profile(self, metrics: ToolMetrics) -> Iterator[None]:
+        if self.every_n <= 0:
+            yield
+            return
+        sequence = metrics._next_sequence()
+        if sequence % self.every_n != 0 or not self._busy.acquire(blocking=False):
+            yield
+            return
+        try:
+            if self.mode == "tracemalloc":
+                with self._tracemalloc(metrics, sequence):
+                    yield
+            else:
+                with self._cprofile(metrics, sequence):
+                    yield
+        finally:
+            self._busy.release()
+
+    @contextmanager
+    def _cprofile(self, metrics: ToolMetrics, sequence: int) -> Iterator[None]:
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler (e.g. a debugger or an outer cProfile run) is already active.
+            yield
+            return
+        try:
+            yield
+        finally:
+            profiler.disable()
+            buffer = io.StringIO()
+            pstats.Stats(profiler, stream=buffer).sort_stats("cumulative").print_stats(PROFILE_TOP_ENTRIES)
+            sample: Dict[str, Any] = {"call": sequence, "mode": "cprofile", "top": buffer.getvalue().strip().splitlines()[-PROFILE_TOP_ENTRIES:]}
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                safe_name = re.sub(r"[^a-z0-9]+", "_", metrics.tool_name.lower()).strip("_")
+                path = os.path.join(self.directory, f"{safe_name}_{sequence}_{int(time.time())}.prof")
+                profiler.dump_stats(path)
+                sample["path"] = path
+            except OSError as e:
+                print(f"Warning: Could not write tool profile for '{metrics.tool_name}': {e}")
+            metrics._add_profile(sample)
+
+    # tracemalloc traces every thread, so concurrent calls of other tools are included in the sample.
+    @contextmanager
+    def _tracemalloc(self, metrics: ToolMetrics, sequence: int) -> Iterator[None]:
+        already_tracing = tracemalloc.is_tracing()
+        if not already_tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        try:
+            yield
+        finally:
+            _, peak = tracemalloc.get_traced_memory()
+            top = tracemalloc.take_snapshot().statistics("lineno")[:PROFILE_TOP_ENTRIES]
+            if not already_tracing:
+                tracemalloc.stop()
+            metrics._add_profile({
+                "call": sequence,
+                "mode": "tracemalloc",
+                "peak_bytes": peak,
+                "top": [str(stat) for stat in top],
+            })
+
+
+# --- Process-wide Registry ---
+class ToolMetricsRegistry:
+    def __init__(self, profiler: Optional[SamplingProfiler] = None):
+        self._profiler = profiler
+        self._lock = threading.Lock()
+        self._tools: Dict[str, ToolMetrics] = {}
+
+    # Created on first use so settings loaded from .env after import are honoured.
+    @property
+    def profiler(self) -> SamplingProfiler:
+        if self._profiler is None:
+            with self._lock:
+                if self._profiler is None:
+                    self._profiler = SamplingProfiler.from_env()
+        return self._profiler
+
+    def for_tool(self, tool_name: str) -> ToolMetrics:
+        metrics = self._tools.get(tool_name)
+        if metrics is None:
+            with self._lock:
+                metrics = self._tools.setdefault(tool_name, ToolMetrics(tool_name))
+        return metrics
+
+    # Times fn() and records the outcome; `is_error(result)` flags results that report a failure.
+    def measure(self, tool_name: str, input_text: str, fn: Callable[[], Any],
+                is_error: Callable[[Any], bool]) -> Any:
+        metrics = self.for_tool(tool_name)
+        started = time.perf_counter()
+        try:
+            with self.profiler.maybe_profile(metrics):
+                result = fn()
+        except Exception as e:
+            metrics.record(time.perf_counter() - started, len(input_text.encode("utf-8")), 0,
+                           "exceptions", f"{type(e).__name__}: {e}")
+            raise
+        elapsed = time.perf_counter() - started
+        output = result if isinstance(result, str) else str(result)
+        outcome = "error_results" if is_error(result) else "successes"
+        metrics.record(elapsed, len(input_text.encode("utf-8")), len(output.encode("utf-8")), outcome,
+                       output if outcome != "successes" else None)
+        return result
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            tools = dict(self._tools)
+        return {name: metrics.stats() for name, metrics in sorted(tools.items())}
+
+
+tool_metrics = ToolMetricsRegistry()
@@ -0,0 +1,131 @@
+# tool_precompute.py
+
+# --- Precomputed Tool Results ---
+# Some tasks call a tool whose input follows from the kickoff inputs alone (advance_agent's
+# TASK_TOOL_INPUTS), and several of those tools are deterministic (cache policy "pure"): their output
+# depends only on the input. Left to the agent, each such call costs a model round trip just to
+# decide on the call. At kickoff, the precomputer evaluates the input functions and runs the
+# deterministic tools concurrently in the background. When a task starts, it waits for that task's
+# results and appends them to the task's context, so the agent starts with the answer (an agent
+# that calls the tool anyway is answered from the tool cache). Tools that are not deterministic
+# (e.g. web research) are left to the agent.
+#
+# Configuration (.env):
+#   TOOL_PRECOMPUTE_ENABLED      - "false" leaves every tool call to the agents (default true)
+#   TOOL_PRECOMPUTE_MAX_WORKERS  - tools run concurrently at kickoff (default 4)
+
+import os
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, Any, List, Optional, Tuple
+
+from run_context import task_scope
+from task_scheduler import task_label
+
+DEFAULT_MAX_WORKERS = 4
+
+
+def _env_flag(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None or not value.strip():
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+@dataclass
+class PrecomputedResult:
+    task: str
+    tool_name: str
+    tool_input: str
+    output: str = ""
+    seconds: float = 0.0
+    error: Optional[str] = None
+
+
+class ToolPrecomputer:
+    # `tool_inputs` maps task names to (tool class name, input function); the input function takes
+    # the kickoff inputs and returns the tool arguments ({"description": ...}).
+    def __init__(self, tool_inputs: Dict[str, Tuple[str, Callable[[Dict[str, Any]], Dict[str, str]]]],
+                 max_workers: int = DEFAULT_MAX_WORKERS, enabled: bool = True):
+        self.tool_inputs = tool_inputs
+        self.max_workers = max_workers
+        self.enabled = enabled
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._futures: Dict[str, Future] = {}
+        self._skipped: List[str] = []
+
+    @classmethod
+    def from_env(cls, tool_inputs: Dict[str, Tuple[str, Callable[[Dict[str, Any]], Dict[str, str]]]]) -> "ToolPrecomputer":
+        return cls(
+            tool_inputs,
+            max_workers=int(os.getenv("TOOL_PRECOMPUTE_MAX_WORKERS", DEFAULT_MAX_WORKERS)),
+            enabled=_env_flag("TOOL_PRECOMPUTE_ENABLED", True),
+        )
+
+    # Starts the deterministic tools of `tasks` for these kickoff inputs; returns immediately.
+    def start(self, tasks: List[Any], inputs: Optional[Dict[str, Any]]) -> None:
+        self._futures, self._skipped = {}, []
+        if not self.enabled:
+            return
+        for task in tasks:
+            label = task_label(task)
+            if label not in self.tool_inputs:
+                continue
+            class_name, input_fn = self.tool_inputs[label]
+            tool = next((t for t in task.tools or [] if type(t).__name__ == class_name), None)
+            if tool is None:
+                print(f"Warning: Task '{label}' has no {class_name}; its tool input is not precomputed.")
+                continue
+            if not getattr(tool, "deterministic", False):
+                self._skipped.append(label)
+                continue
+            try:
+                tool_input = input_fn(inputs or {})["description"]
+            except Exception as e:
+                print(f"Warning: Could not build the {class_name} input for task '{label}': {type(e).__name__}: {e}")
+                continue
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="tool-precompute")
+            self._futures[label] = self._executor.submit(self._run_tool, label, tool, tool_input)
+
+    # Runs the tool the way an agent call would (metrics, call coalescing), attributed to its task.
+    def _run_tool(self, label: str, tool: Any, tool_input: str) -> PrecomputedResult:
+        result = PrecomputedResult(label, tool.name, tool_input)
+        started = time.perf_counter()
+        with task_scope(label):
+            try:
+                result.output = tool._run(tool_input)
+                if hasattr(tool, "is_error_result") and tool.is_error_result(result.output):
+                    result.error = result.output
+            except Exception as e:
+                result.error = f"{type(e).__name__}: {e}"
+        result.seconds = time.perf_counter() - started
+        if result.error:
+            print(f"Warning: Precomputing {tool.name} for task '{label}' failed: {result.error}")
+        return result
+
+    # Waits for the task's precomputed result and returns it as context text ("" if there is none).
+    def context_for(self, task: Any) -> str:
+        future = self._futures.get(task_label(task))
+        if future is None:
+            return ""
+        result = future.result()
+        if result.error:
+            return ""
+        return (f"Precomputed tool result ({result.tool_name} was already run with the input below; use this result "
+                f"instead of calling the tool again with the same input):\n"
+                f"Input: {result.tool_input}\n{result.output}")
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+
+    def stats(self) -> Dict[str, Any]:
+        results = [future.result() for future in self._futures.values() if future.done() and not future.exception()]
+        return {
+            "precomputed": sorted(r.task for r in results if not r.error),
+            "failed": sorted(r.task for r in results if r.error),
+            "skipped_nondeterministic": list(self._skipped),
+            "tool_seconds": round(sum(r.seconds for r in results), 6),
+        }